@@ -0,0 +1,73 @@
+import threading
+import random
+import gevent
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FakeAsyncResult:
+    """_summary_
+    Stand-in for the gevent AsyncResult returned by vip.rpc.call. The injected latency is paid when the
+    result is collected, the way a real call only blocks the caller on get(), and like a real call the wait
+    yields to the other greenlets.
+    """
+    def __init__(self, value, latency: float) -> None:
+        self._value=value
+        self._latency=latency
+
+    def get(self, timeout: float = None):
+        if self._latency:
+            if timeout is not None and self._latency > timeout:
+                gevent.sleep(timeout)
+                raise TimeoutError(f"fake RPC took longer than {timeout} s")
+            gevent.sleep(self._latency)
+        return self._value
+
+
+class FakeRPC:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = None) -> None:
+        """_summary_
+
+        Args:
+            latency (float): mean seconds an RPC takes to complete
+            jitter (float): uniform +- spread added to the latency
+            seed (int): seed of the jitter
+        """
+        self._latency=latency
+        self._jitter=jitter
+        self._random=random.Random(seed)
+        self._lock=threading.Lock()
+        self.calls=0
+        self.points={}
+
+    def call(self, peer: str, method: str, *args, **kwargs) -> FakeAsyncResult:
+        with self._lock:
+            self.calls+=1
+            latency=max(0.0,self._latency+self._random.uniform(-self._jitter,self._jitter)) if self._jitter else self._latency
+            if method == 'set_point' and len(args) >= 3:
+                self.points[(args[0],args[1])]=args[2]
+        return FakeAsyncResult(True,latency)
+
+
+class FakePubSub:
+    def __init__(self) -> None:
+        self.published=0
+        self.bytes=0
+
+    def publish(self, peer: str = 'pubsub', topic: str = None, message=None, **kwargs) -> FakeAsyncResult:
+        self.published+=1
+        self.bytes+=len(message) if isinstance(message,(str,bytes)) else 0
+        return FakeAsyncResult(True,0)
+
+
+class FakeVIP:
+    """_summary_
+    In-process replacement of the volttron vip connection for the benchmarks: rpc.call accepts the
+    set_point calls of Send and CommandDispatcher and completes them after an injectable latency, and
+    pubsub.publish counts what GroupRepository publishes. The last value written to every point is kept
+    in rpc.points so a run can be checked as well as timed.
+    """
+    def __init__(self, rpc_latency: float = 0.0, rpc_jitter: float = 0.0, seed: int = None) -> None:
+        self.rpc=FakeRPC(rpc_latency,rpc_jitter,seed)
+        self.pubsub=FakePubSub()
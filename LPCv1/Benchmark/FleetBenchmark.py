@@ -0,0 +1,219 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Benchmark.FakeVIP import FakeVIP
+from Benchmark.SyntheticFleet import SyntheticFleet
+from Controller.LoadPriorityControlEV import LoadPriorityControlEV
+from Model.LatencyMetrics import LatencyHistogram
+from Model.IoTMessage import IoTMessage
+from View.Send import Send
+from View.CommandDispatcher import CommandDispatcher
+from contextlib import redirect_stdout
+from datetime import datetime
+import subprocess
+import platform
+import argparse
+import json
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FleetBenchmark:
+    """_summary_
+    Throughput and latency of the ingest -> decide -> actuate path on synthetic fleets.
+    Every benchmark returns one result dict (operations, wall time, throughput and per operation
+    p50/p95/p99 in ms) and run() collects them for every fleet size, so the JSON written by write_Results
+    can be compared between versions with compare_Results.
+    """
+    def __init__(self, rpc_latency: float = 0.0, rpc_jitter: float = 0.0, gleamm_points: int = 60, ev_share: float = 0.1, seed: int = 1) -> None:
+        """_summary_
+
+        Args:
+            rpc_latency (float): seconds every fake RPC takes to complete
+            rpc_jitter (float): uniform +- spread of the RPC latency
+            gleamm_points (int): GLEAMM load points of every fleet
+            ev_share (float): fraction of the devices that are EV chargers, the rest are smart plugs
+            seed (int): seed of the fleets and their readings
+        """
+        self._rpc_latency=rpc_latency
+        self._rpc_jitter=rpc_jitter
+        self._gleamm_points=gleamm_points
+        self._ev_share=ev_share
+        self._seed=seed
+
+    def build_Fleet(self, devices: int) -> SyntheticFleet:
+        evs=int(devices*self._ev_share)
+        plugs=max(0,devices-evs-self._gleamm_points)
+        vip=FakeVIP(self._rpc_latency,self._rpc_jitter,self._seed)
+        fleet=SyntheticFleet(vip,plugs,evs,self._gleamm_points,self._seed)
+        fleet.load_State()
+        return fleet
+
+    @staticmethod
+    def _result(name: str, devices: int, histogram: LatencyHistogram, seconds: float, operations: int = None, **extra) -> dict:
+        # operations overrides the histogram count for batched runs, which have no per operation latency
+        operations=histogram.count if operations is None else operations
+        result={'benchmark':name,
+                'devices':devices,
+                'operations':operations,
+                'seconds':seconds,
+                'ops_per_s':operations/seconds if seconds > 0 else 0.0}
+        for q in (50,95,99):
+            result[f'p{q}_ms']=histogram.percentile(q/100)*1000 if histogram is not None else None
+        result.update(extra)
+        return result
+
+    @staticmethod
+    def _time_Each(operation, items) -> tuple:
+        histogram=LatencyHistogram()
+        begin=time.perf_counter()
+        for item in items:
+            start=time.perf_counter()
+            operation(item)
+            histogram.observe(time.perf_counter()-start)
+        return histogram,time.perf_counter()-begin
+
+    def bench_Ingest(self, fleet: SyntheticFleet, devices: int, rounds: int = 3) -> list:
+        results=[]
+        for name,monitor,frames in (('ingest_plug',fleet.plug_monitor,fleet.plug_Frames),
+                                    ('ingest_ev',fleet.ev_monitor,fleet.ev_Frames),
+                                    ('ingest_gleamm',fleet.gleamm_monitor,fleet.gleamm_Frames)):
+            batch=[frame for _ in range(rounds) for frame in frames()]
+            if not batch:
+                continue
+            histogram,seconds=self._time_Each(monitor.process_Message,batch)
+            results.append(self._result(name,devices,histogram,seconds))
+        batch=[frame for _ in range(rounds) for frame in fleet.plug_Frames()]
+        if batch:
+            start=time.perf_counter()
+            report=fleet.plug_monitor.process_Messages(batch)
+            seconds=time.perf_counter()-start
+            results.append(self._result('ingest_plug_batch',devices,None,seconds,report['frames'],applied=report['applied']))
+        return results
+
+    def bench_Aggregates(self, fleet: SyntheticFleet, devices: int, repeats: int = 200) -> list:
+        group=fleet.group
+        histogram,seconds=self._time_Each(lambda _: (sum(group.get_Facade_Consumption().values()),group.get_Facade_Max_rating_for_on_loads()),range(repeats))
+        return [self._result('group_aggregates',devices,histogram,seconds)]
+
+    def bench_Control(self, fleet: SyntheticFleet, devices: int, repeats: int = 3) -> list:
+        shed=LatencyHistogram()
+        restore=LatencyHistogram()
+        shed_seconds=restore_seconds=0.0
+        commands=0
+        for _ in range(repeats):
+            fleet.load_State()
+            strategy=LoadPriorityControlEV()
+            strategy._stagger=0 # the planning and the publishing are timed, not the actuation pacing
+            total=sum(fleet.group.get_Facade_Consumption().values())
+            calls=fleet.vip.rpc.calls
+            start=time.perf_counter()
+            strategy.execute(fleet.group,['lpc',total*0.5])
+            elapsed=time.perf_counter()-start
+            shed.observe(elapsed)
+            shed_seconds+=elapsed
+            start=time.perf_counter()
+            strategy.execute(fleet.group,['lpc',total*2])
+            elapsed=time.perf_counter()-start
+            restore.observe(elapsed)
+            restore_seconds+=elapsed
+            commands+=fleet.vip.rpc.calls-calls
+        return [self._result('lpc_ev_shed',devices,shed,shed_seconds),
+                self._result('lpc_ev_restore',devices,restore,restore_seconds,rpc_calls=commands)]
+
+    def bench_Publish(self, fleet: SyntheticFleet, devices: int, limit: int = 10000) -> list:
+        targets=fleet.devices()[:limit]
+        messages=[IoTMessage(device_id=device._id,message_type='command',payload={'cmd':0},timestamp=datetime.now()) for device in targets]
+        send=Send(fleet.vip)
+        histogram,seconds=self._time_Each(lambda index: send.publish(messages[index],targets[index]._deviceType),range(len(targets)))
+        results=[self._result('publish_sync',devices,histogram,seconds,rpc_latency=self._rpc_latency)]
+        dispatcher=CommandDispatcher(fleet.vip)
+        send=Send(fleet.vip,dispatcher)
+        futures=[]
+        begin=time.perf_counter()
+        submit,_=self._time_Each(lambda index: futures.append(send.publish(messages[index],targets[index]._deviceType)),range(len(targets)))
+        dispatcher.wait_All(futures)
+        seconds=time.perf_counter()-begin
+        dispatcher.shutdown()
+        results.append(self._result('publish_dispatched',devices,submit,seconds,rpc_latency=self._rpc_latency))
+        return results
+
+    def run(self, sizes: list, benchmarks: list = None) -> list:
+        benchmarks=benchmarks or ['ingest','aggregates','control','publish']
+        results=[]
+        # Send prints every command it sends, which would swamp the output and the timings
+        with open(os.devnull,'w') as devnull, redirect_stdout(devnull):
+            for devices in sizes:
+                start=time.perf_counter()
+                fleet=self.build_Fleet(devices)
+                build_seconds=time.perf_counter()-start
+                for name in benchmarks:
+                    for result in getattr(self,'bench_'+name.capitalize())(fleet,devices):
+                        result['build_seconds']=build_seconds
+                        results.append(result)
+                        sys.__stdout__.write(f"{result['benchmark']:<20} {devices:>7} devices {result['ops_per_s']:>12.1f} ops/s p50 {result['p50_ms'] or 0:.3f} ms p99 {result['p99_ms'] or 0:.3f} ms\n")
+        return results
+
+    def write_Results(self, results: list, path: str) -> None:
+        try:
+            revision=subprocess.run(['git','rev-parse','--short','HEAD'],capture_output=True,text=True,cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except OSError:
+            revision=''
+        document={'meta':{'time':datetime.now().isoformat(),
+                          'revision':revision,
+                          'python':platform.python_version(),
+                          'machine':platform.machine(),
+                          'rpc_latency':self._rpc_latency,
+                          'rpc_jitter':self._rpc_jitter,
+                          'gleamm_points':self._gleamm_points,
+                          'ev_share':self._ev_share,
+                          'seed':self._seed},
+                  'results':results}
+        with open(path,'w') as f:
+            json.dump(document,f,indent=1)
+
+
+def compare_Results(baseline: dict, current: dict, tolerance: float = 0.2) -> list:
+    """_summary_
+    Args:
+        baseline (dict): results document of the reference version
+        current (dict): results document of the version under test
+        tolerance (float): allowed fractional throughput loss
+    Returns:
+        list: (benchmark, devices, baseline ops/s, current ops/s) of the regressions
+    """
+    reference={(result['benchmark'],result['devices']):result['ops_per_s'] for result in baseline['results']}
+    regressions=[]
+    for result in current['results']:
+        before=reference.get((result['benchmark'],result['devices']))
+        if before and result['ops_per_s'] < before*(1-tolerance):
+            regressions.append((result['benchmark'],result['devices'],before,result['ops_per_s']))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description="synthetic fleet benchmarks of the load priority control")
+    parser.add_argument('--sizes',type=int,nargs='+',default=[100,1000,10000,100000])
+    parser.add_argument('--benchmarks',nargs='+',choices=['ingest','aggregates','control','publish'])
+    parser.add_argument('--rpc-latency',type=float,default=0.0)
+    parser.add_argument('--rpc-jitter',type=float,default=0.0)
+    parser.add_argument('--gleamm-points',type=int,default=60)
+    parser.add_argument('--output',default='fleet_benchmark.json')
+    parser.add_argument('--baseline',help="results file of an earlier version to compare against")
+    parser.add_argument('--tolerance',type=float,default=0.2)
+    args=parser.parse_args()
+
+    benchmark=FleetBenchmark(args.rpc_latency,args.rpc_jitter,args.gleamm_points)
+    results=benchmark.run(args.sizes,args.benchmarks)
+    benchmark.write_Results(results,args.output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline=json.load(f)
+        with open(args.output) as f:
+            current=json.load(f)
+        regressions=compare_Results(baseline,current,args.tolerance)
+        for name,devices,before,after in regressions:
+            print(f"regression {name} at {devices} devices: {before:.1f} -> {after:.1f} ops/s")
+        sys.exit(1 if regressions else 0)
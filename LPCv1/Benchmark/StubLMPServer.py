@@ -0,0 +1,57 @@
+import threading
+import time
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class StubLMPServer:
+    """_summary_
+    Local stand-in of the LMP endpoint, to exercise LMPPriceProvider without the price service. The price,
+    the response delay and the HTTP status can be changed while it runs, e.g. to make the endpoint slow or failing.
+    """
+    def __init__(self, price: float = 20.0, delay: float = 0.0, status: int = 200) -> None:
+        self.price=price
+        self.delay=delay
+        self.status=status
+        self.requests=0
+        self._lock=threading.Lock()
+        stub=self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests+=1
+                    price,delay,status=stub.price,stub.delay,stub.status
+                time.sleep(delay)
+                body=json.dumps({'LMP': price} if status == 200 else {'error': 'unavailable'}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type','application/json')
+                self.send_header('Content-Length',str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server=ThreadingHTTPServer(('127.0.0.1',0),Handler)
+        self._server.daemon_threads=True
+        self._thread=None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/api/lmpdata/"
+
+    def start(self) -> "StubLMPServer":
+        self._thread=threading.Thread(target=self._server.serve_forever,name="stub-lmp",daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread=None
@@ -0,0 +1,99 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Model.SmartPlug import SmartPlug
+from Model.EVCharger import EVCharger
+from Model.IoTDeviceGroup import IoTDeviceGroup
+from Controller.DeviceMonitor import DeviceMonitor
+from Controller.EvMonitor import EvMonitor
+from Controller.GLEAMMMonitor import GLEAMMMonitor
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+# GLEAMM buildings and the prefixes of their load and status points
+GLEAMM_BUILDINGS={'BuildingP':('PPT','SPT'),'BuildingC':('PCT','SCT'),'BuildingI':('PIT','SIT')}
+
+
+class SyntheticFleet:
+    """_summary_
+    Synthetic building for the benchmarks: smart plugs behind a DeviceMonitor, EV chargers behind an
+    EvMonitor and GLEAMM load points behind a GLEAMMMonitor, all in one IoTDeviceGroup, plus the bus
+    frames that drive them. Devices use the topics and ids of the live deployment so the monitors route
+    them exactly as they route the real bus stream.
+    """
+    def __init__(self, vip, plugs: int = 100, evs: int = 10, gleamm_points: int = 60, seed: int = 1) -> None:
+        """_summary_
+
+        Args:
+            vip (obj): vip connection handed to the devices, usually a FakeVIP
+            plugs (int): number of smart plugs
+            evs (int): number of EV chargers
+            gleamm_points (int): number of GLEAMM load points, spread over the three buildings
+            seed (int): seed of the generated readings
+        """
+        self._random=random.Random(seed)
+        self.vip=vip
+        self.group=IoTDeviceGroup()
+        self.plug_monitor=DeviceMonitor()
+        self.ev_monitor=EvMonitor()
+        self.gleamm_monitor=GLEAMMMonitor()
+        self.plugs=[]
+        self.evs=[]
+        self.gleamm_loads=[]
+        for i in range(plugs):
+            plug=SmartPlug(f'building540/NIRE_WeMo_cc_{i//1000}/w{i}',vip)
+            self.plug_monitor.register_Observer(plug)
+            self.group.add_Device(plug)
+            self.plugs.append(plug)
+        for i in range(evs):
+            charger=EVCharger(f'campus/building{i//1000}/ev{i}',vip)
+            self.ev_monitor.register_Observer(charger)
+            self.group.add_Device(charger)
+            self.evs.append(charger)
+        buildings=list(GLEAMM_BUILDINGS.items())
+        for i in range(gleamm_points):
+            building,(load_prefix,status_prefix)=buildings[i % len(buildings)]
+            load=SmartPlug(f'Microgrid/GLEAMM/{building}/{load_prefix}{i//len(buildings)+1}',vip)
+            load._deviceType='gleammrload'
+            self.gleamm_monitor.register_Observer(load)
+            self.group.add_Device(load)
+            self.gleamm_loads.append(load)
+
+    def plug_Frames(self) -> list:
+        frames=[]
+        for plug in self.plugs:
+            frames.append({'topic':'devices/'+plug._id+'/all',
+                           'message':[{'power':self._random.randint(0,500),'status':self._random.choice((0,1,1,1,11)),'priority':self._random.randint(1,5)}]})
+        return frames
+
+    def ev_Frames(self) -> list:
+        frames=[]
+        for charger in self.evs:
+            frames.append({'topic':'devices/'+charger._id+'/all',
+                           'message':[{'current':self._random.randint(0,40),'frequency':60,'voltage':240,'Acmd':0,
+                                       'energy':self._random.randint(0,100),'temperature':25,'status':self._random.choice((0,1,2,2,11))}]})
+        return frames
+
+    def gleamm_Frames(self) -> list:
+        # one frame per building carrying every load and status point, like the GLEAMM driver publishes
+        readings={}
+        for load in self.gleamm_loads:
+            head,key=load._id.rsplit('/',1)
+            load_prefix,status_prefix=GLEAMM_BUILDINGS[head.split('/')[-1]]
+            frame=readings.setdefault(head,{})
+            frame[key]=self._random.randint(0,50)
+            frame[status_prefix+key[len(load_prefix):]]=self._random.choice((0,1))
+        return [{'topic':'devices/'+head+'/all','message':[frame,{}]} for head,frame in readings.items()]
+
+    def load_State(self) -> None:
+        # push one round of readings through every monitor so the group has a realistic state
+        for frame in self.plug_Frames():
+            self.plug_monitor.process_Message(frame)
+        for frame in self.ev_Frames():
+            self.ev_monitor.process_Message(frame)
+        for frame in self.gleamm_Frames():
+            self.gleamm_monitor.process_Message(frame)
+
+    def devices(self) -> list:
+        return self.plugs+self.evs+self.gleamm_loads
@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import time
+import gevent
+from gevent.event import Event
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PacingQueue:
+    """_summary_
+    Due-time queue shared by the ActuationPacer and the replay VirtualPacer. Actions are spaced by the stagger
+    within their lane (one lane per strategy, i.e. per controlled group), so the plans of different groups run
+    side by side instead of one behind the other. A device has at most one pending plan: an action queued for
+    a device replaces the actions still pending for it and takes over the due time of the earliest, so a plan
+    repeated on every control tick neither queues duplicates nor pushes the device further back.
+    """
+    def __init__(self, stagger: float = 0.25, clock=time.monotonic) -> None:
+        """_summary_
+
+        Args:
+            stagger (float): default seconds between two consecutive actions of a lane
+            clock (callable): monotonic time source
+        """
+        self._stagger=stagger
+        self._clock=clock
+        self._queue=[] # [due, sequence, action, device id], action None once cancelled
+        self._sequence=itertools.count()
+        self._next_free={} # lane -> clock time the next action of the lane may run at
+        self._pending={} # device id -> its entries still in the queue
+        self._live=0
+
+    def schedule(self, action, stagger: float = None, device=None, lane=None, replace: bool = True) -> float:
+        """_summary_
+        queue an action behind the ones already waiting in its lane
+        Args:
+            action (callable): the switch action to run
+            stagger (float): gap to keep after this action, the pacer default if None
+            device (IoTDevice): device the action switches, lets the action replace the pending ones of the device
+                and cancel_Pending drop the actions of some devices only
+            lane (hashable): key the stagger is kept for, usually the strategy; one shared lane if None
+            replace (bool): drop the actions still pending for the device; False chains the action behind them, e.g.
+                the setpoint sent just before the on command of the same plan
+        Returns:
+            float: clock time at which the action is due
+        """
+        now=self._clock()
+        device_id=None if device is None else device._id
+        replaced=self._drop(device_id) if replace and device_id is not None else []
+        if replaced:
+            due=max(now,min(entry[0] for entry in replaced))
+        else:
+            due=max(now,self._next_free.get(lane,0))
+            if device_id in self._pending:
+                # chained, never ahead of the actions of the device it follows
+                due=max(due,max(entry[0] for entry in self._pending[device_id]))
+            self._next_free[lane]=due+(self._stagger if stagger is None else stagger)
+        entry=[due,next(self._sequence),action,device_id]
+        heapq.heappush(self._queue,entry)
+        self._live+=1
+        if device_id is not None:
+            self._pending.setdefault(device_id,[]).append(entry)
+        return due
+
+    def _drop(self, device_id) -> list:
+        entries=self._pending.pop(device_id,[])
+        for entry in entries:
+            entry[2]=None
+        self._live-=len(entries)
+        return entries
+
+    def cancel_Pending(self, devices=None) -> int:
+        """_summary_
+        drop the actions that have not run yet, e.g. when a new control command supersedes the plan
+        Args:
+            devices (iterable): drop only the actions of these devices, every action if None
+        Returns:
+            int: number of dropped actions
+        """
+        if devices is None:
+            dropped=self._live
+            self._queue=[]
+            self._pending={}
+            self._next_free={}
+            self._live=0
+            return dropped
+        return sum(len(self._drop(device._id)) for device in devices)
+
+    def pending(self) -> int:
+        return self._live
+
+    def _next_Due(self) -> float:
+        # due time of the first live action, None if there is none
+        while self._queue and self._queue[0][2] is None:
+            heapq.heappop(self._queue)
+        if not self._queue:
+            # lanes whose gap has run out are idle, forget them
+            now=self._clock()
+            self._next_free={lane: free for lane,free in self._next_free.items() if free > now}
+            return None
+        return self._queue[0][0]
+
+    def _pop(self):
+        due,sequence,action,device_id=heapq.heappop(self._queue)
+        self._live-=1
+        if device_id is not None:
+            entries=self._pending.get(device_id)
+            if entries:
+                entries[:]=[entry for entry in entries if entry[1] != sequence]
+                if not entries:
+                    del self._pending[device_id]
+        return due,action
+
+    @staticmethod
+    def _run_Action(action) -> None:
+        try:
+            action()
+        except Exception as e:
+            logger.error(f"paced action failed {e}")
+
+
+class ActuationPacer(PacingQueue):
+    """_summary_
+    Timer queue that spaces device switch actions out in time (e.g. to limit inrush) on a greenlet of
+    the agent's gevent hub, so a control strategy can plan a whole shed/restore sequence and return
+    immediately while the agent keeps processing telemetry and new control commands. An action may
+    yield to the hub part way, e.g. on the synchronous Send path while it waits for the RPC result; the
+    strategies run their actions under the device _state_lock, which telemetry updates take as well, so
+    the state changes of an action and of a telemetry update of the same device still never interleave.
+    """
+    def __init__(self, stagger: float = 0.25, clock=time.monotonic) -> None:
+        """_summary_
+
+        Args:
+            stagger (float): default seconds between two consecutive actions of a lane
+            clock (callable): monotonic time source
+        """
+        super().__init__(stagger,clock)
+        self._wakeup=Event()
+        self._worker=None
+        self._running=False
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running=True
+        self._worker=gevent.spawn(self._run)
+
+    def stop(self) -> None:
+        self._running=False
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker=None
+
+    def schedule(self, action, stagger: float = None, device=None, lane=None, replace: bool = True) -> float:
+        if not self._running:
+            self.start()
+        due=super().schedule(action,stagger,device,lane,replace)
+        self._wakeup.set()
+        return due
+
+    def _run(self) -> None:
+        while self._running:
+            due=self._next_Due()
+            if due is None:
+                self._wakeup.clear()
+                self._wakeup.wait()
+                continue
+            delay=due-self._clock()
+            if delay > 0:
+                self._wakeup.clear()
+                self._wakeup.wait(delay)
+                continue
+            due,action=self._pop()
+            self._run_Action(action)
+            # let the telemetry queued behind the action in
+            gevent.sleep(0)
@@ -2,13 +2,76 @@ from abc import ABC, abstractmethod
 import sys
 sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from Model.IoTDeviceGroup import IoTDeviceGroup
+from Model.LatencyMetrics import LatencyMetrics, STAGE_PACING
+from time import perf_counter
+from gevent import sleep
+
+metrics = LatencyMetrics.get_Default()
 
 class ControlStrategy(ABC):
+    _default_pacer=None # shared ActuationPacer used by the strategies that were not given one
     
     def __init__(self) -> None:
         super().__init__()
         self._controlType=None
+        self._pacer=None
+        self._stagger=0 # seconds between two switch actions of this strategy
     
     @abstractmethod
     def execute(self,group:IoTDeviceGroup,cmd:any)->None:
-        pass
\ No newline at end of file
+        pass
+    
+    def release(self,group:IoTDeviceGroup)->None:
+        """_summary_
+        called when the strategy stops controlling the group (the group left the manager or its control type was
+        replaced), so a strategy can unhook whatever it attached to the group
+        """
+        pass
+    
+    @staticmethod
+    def set_Default_Pacer(pacer) -> None:
+        ControlStrategy._default_pacer=pacer
+    
+    def set_Pacer(self,pacer) -> None:
+        self._pacer=pacer
+    
+    def cancel_Pending(self,group:IoTDeviceGroup)->int:
+        """_summary_
+        drop the paced actions still queued for the devices of the group, e.g. when a new command supersedes the plan
+        Returns:
+            int: number of dropped actions
+        """
+        pacer=self._pacer if self._pacer is not None else self._default_pacer
+        if pacer is None:
+            return 0
+        return pacer.cancel_Pending(group.get_Devices().values())
+    
+    def _actuate(self,device,command,*args,last_command=None,stagger=None,replace=True) -> None:
+        """_summary_
+        run a device command, queued on the pacer when there is one or inline followed by the stagger sleep (a gevent
+        sleep, so the hub keeps serving telemetry) otherwise.
+        turn_On/turn_Off store the sent message in _last_command, so the value the strategy planned with is put back afterwards
+        Args:
+            device (IoTDevice): device the command belongs to
+            command (callable): bound device method, e.g. device.turn_Off
+            last_command (int): value of _last_command to keep once the command ran, left untouched if None
+            stagger (float): gap after this action, the strategy stagger if None
+            replace (bool): the action replaces the ones still queued for the device; False chains it behind them
+        """        
+        stagger=self._stagger if stagger is None else stagger
+        def action():
+            # under the device lock, so the command and the planned _last_command land together
+            with device._state_lock:
+                command(*args)
+                if last_command is not None:
+                    device._last_command=last_command
+        pacer=self._pacer if self._pacer is not None else self._default_pacer
+        if pacer is None:
+            action()
+            if stagger:
+                start=perf_counter()
+                sleep(stagger)
+                metrics.observe(STAGE_PACING,perf_counter()-start,type(self).__name__)
+        else:
+            # one lane per strategy instance, i.e. per group, so the groups are paced side by side
+            pacer.schedule(action,stagger,device,self,replace)
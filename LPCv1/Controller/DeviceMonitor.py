@@ -6,18 +6,27 @@ from Model.Observer import Observer
 from Model.IoTMessage import IoTMessage
 from Model.SmartPlug import SmartPlug
 from Controller.EMSControl import EMSControl
+from Controller.TopicRouter import TopicRouter, device_Key, control_Key
+from Model.LatencyMetrics import LatencyMetrics, STAGE_INGEST
 import logging
+import time
 
 logger = logging.getLogger(__name__)
+metrics = LatencyMetrics.get_Default()
 
 class DeviceMonitor(ObserverSubject):
     
+    _ingest_label='plug'
+    
     def __init__(self) -> None:
         super().__init__()
         self._message=None
         self._observers={}
         self._notificationObserverID=None
         self._emscontroller= None
+        self._router=TopicRouter()
+        self._router.add_Route('devices',self._on_Device_Message,device_Key)
+        self._router.add_Route('control',self._on_Control_Message,control_Key)
         
     def register_Observer(self,observer: Observer) -> None:
         self._observers[observer._observerid]=observer
@@ -34,20 +43,23 @@ class DeviceMonitor(ObserverSubject):
         except Exception as e:
                 logger.error(f"Error in the Observers list: {e}")
      
-    def notify_Observers(self) -> None:
-        self._observers[self._notificationObserverID].update(int(self._message['power']),int(self._message['status']),int(self._message['priority']))
+    def notify_Observers(self,observerid=None,message=None,changed=None) -> None:
+        observerid=self._notificationObserverID if observerid is None else observerid
+        message=self._message if message is None else message
+        self._update_Observer(self._observers[observerid],changed,int(message['power']),int(message['status']),int(message['priority']))
     
     def process_Message(self,message:any)->IoTMessage:
         
         #topic = "devices/building540/NIRE_WeMo_cc_1/w3/all"
-        if message['topic'].split('/')[0] == 'devices':
-            self._notificationObserverID = message['topic'].split('/')[-4]+'/'+message['topic'].split('/')[-3]+'/'+message['topic'].split('/')[-2]
-            self._message=message['message'][0]
-            self.notify_Observers()
-        elif message['topic'].split('/')[0]  =='control' :
-            self._emscontroller.execute_Strategy({'controlType':message['topic'].split('/')[-1], 'cmd':message['message']})
-        else:
-            pass
+        start=time.perf_counter()
+        self._router.dispatch(message)
+        metrics.observe(STAGE_INGEST,time.perf_counter()-start,self._ingest_label)
+    
+    def _on_Device_Message(self,observerid:str,message:any,changed=None)->None:
+        self.notify_Observers(observerid,message['message'][0],changed)
+    
+    def _on_Control_Message(self,controltype:str,message:any)->None:
+        self._emscontroller.execute_Strategy({'controlType':controltype, 'cmd':message['message']})
         
     def set_EMS_Controller(self,emscontroller: EMSControl)->None:
          self._emscontroller = emscontroller
@@ -2,9 +2,13 @@ import sys
 sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from Controller.ControlStrategy import ControlStrategy
 from Model.IoTFacade import IoTFacade
+from Model.LatencyMetrics import LatencyMetrics, STAGE_CONTROL, STAGE_STRATEGY
 import logging
+import time
 
 logger = logging.getLogger(__name__)
+metrics = LatencyMetrics.get_Default()
+
 class EMSControl:
     
     def __init__(self) -> None:
@@ -21,11 +25,17 @@ class EMSControl:
                 logger.error(f"did you add the control stratagy ?")
                 raise KeyError(f"did you add the control stratagy ?")
             else:
+                label=type(self._controlstratagey).__name__
+                start=time.perf_counter()
                 try:
                     self._controlstratagey.execute(self._devicegroup,self._cmd)
                 except Exception as e:
                     logger.error(f"error occured {e}")
                     raise KeyError(f"error occureds {e}")
+                finally:
+                    elapsed=time.perf_counter()-start
+                    metrics.observe(STAGE_STRATEGY,elapsed,label)
+                    metrics.observe(STAGE_CONTROL,elapsed,'ems')
         
     def set_Group(self,Group: IoTFacade) -> None:
         self._devicegroup=Group
@@ -5,9 +5,13 @@ from Model.Observer import Observer
 from Model.IoTMessage import IoTMessage
 from Model.SmartPlug import SmartPlug
 from Controller.EMSControl import EMSControl
+from Controller.TopicRouter import TopicRouter, device_Key
+from Model.LatencyMetrics import LatencyMetrics, STAGE_INGEST
 import logging
+import time
 
 logger = logging.getLogger(__name__)
+metrics = LatencyMetrics.get_Default()
 
 class EvMonitor(ObserverSubject):
     """_summary_
@@ -16,12 +20,16 @@ class EvMonitor(ObserverSubject):
     Args:
         ObserverSubject (_type_): _description_
     """
+    _ingest_label='EV'
+    
     def __init__(self) -> None:
         super().__init__()
         self._message=None
         self._observers={}
         self._notificationObserverID=None
         self._emscontroller= None
+        self._router=TopicRouter()
+        self._router.add_Route('',self._on_Device_Message,device_Key)
         
     def register_Observer(self, observer: Observer) -> None:
         self._observers[observer._observerid]=observer
@@ -38,12 +46,17 @@ class EvMonitor(ObserverSubject):
         except Exception as e:
                 logger.error(f"Error in the Observers list: {e}")
     
-    def notify_Observers(self) -> None:
-        self._observers[self._notificationObserverID].update(int(self._message['current']),int(self._message['frequency']),4,int(self._message['voltage']),int(self._message['Acmd']),int(self._message['energy']),int(self._message['temperature']),int(self._message['status']))    
+    def notify_Observers(self,observerid=None,message=None,changed=None) -> None:
+        observerid=self._notificationObserverID if observerid is None else observerid
+        message=self._message if message is None else message
+        self._update_Observer(self._observers[observerid],changed,int(message['current']),int(message['frequency']),4,int(message['voltage']),int(message['Acmd']),int(message['energy']),int(message['temperature']),int(message['status']))    
     def set_EMS_Controller(self,emscontroller: EMSControl)->None:
         self._emscontroller = emscontroller
     
     def process_Message(self,message:any)->IoTMessage:
-            self._notificationObserverID = message['topic'].split('/')[-4]+'/'+message['topic'].split('/')[-3]+'/'+message['topic'].split('/')[-2]
-            self._message=message['message'][0]
-            self.notify_Observers()
\ No newline at end of file
+            start=time.perf_counter()
+            self._router.dispatch(message)
+            metrics.observe(STAGE_INGEST,time.perf_counter()-start,self._ingest_label)
+    
+    def _on_Device_Message(self,observerid:str,message:any,changed=None)->None:
+        self.notify_Observers(observerid,message['message'][0],changed)
\ No newline at end of file
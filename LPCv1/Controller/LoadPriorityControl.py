@@ -3,27 +3,25 @@ sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from Model.IoTDeviceGroup import IoTDeviceGroup
 from Controller.ControlStrategy import ControlStrategy
 import logging
-from itertools import groupby
-from time import sleep
+from Model.EventTrace import EventTrace, EVENT_DECISION, EVENT_SHED, EVENT_SETPOINT, EVENT_RESTORE, EVENT_CONSIDER
 
 logger = logging.getLogger(__name__)
+trace = EventTrace.get_Default()
 
 class LoadPriorityControl(ControlStrategy):
     def __init__(self) -> None:
         super().__init__()
         self._controlType='lpc'
+        self._stagger=1
         self.priority_groups = {}
                 
     def _group_by_Priorities(self, group,_reverse=False):
-        sorted_groups={}
-        sorted_smart_plugs = sorted(group._devices.values(),key=lambda plug: plug._priority,reverse=_reverse)
-        for key, sortedgroup in groupby(sorted_smart_plugs, key=lambda plug: plug._priority):
-                sorted_groups[key] = list(sortedgroup)
-        return  sorted_groups
+        # cached on the group version, steady state ticks do not sort
+        return group.get_Priority_Partition(_reverse)
         
     def execute(self, group: IoTDeviceGroup, cmd: any) -> None:
         total_consumption = sum(group.get_Facade_Consumption().values())
-        logger.info(f">>>>>>>>>>>>>>>>>>>>>>>>>>>> total consumption {total_consumption}, { self._group_by_Priorities(group)} . >>>>>>>>>>>>>>>>>>>>>>> {cmd}")
+        trace.record(logging.INFO,EVENT_DECISION,None,total_consumption,cmd)
         decoded_cmd=cmd[1]
         ## Shedding control section 
         if total_consumption > decoded_cmd:
@@ -31,15 +29,14 @@ class LoadPriorityControl(ControlStrategy):
              priority_groups=self._group_by_Priorities(group,False)
              for priority in priority_groups.keys():
                 for device in priority_groups[priority] :
-                    logger.info(f"Threshold exceeded. Turning off devices...{device._power_consumption}.. ID {device._id}")
+                    trace.record(logging.DEBUG,EVENT_CONSIDER,device._id,device._power_consumption,total_consumption)
                     if total_consumption > decoded_cmd and device._status !=11:
-                        device.turn_Off()
+                        self._actuate(device,device.turn_Off,last_command=0)
                         device._last_command=0
                         device._flagged=False
                         if device._last_command==0:
                                 device._control_attempts+=1
-                        sleep(1)
-                        logger.info(f"~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Turning off device {device._id} with priority {priority}, and total  consumption {total_consumption}")
+                        trace.record(logging.INFO,EVENT_SHED,device._id,priority,total_consumption)
                         total_consumption -= device._power_consumption       
                     elif device._status ==11:
                         device._flagged=True
@@ -54,13 +51,12 @@ class LoadPriorityControl(ControlStrategy):
              for priority in priority_groups.keys():
                  for device in priority_groups[priority]:
                      total_consumption += device._max_power_rating
-                     logger.info(f"Below threshold. Turning on devices ........{device._id} , status {device._status}, last command {device._last_command}, total consumption {total_consumption} >>>>>>>>>>>>>>>>>>>>>>>>")
+                     trace.record(logging.DEBUG,EVENT_CONSIDER,device._id,device._status,device._last_command,total_consumption)
                      if (total_consumption < decoded_cmd and device._last_command==0) and device._status !=11:
-                         device.turn_On()
+                         self._actuate(device,device.turn_On,last_command=1)
                          device._last_command=1
                          device._flagged=True
-                         sleep(1)
-                         logger.info(f"~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Turning on device {device._id} with priority {priority}, and total  consumption {total_consumption}")
+                         trace.record(logging.INFO,EVENT_RESTORE,device._id,priority,total_consumption)
                      elif  device._last_command==1:
                          total_consumption -= device._max_power_rating
                      elif  device._status ==11:
@@ -2,79 +2,157 @@ import sys
 sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from Model.IoTDeviceGroup import IoTDeviceGroup
 from Controller.ControlStrategy import ControlStrategy
+from Controller.SheddingSelector import SheddingSelector, SHED_SETPOINT, SHED_OFF_CONTROLLABLE
+import time
 import logging
-from itertools import groupby
-from time import sleep
+from Model.EventTrace import EventTrace, EVENT_DECISION, EVENT_SHED, EVENT_SETPOINT, EVENT_RESTORE, EVENT_CONSIDER
+from Model.LatencyMetrics import LatencyMetrics, COUNTER_ACTUATIONS, COUNTER_SUPPRESSED, COUNTER_DEADBAND_TICKS
 
 logger = logging.getLogger(__name__)
+trace = EventTrace.get_Default()
+metrics = LatencyMetrics.get_Default()
 
 class LoadPriorityControlEV(ControlStrategy):
-    def __init__(self) -> None:
+    def __init__(self, shed_deadband: float = 0.0, restore_deadband: float = 0.0, min_on_time: float = 0.0,
+                 min_off_time: float = 0.0, max_actuations: int = None, skip_redundant: bool = False,
+                 clock=time.monotonic) -> None:
+        """_summary_
+        the defaults act on every tick like the plain strategy; a strategy with deadbands, dwell times or a budget
+        is registered with a factory, e.g. functools.partial(LoadPriorityControlEV,shed_deadband=0.05,min_off_time=300)
+        Args:
+            shed_deadband (float): shed only once the consumption is this fraction above the command
+            restore_deadband (float): restore only once the consumption is this fraction below the command
+            min_on_time (float): seconds a device switched on by the strategy stays on before it may be switched off
+            min_off_time (float): seconds a device switched off by the strategy stays off before it may be switched on
+            max_actuations (int): devices actuated per control tick at most, unlimited if None; resends of the off command
+                to loads that already report off are not counted
+            skip_redundant (bool): do not send the off command again to a load the strategy switched off that reports off
+            clock (callable): time source of the dwell times, e.g. the VirtualClock of a replay
+        """
         super().__init__()
         self._controlType='lpc'
+        self._stagger=.25
+        self._selector=SheddingSelector()
         self.priority_groups = {}
+        self._shed_deadband=shed_deadband
+        self._restore_deadband=restore_deadband
+        self._min_on_time=min_on_time
+        self._min_off_time=min_off_time
+        self._max_actuations=max_actuations
+        self._skip_redundant=skip_redundant
+        self._clock=clock
+        self._switched_at={} # device id -> clock time of the last on/off command, its direction is the device _last_command
+        self._tick_actuations=0
+        self._stats={'actuations':0,'redundant':0,'dwell':0,'budget':0,'deadband_ticks':0}
                 
     def _group_by_Priorities(self, group,_reverse=False):
-        sorted_groups={}
-        sorted_smart_plugs = sorted(group._devices.values(),key=lambda plug: plug._priority,reverse=_reverse)
-        for key, sortedgroup in groupby(sorted_smart_plugs, key=lambda plug: plug._priority):
-                sorted_groups[key] = list(sortedgroup)
-        return  sorted_groups
+        # cached on the group version, steady state ticks do not sort
+        return group.get_Priority_Partition(_reverse)
         
+    def get_Suppression_Stats(self) -> dict:
+        """_summary_
+        Returns:
+            dict: actuations sent, actuations held back (redundant, dwell, budget) and ticks held in the deadband
+        """
+        return dict(self._stats)
+
+    def _suppress(self, reason: str, amount: int = 1) -> None:
+        self._stats[reason]+=amount
+        metrics.increment(COUNTER_SUPPRESSED,reason,amount)
+
+    def _budget_Spent(self) -> bool:
+        return self._max_actuations is not None and self._tick_actuations >= self._max_actuations
+
+    def _held_On(self, group: IoTDeviceGroup, now: float) -> list:
+        """_summary_
+        devices of the group the strategy switched on less than min_on_time ago; the selector passes over them so
+        the next candidates are shed instead. Switch times older than both dwell times are dropped on the way
+        """
+        if not self._switched_at:
+            return []
+        held=[]
+        devices=group.get_Devices()
+        for device_id,switched_at in list(self._switched_at.items()):
+            if now-switched_at >= max(self._min_on_time,self._min_off_time):
+                del self._switched_at[device_id]
+                continue
+            device=devices.get(device_id)
+            if device is not None and device._last_command != 0 and now-switched_at < self._min_on_time:
+                held.append(device)
+        return held
+
+    def _admit(self, device, command: int, now: float, branch: str, resend: bool = False) -> bool:
+        """_summary_
+        whether the dwell time of a device lets it be actuated now; an admitted on/off command starts a new dwell time
+        Args:
+            command (int): 0 switches off, 1 switches on, None changes a setpoint, which has no dwell time
+            branch (str): 'shed' or 'restore', the label of the actuation counter
+            resend (bool): the command is sent again to a load that reports it already; it switches nothing, so it
+                neither starts a dwell time nor takes the budget of the tick
+        """
+        if resend:
+            self._stats['actuations']+=1
+            metrics.increment(COUNTER_ACTUATIONS,branch)
+            return True
+        if command is not None and command != device._last_command:
+            switched_at=self._switched_at.get(device._id)
+            dwell=self._min_on_time if command == 0 else self._min_off_time
+            if switched_at is not None and now-switched_at < dwell:
+                self._suppress('dwell')
+                return False
+        if command is not None:
+            self._switched_at[device._id]=now
+        self._tick_actuations+=1
+        self._stats['actuations']+=1
+        metrics.increment(COUNTER_ACTUATIONS,branch)
+        return True
+
     def execute(self, group: IoTDeviceGroup, cmd: any) -> None:
         total_consumption = sum(group.get_Facade_Consumption().values())
         on_loads,off_loads=group.get_Facade_Max_rating_for_on_loads()
 
-        logger.info(f"Haioooooooooooooooooooooooooooooooooooooooooooooooooooooooooooooooooooooooooo >>>>>>>>>>>>>>>>>>>>>>>>>>>> total consumption {total_consumption}, { self._group_by_Priorities(group)} . >>>>>>>>>>>>>>>>>>>>>>> {cmd}")
+        trace.record(logging.INFO,EVENT_DECISION,None,total_consumption,cmd)
         decoded_cmd=cmd[1]
+        now=self._clock()
+        self._tick_actuations=0
+        # inside the deadband the consumption is left alone, so it does not flip between shedding and restoring
+        if decoded_cmd < total_consumption <= decoded_cmd*(1+self._shed_deadband) or decoded_cmd*(1-self._restore_deadband) <= total_consumption < decoded_cmd:
+             self._stats['deadband_ticks']+=1
+             metrics.increment(COUNTER_DEADBAND_TICKS,'shed' if total_consumption > decoded_cmd else 'restore')
+             return
         ## Shedding control section 
         if total_consumption > decoded_cmd:
              logger.info("Threshold exceeded. Turning off devices...")
-             priority_groups=self._group_by_Priorities(group,False)
-             for priority in priority_groups.keys():
-                for device in priority_groups[priority] :
-                    logger.info(f"Threshold exceeded. Turning off devices...{device._power_consumption}.. ID {device._id}")
-                    if total_consumption > decoded_cmd and device._status !=11:
-                        if device._can_control_power==True and device._status==0:
-                            pass
-                        if device._can_control_power==True and device._status==1:
-                                device._power_consumption_before_last_command=device._power_consumption
-                                device.turn_Off()
-                                device._last_command=0
-                                device._flagged=False
-                                logger.info(f"$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$ Turning off device {device._id} with priority {priority}, and total  consumption {total_consumption}")
-                        if device._can_control_power==True and device._status==2:
-                            abserror=abs(total_consumption-decoded_cmd)
-                            if device._power_consumption > abserror:
-                                para= int((device._power_consumption-abserror)/device._voltage*10)
-                                device.set_parameters(round(para))
-                                device._last_command=0
-                                device._flagged=False
-                                total_consumption -= abserror 
-                                device._power_consumption_before_last_command=device._power_consumption
-                                logger.info(f"PPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPP Setting varible power value {device._id} , total on loads {on_loads} with priority {priority}, and total  consumption {abserror} and control command {para}PPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPP")
-                            else:
-                                device.turn_Off()
-                                device._power_consumption_before_last_command=device._power_consumption
-                                device._last_command=0
-                                device._flagged=False
-                                logger.info(f"$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$ Turning off device {device._id} with priority {priority}, , total on loads {on_loads} and total  consumption {total_consumption}")
-                            
-                        elif device._can_control_power==False:
-                            device.turn_Off()
-                            device._last_command=0
-                            device._flagged=False
-                            if device._last_command==0:
-                                    device._control_attempts+=1
-                            sleep(.25)
-                            logger.info(f"~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Turning off device {device._id} with priority {priority},  , total on loads {on_loads} and total  consumption {total_consumption}")
-                            total_consumption -= device._power_consumption 
-                        else:
-                            pass      
-                    elif device._status ==11:
-                        device._flagged=True
-                    else:
-                        break
+             decision=self._selector.select(group,decoded_cmd,total_consumption,self._held_On(group,now))
+             if decision.passed:
+                 self._suppress('dwell',len(decision.passed))
+             for device in decision.flagged:
+                 device._flagged=True
+             for position,(device,kind,para) in enumerate(decision.actions):
+                 # a load switched off by the strategy that reports off already does not need the command again
+                 redundant=kind!=SHED_SETPOINT and device._last_command==0 and device._status==0
+                 if redundant and self._skip_redundant:
+                     self._suppress('redundant')
+                     continue
+                 if not redundant and self._budget_Spent():
+                     self._suppress('budget',len(decision.actions)-position)
+                     break
+                 if not self._admit(device,None if kind==SHED_SETPOINT else 0,now,'shed',resend=redundant):
+                     continue
+                 if kind==SHED_SETPOINT:
+                     self._actuate(device,device.set_parameters,para,last_command=0,stagger=0)
+                     device._power_consumption_before_last_command=device._power_consumption
+                     trace.record(logging.INFO,EVENT_SETPOINT,device._id,device._priority,para)
+                 elif kind==SHED_OFF_CONTROLLABLE:
+                     device._power_consumption_before_last_command=device._power_consumption
+                     self._actuate(device,device.turn_Off,last_command=0,stagger=0)
+                     trace.record(logging.INFO,EVENT_SHED,device._id,device._priority)
+                 else:
+                     self._actuate(device,device.turn_Off,last_command=0)
+                     device._control_attempts+=1
+                     trace.record(logging.INFO,EVENT_SHED,device._id,device._priority)
+                 device._last_command=0
+                 device._flagged=False
                                   
         ## Incremental control section 
         elif total_consumption < decoded_cmd:
@@ -86,25 +164,29 @@ class LoadPriorityControlEV(ControlStrategy):
                      
                      if device._can_control_power:
                         
-                        logger.info(f"Below threshold. Turning on devices ........{device._id} , status {device._status}, last command {device._last_command}, total consumption {total_consumption}, total on loads {on_loads} >>>>>>>>>>>>>>>>>>>>>>>>")
+                        trace.record(logging.DEBUG,EVENT_CONSIDER,device._id,device._status,device._last_command,total_consumption)
                         if (total_consumption < decoded_cmd and device._last_command==0) and device._status !=11:
                             abserror=abs(total_consumption-decoded_cmd)
                             para= int((device._power_consumption+abserror)/device._voltage*10)-2
                             if para <0:
                                 para=0
+                            if self._budget_Spent():
+                                self._suppress('budget')
+                                break
+                            if not self._admit(device,1 if para >40 else None,now,'restore'):
+                                continue
                             if para >40:
-                                device.set_parameters(40)
-                                device.turn_On()
+                                self._actuate(device,device.set_parameters,40,stagger=0)
+                                self._actuate(device,device.turn_On,last_command=1,replace=False)
                                 device._last_command=1
-                                logger.info(f"$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$ Setting varible power value on device {device._id} with priority {priority}, and total  c")
+                                trace.record(logging.INFO,EVENT_SETPOINT,device._id,priority,40)
                                 on_loads += device._max_power_rating
                             else:
-                                logger.info(f"$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$ Setting varible power value on device {device._id} with priority {priority}, and total  consumption {total_consumption}, , total on loads {on_loads} and parameter {para} abserrot{abserror}")
-                                device.set_parameters(para)
+                                trace.record(logging.INFO,EVENT_SETPOINT,device._id,priority,para)
+                                self._actuate(device,device.set_parameters,para,last_command=0)
                                 on_loads += para*device._voltage/10
                                 device._last_command=0
                             device._flagged=True
-                            sleep(.25)
 
                             
                         elif  device._last_command==1:
@@ -117,13 +199,19 @@ class LoadPriorityControlEV(ControlStrategy):
 
                      else:
                         on_loads += device._max_power_rating
-                        logger.info(f"Below threshold. Turning on devices ........{device._id} , status {device._status}, last command {device._last_command}, total consumption {total_consumption}, , total on loads {on_loads}, decoded comand {decoded_cmd} >>>>>>>>>>>>>>>>>>>>>>>>")
+                        trace.record(logging.DEBUG,EVENT_CONSIDER,device._id,device._status,device._last_command,total_consumption)
                         if (on_loads < decoded_cmd and device._last_command==0) and device._status !=11:
-                            device.turn_On()
+                            if self._budget_Spent():
+                                self._suppress('budget')
+                                break
+                            if not self._admit(device,1,now,'restore'):
+                                # still in its off dwell time, passed over like a device that does not communicate
+                                on_loads -= device._max_power_rating
+                                continue
+                            self._actuate(device,device.turn_On,last_command=1)
                             device._last_command=1
                             device._flagged=True
-                            sleep(.25)
-                            logger.info(f"~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Turning on device {device._id} with priority {priority}, , total on loads {on_loads} and total  consumption {total_consumption}")
+                            trace.record(logging.INFO,EVENT_RESTORE,device._id,priority,on_loads)
                     
                         elif  device._last_command==1:
                             on_loads -= device._max_power_rating
@@ -136,3 +224,5 @@ class LoadPriorityControlEV(ControlStrategy):
                  if on_loads >= decoded_cmd:
                     print("breaking.....................")
                     break
+                 if self._budget_Spent():
+                    break
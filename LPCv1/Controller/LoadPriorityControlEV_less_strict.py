@@ -2,77 +2,50 @@ import sys
 sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from Model.IoTDeviceGroup import IoTDeviceGroup
 from Controller.ControlStrategy import ControlStrategy
+from Controller.SheddingSelector import SheddingSelector, SHED_SETPOINT, SHED_OFF_CONTROLLABLE
 import logging
-from itertools import groupby
-from time import sleep
+from Model.EventTrace import EventTrace, EVENT_DECISION, EVENT_SHED, EVENT_SETPOINT, EVENT_RESTORE, EVENT_CONSIDER
 
 logger = logging.getLogger(__name__)
+trace = EventTrace.get_Default()
 
 class LoadPriorityControlEV(ControlStrategy):
     def __init__(self) -> None:
         super().__init__()
         self._controlType='lpc'
+        self._stagger=.25
+        self._selector=SheddingSelector()
         self.priority_groups = {}
                 
     def _group_by_Priorities(self, group,_reverse=False):
-        sorted_groups={}
-        sorted_smart_plugs = sorted(group._devices.values(),key=lambda plug: plug._priority,reverse=_reverse)
-        for key, sortedgroup in groupby(sorted_smart_plugs, key=lambda plug: plug._priority):
-                sorted_groups[key] = list(sortedgroup)
-        return  sorted_groups
+        # cached on the group version, steady state ticks do not sort
+        return group.get_Priority_Partition(_reverse)
         
     def execute(self, group: IoTDeviceGroup, cmd: any) -> None:
         total_consumption = sum(group.get_Facade_Consumption().values())
-        logger.info(f">>>>>>>>>>>>>>>>>>>>>>>>>>>> total consumption {total_consumption}, { self._group_by_Priorities(group)} . >>>>>>>>>>>>>>>>>>>>>>> {cmd}")
+        trace.record(logging.INFO,EVENT_DECISION,None,total_consumption,cmd)
         decoded_cmd=cmd[1]
         ## Shedding control section 
         if total_consumption > decoded_cmd:
              logger.info("Threshold exceeded. Turning off devices...")
-             priority_groups=self._group_by_Priorities(group,False)
-             for priority in priority_groups.keys():
-                for device in priority_groups[priority] :
-                    logger.info(f"Threshold exceeded. Turning off devices...{device._power_consumption}.. ID {device._id}")
-                    if total_consumption > decoded_cmd and device._status !=11:
-                        if device._can_control_power==True and device._status==0:
-                            pass
-                        if device._can_control_power==True and device._status==1:
-                                device._power_consumption_before_last_command=device._power_consumption
-                                device.turn_Off()
-                                device._last_command=0
-                                device._flagged=False
-                                logger.info(f"$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$ Turning off device {device._id} with priority {priority}, and total  consumption {total_consumption}")
-                        if device._can_control_power==True and device._status==2:
-                            abserror=abs(total_consumption-decoded_cmd)
-                            if device._power_consumption > abserror:
-                                para= int((device._power_consumption-abserror)/device._voltage*10)
-                                device.set_parameters(round(para))
-                                device._last_command=0
-                                device._flagged=False
-                                total_consumption -= abserror 
-                                device._power_consumption_before_last_command=device._power_consumption
-                                logger.info(f"PPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPP Setting varible power value {device._id} with priority {priority}, and total  consumption {abserror} and control command {para}PPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPPP")
-                            else:
-                                device.turn_Off()
-                                device._power_consumption_before_last_command=device._power_consumption
-                                device._last_command=0
-                                device._flagged=False
-                                logger.info(f"$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$ Turning off device {device._id} with priority {priority}, and total  consumption {total_consumption}")
-                            
-                        elif device._can_control_power==False:
-                            device.turn_Off()
-                            device._last_command=0
-                            device._flagged=False
-                            if device._last_command==0:
-                                    device._control_attempts+=1
-                            sleep(.25)
-                            logger.info(f"~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Turning off device {device._id} with priority {priority}, and total  consumption {total_consumption}")
-                            total_consumption -= device._power_consumption 
-                        else:
-                            pass      
-                    elif device._status ==11:
-                        device._flagged=True
-                    else:
-                        break
+             decision=self._selector.select(group,decoded_cmd,total_consumption)
+             for device in decision.flagged:
+                 device._flagged=True
+             for device,kind,para in decision.actions:
+                 if kind==SHED_SETPOINT:
+                     self._actuate(device,device.set_parameters,para,last_command=0,stagger=0)
+                     device._power_consumption_before_last_command=device._power_consumption
+                     trace.record(logging.INFO,EVENT_SETPOINT,device._id,device._priority,para)
+                 elif kind==SHED_OFF_CONTROLLABLE:
+                     device._power_consumption_before_last_command=device._power_consumption
+                     self._actuate(device,device.turn_Off,last_command=0,stagger=0)
+                     trace.record(logging.INFO,EVENT_SHED,device._id,device._priority)
+                 else:
+                     self._actuate(device,device.turn_Off,last_command=0)
+                     device._control_attempts+=1
+                     trace.record(logging.INFO,EVENT_SHED,device._id,device._priority)
+                 device._last_command=0
+                 device._flagged=False
                                   
         ## Incremental control section 
         elif total_consumption < decoded_cmd:
@@ -84,25 +57,24 @@ class LoadPriorityControlEV(ControlStrategy):
                      
                      if device._can_control_power:
                         
-                        logger.info(f"Below threshold. Turning on devices ........{device._id} , status {device._status}, last command {device._last_command}, total consumption {total_consumption} >>>>>>>>>>>>>>>>>>>>>>>>")
+                        trace.record(logging.DEBUG,EVENT_CONSIDER,device._id,device._status,device._last_command,total_consumption)
                         if (total_consumption < decoded_cmd and device._last_command==0) and device._status !=11:
                             abserror=abs(total_consumption-decoded_cmd)
                             para= int((device._power_consumption+abserror)/device._voltage*10)-2
                             if para <0:
                                 para=0
                             if para >40:
-                                device.set_parameters(40)
-                                device.turn_On()
+                                self._actuate(device,device.set_parameters,40,stagger=0)
+                                self._actuate(device,device.turn_On,last_command=1,replace=False)
                                 device._last_command=1
-                                logger.info(f"$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$ Setting varible power value on device {device._id} with priority {priority}, and total  c")
+                                trace.record(logging.INFO,EVENT_SETPOINT,device._id,priority,40)
                                 total_consumption += device._max_power_rating
                             else:
-                                logger.info(f"$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$$ Setting varible power value on device {device._id} with priority {priority}, and total  consumption {total_consumption} and parameter {para} abserrot{abserror}")
-                                device.set_parameters(para)
+                                trace.record(logging.INFO,EVENT_SETPOINT,device._id,priority,para)
+                                self._actuate(device,device.set_parameters,para,last_command=0)
                                 total_consumption += para*device._voltage/10
                                 device._last_command=0
                             device._flagged=True
-                            sleep(.25)
 
                             
                         elif  device._last_command==1:
@@ -115,13 +87,12 @@ class LoadPriorityControlEV(ControlStrategy):
 
                      else:
                         total_consumption += device._max_power_rating
-                        logger.info(f"Below threshold. Turning on devices ........{device._id} , status {device._status}, last command {device._last_command}, total consumption {total_consumption} >>>>>>>>>>>>>>>>>>>>>>>>")
+                        trace.record(logging.DEBUG,EVENT_CONSIDER,device._id,device._status,device._last_command,total_consumption)
                         if (total_consumption < decoded_cmd and device._last_command==0) and device._status !=11:
-                            device.turn_On()
+                            self._actuate(device,device.turn_On,last_command=1)
                             device._last_command=1
                             device._flagged=True
-                            sleep(.25)
-                            logger.info(f"~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Turning on device {device._id} with priority {priority}, and total  consumption {total_consumption}")
+                            trace.record(logging.INFO,EVENT_RESTORE,device._id,priority,total_consumption)
                     
                         elif  device._last_command==1:
                             total_consumption -= device._max_power_rating
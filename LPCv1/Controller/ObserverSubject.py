@@ -2,6 +2,10 @@ from abc import ABC, abstractmethod
 import sys
 sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from Model.Observer import Observer
+from Model.LatencyMetrics import LatencyMetrics, STAGE_OBSERVER_UPDATE, STAGE_INGEST
+import time
+
+metrics = LatencyMetrics.get_Default()
 
 class ObserverSubject(ABC):
     """_summary_
@@ -9,6 +13,7 @@ class ObserverSubject(ABC):
     Args:
         ABC (_type_): _description_
     """    
+    _ingest_label='' # label of the STAGE_INGEST observations of the monitor
     
     def __init__(self) -> None:
         super().__init__()
@@ -23,4 +28,97 @@ class ObserverSubject(ABC):
     
     @abstractmethod
     def notify_Observers(self)->None:
-        pass
\ No newline at end of file
+        pass
+    
+    def process_Messages(self,messages,window: float = 1.0,clock=time.monotonic) -> dict:
+        """_summary_
+        ingest a burst of frames in one pass. Telemetry frames on the same topic received within window seconds of
+        the first of them are coalesced with _coalesce and only the coalesced frame is applied; a frame past the
+        window of its topic applies the frame held for the topic first. Any other frame (e.g. a control command)
+        first flushes the telemetry held so far, so it acts on up to date state.
+        Args:
+            messages (iterable): message bus frames as given to process_Message; the receive time of a frame is its
+                'time' entry when it has one, the clock time it is read at otherwise
+            window (float): seconds of receive time one coalesced frame may span, None coalesces the whole burst
+            clock (callable): time source of the frames without a 'time' entry
+        Returns:
+            dict: frame counts (frames, applied, coalesced, unrouted), the devices whose indexed state changed and
+                the groups whose aggregates changed
+        """        
+        pending={} # topic -> [key, coalesced frame, receive time of its first frame]
+        changed=[]
+        frames=0
+        applied=0
+        coalesced=0
+        unrouted=0
+        for message in messages:
+            frames+=1
+            topic=message['topic']
+            handler,key=self._router.resolve(topic)
+            if handler is None:
+                unrouted+=1
+                continue
+            if handler == self._on_Device_Message:
+                received=message.get('time')
+                if received is None:
+                    received=clock()
+                held=pending.get(topic)
+                if held is not None:
+                    if window is None or received-held[2] <= window:
+                        held[1]=self._coalesce(held[1],message)
+                        coalesced+=1
+                        continue
+                    self._apply_Device_Message(held[0],held[1],changed)
+                    applied+=1
+                pending[topic]=[key,message,received]
+            else:
+                applied+=self._apply_Pending(pending,changed)
+                start=time.perf_counter()
+                handler(key,message)
+                metrics.observe(STAGE_INGEST,time.perf_counter()-start,self._ingest_label)
+                applied+=1
+        applied+=self._apply_Pending(pending,changed)
+        devices={}
+        groups={}
+        for observer in changed:
+            devices[observer._observerid]=observer
+            for group in observer._groups:
+                groups[id(group)]=group
+        return {'frames':frames,
+                'applied':applied,
+                'coalesced':coalesced,
+                'unrouted':unrouted,
+                'changed_devices':list(devices),
+                'changed_groups':list(groups.values())}
+    
+    def _coalesce(self,held:dict,message:dict) -> dict:
+        """_summary_
+        fold a telemetry frame into the frame held for its topic; a frame carries the whole device state, so the last
+        one wins. Monitors whose frames may carry part of the points of a topic override this to merge per point
+        """
+        return message
+    
+    def _apply_Device_Message(self,key,message:dict,changed:list) -> None:
+        start=time.perf_counter()
+        self._on_Device_Message(key,message,changed)
+        metrics.observe(STAGE_INGEST,time.perf_counter()-start,self._ingest_label)
+    
+    def _apply_Pending(self,pending:dict,changed:list) -> int:
+        for key,message,received in pending.values():
+            self._apply_Device_Message(key,message,changed)
+        applied=len(pending)
+        pending.clear()
+        return applied
+    
+    @staticmethod
+    def _update_Observer(observer: Observer,changed,*args) -> None:
+        # changed collects the observers whose indexed state moved, it is None outside of process_Messages
+        start=time.perf_counter()
+        if changed is None:
+            observer.update(*args)
+        else:
+            old_state=observer._index_State()
+            observer.update(*args)
+            if observer._index_State() != old_state:
+                changed.append(observer)
+        metrics.observe(STAGE_OBSERVER_UPDATE,time.perf_counter()-start,getattr(observer,'_deviceType',''))
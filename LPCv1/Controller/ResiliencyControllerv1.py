@@ -1,7 +1,8 @@
 import pulp
+import time
 
 class BatteryOptimizer:
-    def __init__(self, n_hours, battery_capacity, initial_soc, max_loads, weights,vip):
+    def __init__(self, n_hours, battery_capacity, initial_soc, max_loads, weights,vip, fast_path=True):
         """
         Initialize the optimizer with the necessary parameters.
 
@@ -11,6 +12,7 @@ class BatteryOptimizer:
         - initial_soc (float): Initial SOC of the battery.
         - max_loads (dict): Maximum possible loads for each group.
         - weights (dict): Weights for each load group in the objective function.
+        - fast_path (bool): Solve one hour horizons analytically instead of with CBC.
         """
         self.n_hours = n_hours
         self.battery_capacity = battery_capacity
@@ -19,28 +21,30 @@ class BatteryOptimizer:
         self.weights = weights
         self.M = battery_capacity  # Big M value
         self.vip=vip
+        self.fast_path = fast_path
         result=self.vip.rpc.call('storageAgentagent-0.1_1','config_battery1',100,10,1,20).get(timeout=20)
         # Initialize SOC and other variables
         self.current_soc = initial_soc
         self.results = None
+        # the MILP of the current configuration, built on the first optimize() call
+        self._model = None
+        self._solver = pulp.PULP_CBC_CMD(msg=False, warmStart=True)
 
-    def optimize(self):
-        """
-        Perform the battery optimization with gradual shedding.
+    def _model_Key(self) -> tuple:
+        # the model only has to be rebuilt when one of these changes; current_soc is a right-hand side
+        return (self.n_hours, self.battery_capacity, tuple(sorted(self.max_loads.items())), tuple(sorted(self.weights.items())))
 
-        Parameters:
-        - actual_consumption_data (list of dicts): Actual consumption data per hour.
+    def _build_Model(self, key: tuple) -> dict:
+        """
+        Build the MILP for the current configuration. current_soc only enters the right-hand side of the
+        first SOC balance row, so optimize() updates that constant instead of building a new problem.
 
         Returns:
-        - list: Results containing SOC and power supplied to each load group at each time step.
+        - dict: the problem, its decision variables, the SOC balance row of hour 1 and the build time.
         """
-        time_step = 0
-
+        start = time.perf_counter()
+        prob = pulp.LpProblem("Battery_Optimization", pulp.LpMaximize)
 
-        #while self.current_soc > 0.5 * self.battery_capacity:
-        # Create the LP problem for the current time step
-        prob = pulp.LpProblem(f"Battery_Optimization_Time_{time_step}", pulp.LpMaximize)
-        
         # Decision Variables
         P_critical = {}
         P_medium = {}
@@ -49,9 +53,19 @@ class BatteryOptimizer:
         Binary_Medium = {}
         Binary_Low = {}
 
-        # Initialize SOC at time 0 for this optimization step
-        SOC[0] = self.current_soc
-        print("Current SOC Before>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>",self.vip.rpc.call('storageAgentagent-0.1_1','get_batter1_SOC').get(timeout=20))
+        # SOC thresholds for each group
+        SOC_threshold_upper_low = 0.8 * self.battery_capacity  # SOC above which low loads get full power
+        SOC_threshold_lower_low = 0.7 * self.battery_capacity  # SOC below which low loads are fully shed
+
+        SOC_threshold_upper_medium = 0.75 * self.battery_capacity
+        SOC_threshold_lower_medium = 0.65 * self.battery_capacity
+
+        # Correct calculation of slope and intercept for P_medium[t] and P_low[t]
+        slope_medium = self.max_loads['medium'] / (SOC_threshold_upper_medium - SOC_threshold_lower_medium)
+        intercept_medium = -slope_medium * SOC_threshold_lower_medium
+        slope_low = self.max_loads['low'] / (SOC_threshold_upper_low - SOC_threshold_lower_low)
+        intercept_low = -slope_low * SOC_threshold_lower_low
+
         for t in range(1, self.n_hours + 1):
             # Power supplied to each load group at time t
             P_critical[t] = pulp.LpVariable(f'P_critical_{t}', lowBound=0, upBound=self.max_loads['critical'])
@@ -65,20 +79,16 @@ class BatteryOptimizer:
             Binary_Medium[t] = pulp.LpVariable(f'Binary_Medium_{t}', cat='Binary')
             Binary_Low[t] = pulp.LpVariable(f'Binary_Low_{t}', cat='Binary')
 
-            # SOC balance equation
+            # SOC balance equation, the SOC at time 0 is the right-hand side of the first one
             total_power = P_critical[t] + P_medium[t] + P_low[t]
-            prob += SOC[t] == SOC[t-1] - total_power, f"SOC_balance_{t}"
+            if t == 1:
+                prob += SOC[t] + total_power == self.current_soc, f"SOC_balance_{t}"
+            else:
+                prob += SOC[t] == SOC[t-1] - total_power, f"SOC_balance_{t}"
 
             # Discharge rate constraints
             prob += total_power <= 0.2 * self.battery_capacity, f"Total_Discharge_Max_{t}"
 
-            # SOC thresholds for each group
-            SOC_threshold_upper_low = 0.8 * self.battery_capacity  # SOC above which low loads get full power
-            SOC_threshold_lower_low = 0.7 * self.battery_capacity  # SOC below which low loads are fully shed
-
-            SOC_threshold_upper_medium = 0.75 * self.battery_capacity
-            SOC_threshold_lower_medium = 0.65 * self.battery_capacity
-
             # Critical load is always supplied fully unless SOC is critically low
             prob += P_critical[t] == self.max_loads['critical'], f"P_Critical_{t}"
 
@@ -89,18 +99,11 @@ class BatteryOptimizer:
             prob += SOC[t] >= SOC_threshold_lower_low - self.M * (1 - Binary_Low[t]), f"SOC_Low_Binary_Lower_{t}"
             prob += SOC[t] <= SOC_threshold_upper_low + self.M * Binary_Low[t], f"SOC_Low_Binary_Upper_{t}"
 
-            # Correct calculation of slope and intercept for P_medium[t]
-            slope_medium = self.max_loads['medium'] / (SOC_threshold_upper_medium - SOC_threshold_lower_medium)
-            intercept_medium = -slope_medium * SOC_threshold_lower_medium
-
             prob += P_medium[t] >= 0, f"P_Medium_Lower_{t}"
             prob += P_medium[t] <= self.max_loads['medium'] * Binary_Medium[t], f"P_Medium_Upper_{t}"
             prob += P_medium[t] <= slope_medium * SOC[t] + intercept_medium + self.M * (1 - Binary_Medium[t]), f"P_Medium_SOC_{t}"
 
             # Similarly for P_low[t]
-            slope_low = self.max_loads['low'] / (SOC_threshold_upper_low - SOC_threshold_lower_low)
-            intercept_low = -slope_low * SOC_threshold_lower_low
-
             prob += P_low[t] >= 0, f"P_Low_Lower_{t}"
             prob += P_low[t] <= self.max_loads['low'] * Binary_Low[t], f"P_Low_Upper_{t}"
             prob += P_low[t] <= slope_low * SOC[t] + intercept_low + self.M * (1 - Binary_Low[t]), f"P_Low_SOC_{t}"
@@ -117,54 +120,160 @@ class BatteryOptimizer:
         ])
         prob += total_weighted_load, "Total_Weighted_Load"
 
-        # Solve the problem
-        prob.solve()
+        return {'key': key,
+                'prob': prob,
+                'P_critical': P_critical,
+                'P_medium': P_medium,
+                'P_low': P_low,
+                'balance': prob.constraints['SOC_balance_1'],
+                'build_time': time.perf_counter() - start}
+
+    def _solve_Model(self, soc):
+        """
+        Solve the MILP from the given SOC, building it first if the configuration changed.
+
+        Returns:
+        - dict: status and first hour power of each group, whether the model was rebuilt, build and solve time.
+        """
+        key = self._model_Key()
+        rebuilt = self._model is None or self._model['key'] != key
+        if rebuilt:
+            self._model = self._build_Model(key)
+        model = self._model
+        prob = model['prob']
+
+        # SOC[1] + total_power == soc is stored as SOC[1] + total_power - soc == 0
+        model['balance'].constant = -soc
+
+        # Solve the problem, CBC starts from the variable values of the last solve
+        start = time.perf_counter()
+        prob.solve(self._solver)
+        solve_time = time.perf_counter() - start
+
+        return {'status': pulp.LpStatus[prob.status],
+                'P_critical': pulp.value(model['P_critical'][1]),
+                'P_medium': pulp.value(model['P_medium'][1]),
+                'P_low': pulp.value(model['P_low'][1]),
+                'solver': 'cbc',
+                'rebuilt': rebuilt,
+                'build_time': model['build_time'] if rebuilt else 0.0,
+                'solve_time': solve_time}
+
+    def _solve_Single_Step(self, soc):
+        """
+        Solve the one hour problem in closed form. P_critical is fixed at its maximum and SOC[1] = soc - total power,
+        so fixing the two binaries turns every row of the MILP into a half-plane in (P_medium, P_low). The optimum of
+        the linear objective over each of the four polygons is one of its vertices, the intersections of two rows,
+        and the best feasible vertex over the four binary choices is the optimum of the MILP.
+
+        Returns:
+        - dict: status and power of each group, the same fields as _solve_Model.
+        """
+        start = time.perf_counter()
+        capacity = self.battery_capacity
+        critical = self.max_loads['critical']
+        # SOC[1] = remaining - P_medium - P_low
+        remaining = soc - critical
+        tolerance = 1e-9 * max(1.0, capacity)
+
+        # (max load, lower and upper SOC threshold) of the medium and low groups, as in _build_Model
+        medium = (self.max_loads['medium'], 0.65 * capacity, 0.75 * capacity)
+        low = (self.max_loads['low'], 0.7 * capacity, 0.8 * capacity)
+
+        best = None
+        for binary_medium in (0, 1):
+            for binary_low in (0, 1):
+                # rows a * P_medium + b * P_low <= c, only the tightest c of every (a, b) is kept
+                rows = [(-1, 0, 0), (0, -1, 0),
+                        (1, 0, medium[0]), (0, 1, low[0]),
+                        (1, 1, remaining), (-1, -1, capacity - remaining),   # 0 <= SOC <= capacity
+                        (1, 1, 0.2 * capacity - critical),                   # discharge rate
+                        (-1, 1, 0)]                                          # P_low <= P_medium
+                for (max_load, lower, upper), binary, own in ((medium, binary_medium, (1, 0)), (low, binary_low, (0, 1))):
+                    slope = max_load / (upper - lower)
+                    intercept = -slope * lower
+                    rows.append((1, 1, remaining - lower + self.M * (1 - binary)))
+                    rows.append((-1, -1, upper + self.M * binary - remaining))
+                    rows.append((own[0], own[1], max_load * binary))
+                    # P <= slope * SOC + intercept + M * (1 - binary) with SOC = remaining - P_medium - P_low
+                    rows.append((own[0] + slope, own[1] + slope, slope * remaining + intercept + self.M * (1 - binary)))
+                tightest = {}
+                for a, b, c in rows:
+                    if (a, b) not in tightest or c < tightest[(a, b)]:
+                        tightest[(a, b)] = c
+                rows = [(a, b, c) for (a, b), c in tightest.items()]
+
+                for i in range(len(rows)):
+                    a1, b1, c1 = rows[i]
+                    for a2, b2, c2 in rows[i + 1:]:
+                        det = a1 * b2 - a2 * b1
+                        if abs(det) < 1e-12:
+                            continue
+                        p_medium = (c1 * b2 - c2 * b1) / det
+                        p_low = (a1 * c2 - a2 * c1) / det
+                        if all(a * p_medium + b * p_low <= c + tolerance for a, b, c in rows):
+                            value = self.weights['medium'] * p_medium + self.weights['low'] * p_low
+                            if best is None or value > best[0] + tolerance:
+                                best = (value, max(0.0, p_medium), max(0.0, p_low))
+
+        return {'status': 'Optimal' if best is not None else 'Infeasible',
+                'P_critical': critical if best is not None else None,
+                'P_medium': best[1] if best is not None else None,
+                'P_low': best[2] if best is not None else None,
+                'solver': 'analytic',
+                'rebuilt': False,
+                'build_time': 0.0,
+                'solve_time': time.perf_counter() - start}
+
+    def optimize(self):
+        """
+        Perform the battery optimization with gradual shedding.
+        A one hour horizon is solved analytically by _solve_Single_Step unless fast_path is off; longer horizons use
+        the MILP, which is built once per configuration (n_hours, battery_capacity, max_loads, weights) and only
+        re-solved from current_soc, warm-started from the previous solution.
+
+        Returns:
+        - dict: SOC, power supplied to each load group in the first hour, the solver used and the build and solve times.
+        """
+        time_step = 0
+
+        print("Current SOC Before>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>",self.vip.rpc.call('storageAgentagent-0.1_1','get_batter1_SOC').get(timeout=20))
+        if self.n_hours == 1 and self.fast_path:
+            decision = self._solve_Single_Step(self.current_soc)
+        else:
+            decision = self._solve_Model(self.current_soc)
 
         # Check if the problem is feasible
-        if pulp.LpStatus[prob.status] != 'Optimal':
+        if decision['status'] != 'Optimal':
             print(f"Problem is infeasible at time step {time_step}")
          #   break
 
-        # Retrieve optimized power supplied for the first hour
-        P_critical_value = pulp.value(P_critical[1])
-        P_medium_value = pulp.value(P_medium[1])
-        P_low_value = pulp.value(P_low[1])
         self.current_soc = self.vip.rpc.call('storageAgentagent-0.1_1','get_batter1_SOC').get(timeout=20)# max(0, self.current_soc - total_consumption)
         print("Current SOC After>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>",self.current_soc)
 
-        # Record results
-        # self.results.append({
-        #     'Time_Step': time_step,
-        #     'Optimization_Status': pulp.LpStatus[prob.status],
-        #     'P_critical_Optimized': P_critical_value,
-        #     'P_medium_Optimized': P_medium_value,
-        #     'P_low_Optimized': P_low_value,
-        #     'Actual_Consumption_Critical': consumption_critical,
-        #     'Actual_Consumption_Medium': consumption_medium,
-        #     'Actual_Consumption_Low': consumption_low,
-        #     'SOC': self.current_soc
-        # })
-        
         self.results={
             'Time_Step': time_step,
-            'Optimization_Status': pulp.LpStatus[prob.status],
-            'P_critical_Optimized': P_critical_value,
-            'P_medium_Optimized': P_medium_value,
-            'P_low_Optimized': P_low_value,
-            'SOC': self.current_soc
+            'Optimization_Status': decision['status'],
+            'P_critical_Optimized': decision['P_critical'],
+            'P_medium_Optimized': decision['P_medium'],
+            'P_low_Optimized': decision['P_low'],
+            'SOC': self.current_soc,
+            'Solver': decision['solver'],
+            'Model_Rebuilt': decision['rebuilt'],
+            'Build_Time': decision['build_time'],
+            'Solve_Time': decision['solve_time']
         }
 
-
-        # Check if SOC has reached the minimum threshold
-        #if self.current_soc <= 0.5 * self.battery_capacity:
-            #break
-
         time_step += 1
 
         return self.results
 
-# Example usage:
+# Example usage; tests/test_ResiliencyControllerv1.py compares the single step fast path with the MILP
 if __name__ == "__main__":
+    import sys
+    sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+    from Benchmark.FakeVIP import FakeVIP
+
     n_hours = 1  # Number of hours to optimize ahead in each step
     battery_capacity = 100  # Total battery capacity in kWh
     initial_soc = 100       # Initial SOC in kWh
@@ -183,31 +292,10 @@ if __name__ == "__main__":
         'low': 1
     }
 
-    # Actual consumption data per hour
-    actual_consumption_data = [
-        {'critical': 1, 'medium': 1, 'low': 2},
-        {'critical': 2, 'medium': 1, 'low': 0},  # Low priority load shed
-        {'critical': 2.5, 'medium': 0, 'low': 0},  # Medium and low priority loads shed
-        # Add more data if needed
-    ]
-
-    # Create an optimizer instance
-    optimizer = BatteryOptimizer(n_hours, battery_capacity, initial_soc, max_loads, weights,1)
-    
-    for i in range(5):
-        # Perform optimization
-        print("time 444444444444444444444444444444444444")
-        results = optimizer.optimize()
-
-        # Print the results
-        for res in results:
-            print(f"Time Step: {res['Time_Step']}")
-            print(f"Optimization Status: {res['Optimization_Status']}")
-            print(f"Optimized Power for Critical Loads: {res['P_critical_Optimized']} kW")
-            print(f"Optimized Power for Medium Loads: {res['P_medium_Optimized']} kW")
-            print(f"Optimized Power for Low Loads: {res['P_low_Optimized']} kW")
-            print(f"Actual Consumption for Critical Loads: {res['Actual_Consumption_Critical']} kW")
-            print(f"Actual Consumption for Medium Loads: {res['Actual_Consumption_Medium']} kW")
-            print(f"Actual Consumption for Low Loads: {res['Actual_Consumption_Low']} kW")
-            print(f"SOC: {res['SOC']} kWh")
-            print("-" * 50)
+    # Create an optimizer instance, the fake vip stands in for the storage agent
+    optimizer = BatteryOptimizer(n_hours, battery_capacity, initial_soc, max_loads, weights, FakeVIP())
+    res = optimizer.optimize()
+    print(f"Optimization Status: {res['Optimization_Status']} ({res['Solver']}, {res['Solve_Time'] * 1000:.3f} ms)")
+    print(f"Optimized Power for Critical Loads: {res['P_critical_Optimized']} kW")
+    print(f"Optimized Power for Medium Loads: {res['P_medium_Optimized']} kW")
+    print(f"Optimized Power for Low Loads: {res['P_low_Optimized']} kW")
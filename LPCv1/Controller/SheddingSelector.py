@@ -0,0 +1,179 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Model.IoTDeviceGroup import IoTDeviceGroup
+from dataclasses import dataclass, field
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHED_OFF=1               # load without power control, switched off and taken off the running total
+SHED_OFF_CONTROLLABLE=2  # power controllable load switched off, the running total is left as is
+SHED_SETPOINT=3          # power controllable load set to a lower setpoint that closes the remaining gap
+
+
+@dataclass
+class SheddingDecision:
+    actions: list = field(default_factory=list)  # (device, kind, para) in shedding order
+    flagged: list = field(default_factory=list)  # devices reporting status 11 that were passed over
+    passed: list = field(default_factory=list)   # excluded devices that were passed over
+    total_consumption: float = 0                 # running total once the actions are applied
+
+
+class SheddingSelector:
+    """_summary_
+    Computes the shedding decisions of LoadPriorityControlEV on the columns of the device state table.
+    The devices are ordered once by priority (ties keep the group insertion order, as the sorted() of the
+    strategy loop does) and the running consumption seen by every device comes from one prefix scan, so
+    the selection is a few vectorized passes instead of a per-device Python loop. The prefix scan subtracts
+    left to right like the loop does, which keeps the floating point results and thus the decisions identical.
+    """
+
+    def select(self, group: IoTDeviceGroup, decoded_cmd: float, total_consumption: float, exclude: list = None) -> SheddingDecision:
+        """_summary_
+
+        Args:
+            group (IoTDeviceGroup): group to shed
+            decoded_cmd (float): consumption limit
+            total_consumption (float): current consumption of the group
+            exclude (list): devices that may not be shed now (e.g. still in their dwell time); they are passed over
+                like devices that do not communicate, without being flagged, so the next candidates are shed instead
+        Returns:
+            SheddingDecision: the devices to act on, the devices to flag and the excluded devices passed over
+        """
+        decision=SheddingDecision(total_consumption=total_consumption)
+        table,devices,slots=group.get_State_View()
+        if total_consumption <= decoded_cmd or len(slots) == 0:
+            return decision
+
+        table.flush(('priority','status','power','voltage','can_control_power'))
+        order=np.argsort(table.get_Column('priority')[slots],kind='stable')
+        ordered=slots[order]
+        priority=table.get_Column('priority')[ordered]
+        status=table.get_Column('status')[ordered]
+        power=table.get_Column('power')[ordered]
+        voltage=table.get_Column('voltage')[ordered]
+        can_control=table.get_Column('can_control_power')[ordered]
+        blocked=status == 11
+        held=np.isin(ordered,[device._slot for device in exclude]) & ~blocked if exclude else np.zeros(len(ordered),dtype=bool)
+        skipped=blocked | held
+        plain=~can_control & ~skipped
+        kinds=np.select([plain,can_control & ~held & ((status == 1) | (status == 2))],[SHED_OFF,SHED_OFF_CONTROLLABLE],0)
+        decrement=np.where(plain,power,0.0)
+
+        count=len(ordered)
+        start=0
+        total=total_consumption
+        cut=count
+        while start < count:
+            running=np.subtract.accumulate(np.concatenate(([total],decrement[start:])))
+            over=running[:-1] > decoded_cmd
+            stop=count-start if over.all() else int(np.argmin(over))
+            partial=can_control[start:start+stop] & ~held[start:start+stop] & (status[start:start+stop] == 2) & (power[start:start+stop] > running[:stop]-decoded_cmd)
+            if partial.any():
+                offset=int(np.argmax(partial))
+                self._add_Actions(decision,devices,order,kinds,blocked,held,start,start+offset)
+                abserror=abs(running[offset]-decoded_cmd)
+                index=start+offset
+                para=int((power[index]-abserror)/voltage[index]*10)
+                decision.actions.append((devices[order[index]],SHED_SETPOINT,para))
+                total=running[offset]-abserror
+                start=index+1
+                if total > decoded_cmd:
+                    continue
+                cut=start
+            else:
+                self._add_Actions(decision,devices,order,kinds,blocked,held,start,start+stop)
+                total=running[stop]
+                cut=start+stop
+            break
+
+        # past the cut every priority group is scanned up to its first device that is neither blocked nor excluded
+        segment_starts=np.flatnonzero(np.concatenate(([True],priority[1:] != priority[:-1])))
+        segment_ends=np.append(segment_starts[1:],count)
+        for segment_start,segment_end in zip(segment_starts.tolist(),segment_ends.tolist()):
+            if segment_end <= cut:
+                continue
+            begin=max(segment_start,cut)
+            run=skipped[begin:segment_end]
+            length=len(run) if run.all() else int(np.argmin(run))
+            decision.flagged.extend(devices[i] for i in order[begin:begin+length][blocked[begin:begin+length]].tolist())
+            decision.passed.extend(devices[i] for i in order[begin:begin+length][held[begin:begin+length]].tolist())
+        decision.total_consumption=float(total)
+        return decision
+
+    @staticmethod
+    def _add_Actions(decision, devices, order, kinds, blocked, held, begin, end) -> None:
+        decision.flagged.extend(devices[i] for i in order[begin:end][blocked[begin:end]].tolist())
+        decision.passed.extend(devices[i] for i in order[begin:end][held[begin:end]].tolist())
+        acting=np.flatnonzero(kinds[begin:end])+begin
+        decision.actions.extend((devices[i],kind,None) for i,kind in zip(order[acting].tolist(),kinds[acting].tolist()))
+
+
+def _select_Sequential(group: IoTDeviceGroup, decoded_cmd: float, total_consumption: float, exclude: list = None) -> SheddingDecision:
+    # the shedding loop of LoadPriorityControlEV without the side effects, used to check and time the selector
+    decision=SheddingDecision(total_consumption=total_consumption)
+    excluded={device._id for device in exclude or ()}
+    devices=sorted(group._devices.values(),key=lambda plug: plug._priority)
+    priorities={}
+    for device in devices:
+        priorities.setdefault(device._priority,[]).append(device)
+    for priority in priorities:
+        for device in priorities[priority]:
+            if device._id in excluded and device._status != 11:
+                decision.passed.append(device)
+                continue
+            if total_consumption > decoded_cmd and device._status != 11:
+                if device._can_control_power == True and device._status == 1:
+                    decision.actions.append((device,SHED_OFF_CONTROLLABLE,None))
+                if device._can_control_power == True and device._status == 2:
+                    abserror=abs(total_consumption-decoded_cmd)
+                    if device._power_consumption > abserror:
+                        decision.actions.append((device,SHED_SETPOINT,int((device._power_consumption-abserror)/device._voltage*10)))
+                        total_consumption -= abserror
+                    else:
+                        decision.actions.append((device,SHED_OFF_CONTROLLABLE,None))
+                elif device._can_control_power == False:
+                    decision.actions.append((device,SHED_OFF,None))
+                    total_consumption -= device._power_consumption
+            elif device._status == 11:
+                decision.flagged.append(device)
+            else:
+                break
+    decision.total_consumption=total_consumption
+    return decision
+
+
+if __name__ == "__main__":
+    # equivalence check and timing against the sequential loop at 100k devices
+    import random
+    import time
+    from Model.SmartPlug import SmartPlug
+    from Model.EVCharger import EVCharger
+
+    random.seed(1)
+    group=IoTDeviceGroup()
+    for i in range(100000):
+        if i % 10 == 0:
+            device=EVCharger(f'building/ev/{i}',None)
+            device.update(random.randint(0,40),60,random.randint(1,5),240,0,0,0,random.choice([0,1,2,2,11]))
+        else:
+            device=SmartPlug(f'building/plug/{i}',None)
+            device.update(random.randint(0,500),random.choice([0,1,1,1,11]),random.randint(1,5))
+        group.add_Device(device)
+    total=sum(group.get_Facade_Consumption().values())
+    selector=SheddingSelector()
+    group.get_State_View()
+    held=random.sample(list(group.get_Devices().values()),2000)
+    for exclude in (None,held):
+        for limit in (total*0.1,total*0.5,total*0.9,total*0.999):
+            start=time.perf_counter()
+            fast=selector.select(group,limit,total,exclude)
+            fast_time=time.perf_counter()-start
+            start=time.perf_counter()
+            reference=_select_Sequential(group,limit,total,exclude)
+            reference_time=time.perf_counter()-start
+            same=[(d._id,k,p) for d,k,p in fast.actions] == [(d._id,k,p) for d,k,p in reference.actions] and \
+                 [d._id for d in fast.flagged] == [d._id for d in reference.flagged] and \
+                 [d._id for d in fast.passed] == [d._id for d in reference.passed]
+            print(f"limit {limit:.0f}, {len(exclude or ())} excluded: {len(fast.actions)} actions, identical {same}, selector {fast_time*1000:.1f} ms, loop {reference_time*1000:.1f} ms")
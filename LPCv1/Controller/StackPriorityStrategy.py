@@ -0,0 +1,225 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Model.IoTDeviceGroup import IoTDeviceGroup
+from Controller.ControlStrategy import ControlStrategy
+from Model.EventTrace import EventTrace, EVENT_DECISION, EVENT_SHED, EVENT_RESTORE
+import itertools
+import threading
+import time
+import weakref
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+trace = EventTrace.get_Default()
+
+STATUS_NOT_COMMUNICATING=11
+
+
+class _DeviceHeap:
+    """_summary_
+    binary heap of devices with lazy removal: a removed or updated device only marks its entry dead, dead
+    entries are dropped when they reach the top or once they outnumber the live ones
+    """
+    def __init__(self) -> None:
+        self._heap=[]
+        self._entries={} # device id -> [key, sequence, device, alive]
+        self._sequence=itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, device) -> bool:
+        return device._id in self._entries
+
+    def push(self, device, key: tuple) -> None:
+        self.remove(device)
+        entry=[key,next(self._sequence),device,True]
+        self._entries[device._id]=entry
+        heapq.heappush(self._heap,entry)
+
+    def remove(self, device) -> bool:
+        entry=self._entries.pop(device._id,None)
+        if entry is None:
+            return False
+        entry[3]=False
+        if len(self._heap) > 2*len(self._entries)+64:
+            self._heap=[entry for entry in self._heap if entry[3]]
+            heapq.heapify(self._heap)
+        return True
+
+    def peek(self):
+        heap=self._heap
+        while heap and not heap[0][3]:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def pop(self):
+        device=self.peek()
+        if device is not None:
+            heapq.heappop(self._heap)
+            del self._entries[device._id]
+        return device
+
+    def rebuild(self, keyed_devices) -> None:
+        # (device, key) pairs, heapified in O(n)
+        self._entries={}
+        for device,key in keyed_devices:
+            self._entries[device._id]=[key,next(self._sequence),device,True]
+        self._heap=list(self._entries.values())
+        heapq.heapify(self._heap)
+
+
+class StackPriorityStrategy(ControlStrategy):
+    """_summary_
+    Priority stack control. Above the threshold the running loads are switched off from the highest priority value
+    down, lowest power first within a priority; below it the loads that are off are switched back on from the lowest
+    priority value up, smallest max rating first, as long as their rating still fits under the threshold.
+    The running and the off loads are kept in two heaps keyed by (priority, power) that follow the group: the
+    strategy listens to the membership and device state changes of the group it controls, so a change costs
+    O(log n) and shedding k devices O(k log n). A device the strategy switched is held as pending until it reports
+    a new state; a command that was dropped or ignored leaves the state unchanged, so once pending_timeout has passed
+    the device goes back into the heap its last reported state belongs to and can be picked again. Devices reporting
+    status 11 (not communicating) are never actuated.
+    """
+    def __init__(self, pending_timeout: float = 30.0, clock=time.monotonic) -> None:
+        """_summary_
+
+        Args:
+            pending_timeout (float): seconds a switched device waits for its new state before it is placed again
+            clock (callable): monotonic time source of the pending deadlines
+        """
+        super().__init__()
+        self._controlType='stack'
+        self._stagger=.25
+        self._pending_timeout=pending_timeout
+        self._clock=clock
+        self._group=None # weak reference to the group the heaps follow
+        self._shed_heap=_DeviceHeap()    # running loads, key (-priority, power)
+        self._restore_heap=_DeviceHeap() # loads that are off, key (priority, max rating)
+        self._pending={} # device id -> (deadline, device) of the devices switched and not heard from since
+        self.non_communicable_devices={}
+        self._lock=threading.Lock()
+
+    def _place(self, device) -> None:
+        self._shed_heap.remove(device)
+        self._restore_heap.remove(device)
+        self._pending.pop(device._id,None)
+        self.non_communicable_devices.pop(device._id,None)
+        if device._status == STATUS_NOT_COMMUNICATING:
+            self.non_communicable_devices[device._id]=device
+        elif device._status != 0:
+            self._shed_heap.push(device,(-device._priority,device._power_consumption))
+        else:
+            self._restore_heap.push(device,(device._priority,device._max_power_rating))
+
+    def _forget(self, device) -> None:
+        self._shed_heap.remove(device)
+        self._restore_heap.remove(device)
+        self._pending.pop(device._id,None)
+        self.non_communicable_devices.pop(device._id,None)
+
+    def _hold(self, device) -> None:
+        # a device just picked for switching, out of both heaps until it reports back or the deadline passes
+        self._pending[device._id]=(self._clock()+self._pending_timeout,device)
+
+    def _place_Expired(self) -> None:
+        if not self._pending:
+            return
+        now=self._clock()
+        for deadline,device in [entry for entry in self._pending.values() if entry[0] <= now]:
+            self._place(device)
+
+    def update_priorities(self, group: IoTDeviceGroup) -> None:
+        """_summary_
+        rebuild both heaps from the devices of the group, only needed when the strategy starts following a group
+        """
+        running=[]
+        off=[]
+        self._pending={}
+        self.non_communicable_devices={}
+        for device in group.get_Devices().values():
+            if device._status == STATUS_NOT_COMMUNICATING:
+                self.non_communicable_devices[device._id]=device
+            elif device._status != 0:
+                running.append((device,(-device._priority,device._power_consumption)))
+            else:
+                off.append((device,(device._priority,device._max_power_rating)))
+        self._shed_heap.rebuild(running)
+        self._restore_heap.rebuild(off)
+
+    def _unfollow(self) -> None:
+        previous=self._group() if self._group is not None else None
+        if previous is not None:
+            previous.remove_Listener(self)
+            previous.remove_State_Listener(self)
+        self._group=None
+
+    def _follow(self, group: IoTDeviceGroup) -> None:
+        self._unfollow()
+        self._group=weakref.ref(group)
+        group.add_Listener(self)
+        group.add_State_Listener(self)
+        self.update_priorities(group)
+
+    def release(self, group: IoTDeviceGroup) -> None:
+        with self._lock:
+            if self._group is not None and self._group() is group:
+                self._unfollow()
+                self._shed_heap.rebuild([])
+                self._restore_heap.rebuild([])
+                self._pending={}
+                self.non_communicable_devices={}
+
+    def _on_Device_Added(self, group: IoTDeviceGroup, device) -> None:
+        with self._lock:
+            self._place(device)
+
+    def _on_Device_Removed(self, group: IoTDeviceGroup, device) -> None:
+        with self._lock:
+            self._forget(device)
+
+    def _on_Device_Changed(self, group: IoTDeviceGroup, device, old_state: tuple, new_state: tuple) -> None:
+        with self._lock:
+            self._place(device)
+
+    def execute(self, group: IoTDeviceGroup, cmd: any) -> None:
+        total_consumption=sum(group.get_Facade_Consumption().values())
+        threshold=cmd[1]
+        trace.record(logging.INFO,EVENT_DECISION,None,total_consumption,cmd)
+        shed=[]
+        restore=[]
+        # the devices are picked under the lock and actuated after it, so device updates are not held up by the pacing
+        with self._lock:
+            if self._group is None or self._group() is not group:
+                self._follow(group)
+            self._place_Expired()
+            if total_consumption > threshold:
+                while total_consumption > threshold:
+                    device=self._shed_heap.pop()
+                    if device is None:
+                        break
+                    self._hold(device)
+                    total_consumption-=device._power_consumption
+                    shed.append(device)
+            elif total_consumption < threshold:
+                while True:
+                    device=self._restore_heap.peek()
+                    if device is None or total_consumption+device._max_power_rating > threshold:
+                        break
+                    self._restore_heap.pop()
+                    self._hold(device)
+                    total_consumption+=device._max_power_rating
+                    restore.append((device,total_consumption))
+        if shed:
+            logger.info("Threshold exceeded. Turning off devices...")
+        for device in shed:
+            self._actuate(device,device.turn_Off,last_command=0)
+            device._last_command=0
+            trace.record(logging.INFO,EVENT_SHED,device._id,device._priority)
+        if restore:
+            logger.info("Below threshold. Turning on devices...")
+        for device,on_loads in restore:
+            self._actuate(device,device.turn_On,last_command=1)
+            device._last_command=1
+            trace.record(logging.INFO,EVENT_RESTORE,device._id,device._priority,on_loads)
@@ -0,0 +1,136 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Controller.ControlStrategy import ControlStrategy
+from Controller.DirectControl import DirectControl
+from Controller.IncrementalControl import IncrementalControl
+from Controller.SheddingControl import SheddingControl
+from Controller.LoadPriorityControlEV import LoadPriorityControlEV
+from Controller.StackPriorityStrategy import StackPriorityStrategy
+from functools import partial
+import importlib
+import threading
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StrategyRegistry:
+    """_summary_
+    Maps control types ('direct', 'increment', 'shed', 'lpc', 'stack', ...) to strategy factories and hands out one
+    long-lived strategy instance per (control type, group), so a strategy can keep state between control
+    ticks (orderings, pending commands, learned ratings) instead of being rebuilt for every command.
+    Instances are held weakly on the group and go away with it. New control types are added with
+    register or the register_Strategy decorator, e.g. from a module loaded through load_Plugins.
+    """
+    _default_registry=None
+
+    def __init__(self) -> None:
+        self._factories={}
+        self._instances={} # control type -> WeakKeyDictionary(group -> strategy)
+        self._lock=threading.Lock()
+
+    @classmethod
+    def get_Default(cls) -> "StrategyRegistry":
+        if cls._default_registry is None:
+            cls._default_registry=cls.create_Builtin()
+        return cls._default_registry
+
+    @classmethod
+    def create_Builtin(cls, clock=None) -> "StrategyRegistry":
+        """_summary_
+        a registry holding the built-in control types
+        Args:
+            clock (callable): time source handed to the strategies that keep time (dwell times, pending deadlines),
+                e.g. the VirtualClock of a replay; their own default (time.monotonic) if None
+        """
+        timed={} if clock is None else {'clock':clock}
+        registry=cls()
+        registry.register('direct',DirectControl)
+        registry.register('increment',IncrementalControl)
+        registry.register('shed',SheddingControl)
+        registry.register('lpc',partial(LoadPriorityControlEV,**timed) if timed else LoadPriorityControlEV)
+        registry.register('stack',partial(StackPriorityStrategy,**timed) if timed else StackPriorityStrategy)
+        return registry
+
+    def register(self, control_type: str, factory, replace: bool = False) -> None:
+        """_summary_
+
+        Args:
+            control_type (str): the command type, cmd[0] of the control messages
+            factory (callable): builds a ControlStrategy, usually the strategy class
+            replace (bool): allow replacing an existing control type; its live instances are dropped
+        """
+        with self._lock:
+            if control_type in self._factories and not replace:
+                raise KeyError(f"control type {control_type} is already registered")
+            self._factories[control_type]=factory
+            instances=self._instances.pop(control_type,None)
+        self._release(instances.items() if instances else [])
+
+    def unregister(self, control_type: str) -> None:
+        with self._lock:
+            self._factories.pop(control_type,None)
+            instances=self._instances.pop(control_type,None)
+        self._release(instances.items() if instances else [])
+
+    def get_Control_Types(self) -> list:
+        return list(self._factories)
+
+    def get_Factory(self, control_type: str):
+        return self._factories.get(control_type)
+
+    def get_Strategy(self, control_type: str, group) -> ControlStrategy:
+        """_summary_
+        Returns:
+            ControlStrategy: the strategy instance of the group for this control type, None if the type is unknown
+        """
+        with self._lock:
+            factory=self._factories.get(control_type)
+            if factory is None:
+                return None
+            instances=self._instances.setdefault(control_type,weakref.WeakKeyDictionary())
+            strategy=instances.get(group)
+            if strategy is None:
+                strategy=instances[group]=factory()
+            return strategy
+
+    def release_Group(self, group) -> None:
+        # drop the strategies of a group, e.g. when it leaves the manager
+        released=[]
+        with self._lock:
+            for instances in self._instances.values():
+                strategy=instances.pop(group,None)
+                if strategy is not None:
+                    released.append((group,strategy))
+        self._release(released)
+
+    @staticmethod
+    def _release(pairs) -> None:
+        # (group, strategy) pairs that were dropped; run outside the registry lock, release may take the group locks
+        for group,strategy in list(pairs):
+            try:
+                strategy.release(group)
+            except Exception as e:
+                logger.error(f"releasing {type(strategy).__name__} failed {e}")
+
+    def load_Plugins(self, modules: list) -> None:
+        """_summary_
+        import strategy plugin modules; a plugin registers its strategies on import with register_Strategy
+        """
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                logger.error(f"could not load the strategy plugin {module}: {e}")
+
+
+def register_Strategy(control_type: str, replace: bool = False):
+    """_summary_
+    class decorator registering a ControlStrategy on the default registry, e.g.
+    @register_Strategy('peak') above a ControlStrategy subclass
+    """
+    def decorator(strategy):
+        StrategyRegistry.get_Default().register(control_type,strategy,replace)
+        return strategy
+    return decorator
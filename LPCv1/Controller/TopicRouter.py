@@ -0,0 +1,92 @@
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _TrieNode:
+    __slots__=('children','route')
+
+    def __init__(self) -> None:
+        self.children={}
+        self.route=None
+
+
+class TopicRouter:
+    """_summary_
+    Dispatches message bus topics to handlers through a prefix trie of topic segments.
+    A topic is split and matched once; the (handler, key) it resolves to is kept in an LRU cache keyed
+    on the topic string, so the frames that keep arriving on the same topics cost one dict lookup.
+    """
+    def __init__(self, cache_size: int = 4096) -> None:
+        """_summary_
+
+        Args:
+            cache_size (int): number of resolved topics to keep
+        """
+        self._root=_TrieNode()
+        self._cache=OrderedDict()
+        self._cache_size=cache_size
+
+    def add_Route(self, prefix: str, handler, key=None) -> None:
+        """_summary_
+        route the topics starting with prefix to handler; the longest matching prefix wins
+        Args:
+            prefix (str): topic prefix, e.g. 'devices' or 'control/building540', '' matches every topic
+            handler (callable): called as handler(key, message)
+            key (callable): maps the split topic to the key handed to the handler, the topic itself if None
+        """
+        node=self._root
+        for part in prefix.split('/') if prefix else []:
+            node=node.children.setdefault(part,_TrieNode())
+        node.route=(handler,key)
+        self._cache.clear()
+
+    def resolve(self, topic: str) -> tuple:
+        """_summary_
+        Returns:
+            tuple: (handler, key) for the topic, (None, None) when no route matches
+        """
+        resolved=self._cache.get(topic)
+        if resolved is not None:
+            self._cache.move_to_end(topic)
+            return resolved
+        parts=topic.split('/')
+        node=self._root
+        route=node.route
+        for part in parts:
+            node=node.children.get(part)
+            if node is None:
+                break
+            if node.route is not None:
+                route=node.route
+        if route is None:
+            resolved=(None,None)
+        else:
+            handler,key=route
+            resolved=(handler,key(parts) if key is not None else topic)
+        self._cache[topic]=resolved
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return resolved
+
+    def dispatch(self, message: dict) -> bool:
+        """_summary_
+        Returns:
+            bool: whether a route handled the message
+        """
+        handler,key=self.resolve(message['topic'])
+        if handler is None:
+            return False
+        handler(key,message)
+        return True
+
+
+def device_Key(parts: list) -> str:
+    # devices/<campus>/<building>/<device>/all -> <campus>/<building>/<device>, the observer id of the device
+    return parts[-4]+'/'+parts[-3]+'/'+parts[-2]
+
+
+def control_Key(parts: list) -> str:
+    # control/<building>/<control type> -> <control type>
+    return parts[-1]
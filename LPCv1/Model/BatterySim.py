@@ -144,3 +144,171 @@ class Battery:
         capacity_loss = 0.2 * (self.cycle_count ** 0.5) / 100  # 0.2% per sqrt(cycle)
         self.state_of_health = max(0.8, 1.0 - capacity_loss)
         self.capacity_Wh_actual = self.capacity_Wh_nominal * self.state_of_health
+
+
+class BatteryFleet:
+    """
+    Many Battery models stepped together. Every per battery quantity of Battery is a NumPy array here and one
+    step charges or discharges the whole fleet, following Battery.charge/discharge operation for operation so
+    the results match the scalar model. The one exception is the square root of the health update: NumPy and
+    Python's pow can round it differently, so state_of_health and capacity_Wh_actual may be off by an ulp or
+    two from the scalar values (run this module to compare a fleet against Battery objects). The Peukert
+    capacity Battery.discharge computes does not enter its result, so the fleet does not compute it either.
+    """
+    def __init__(self, capacity_kWh, max_discharge_kW, voltage_nominal,
+                 peukert_exponent, initial_charge_efficiency, initial_discharge_efficiency,
+                 initial_soc=1.0, state_of_health=1.0, temperature_C=25, min_soc_percent=20, size=None):
+        # Every argument is a scalar shared by the fleet or an array with one value per battery;
+        # size sets the number of batteries when all of them are scalars
+        parameters = np.broadcast_arrays(*[np.asarray(value, dtype=np.float64) for value in (
+            capacity_kWh, max_discharge_kW, voltage_nominal, peukert_exponent, initial_charge_efficiency,
+            initial_discharge_efficiency, initial_soc, state_of_health, temperature_C, min_soc_percent,
+            np.zeros(1 if size is None else size))])
+        (capacity_kWh, max_discharge_kW, voltage_nominal, peukert_exponent, initial_charge_efficiency,
+         initial_discharge_efficiency, initial_soc, state_of_health, temperature_C, min_soc_percent,
+         _) = [np.array(value, dtype=np.float64).reshape(-1) for value in parameters]
+        self.capacity_kWh_nominal = capacity_kWh
+        self.capacity_Wh_nominal = capacity_kWh * 1000
+        self.state_of_health = state_of_health
+        self.capacity_Wh_actual = self.capacity_Wh_nominal * self.state_of_health
+        self.max_discharge_kW = max_discharge_kW
+        self.voltage_nominal = voltage_nominal
+        self.peukert_exponent = peukert_exponent
+        self.initial_charge_efficiency = initial_charge_efficiency
+        self.initial_discharge_efficiency = initial_discharge_efficiency
+        self.charge_efficiency = initial_charge_efficiency.copy()
+        self.discharge_efficiency = initial_discharge_efficiency.copy()
+        self.soc = initial_soc * self.capacity_Wh_actual
+        self.temperature_C = temperature_C
+        self.min_soc = min_soc_percent / 100 * self.capacity_Wh_actual
+        self.cycle_count = np.zeros_like(self.soc)
+
+    @classmethod
+    def from_batteries(cls, batteries):
+        # Fleet with the current state of the given Battery objects
+        fleet = cls([battery.capacity_kWh_nominal for battery in batteries],
+                    [battery.max_discharge_kW for battery in batteries],
+                    [battery.voltage_nominal for battery in batteries],
+                    [battery.peukert_exponent for battery in batteries],
+                    [battery.initial_charge_efficiency for battery in batteries],
+                    [battery.initial_discharge_efficiency for battery in batteries],
+                    0.0,
+                    [battery.state_of_health for battery in batteries],
+                    [battery.temperature_C for battery in batteries],
+                    0.0)
+        fleet.capacity_Wh_actual = np.array([battery.capacity_Wh_actual for battery in batteries], dtype=np.float64)
+        fleet.soc = np.array([battery.soc for battery in batteries], dtype=np.float64)
+        fleet.min_soc = np.array([battery.min_soc for battery in batteries], dtype=np.float64)
+        fleet.cycle_count = np.array([battery.cycle_count for battery in batteries], dtype=np.float64)
+        fleet.charge_efficiency = np.array([battery.charge_efficiency for battery in batteries], dtype=np.float64)
+        fleet.discharge_efficiency = np.array([battery.discharge_efficiency for battery in batteries], dtype=np.float64)
+        return fleet
+
+    def __len__(self):
+        return len(self.soc)
+
+    def get_internal_resistance(self):
+        r_min = 0.005
+        r_max = 0.05
+        soc_percent = self.get_soc_percent() / 100
+        return r_min + (1 - soc_percent) * (r_max - r_min)
+
+    def get_voltage(self):
+        soc = self.get_soc_percent()
+        return -0.0001 * soc**3 + 0.01 * soc**2 + -0.1 * soc + self.voltage_nominal
+
+    def get_soc_percent(self):
+        return (self.soc / self.capacity_Wh_actual) * 100
+
+    def adjust_efficiencies_for_temperature(self):
+        temp_diff = np.abs(self.temperature_C - 25) * 0.005
+        self.charge_efficiency = np.maximum(0.8, np.minimum(self.initial_charge_efficiency - temp_diff, self.initial_charge_efficiency))
+        self.discharge_efficiency = np.maximum(0.8, np.minimum(self.initial_discharge_efficiency - temp_diff, self.initial_discharge_efficiency))
+
+    def step(self, power_W, duration_h):
+        # power_W > 0 discharges that battery like Battery.discharge, power_W < 0 charges it with -power_W like
+        # Battery.charge. Returns the power each battery supplied (> 0) or took for charging (< 0) in Watts
+        self.adjust_efficiencies_for_temperature()
+        return self._step(np.asarray(power_W, dtype=np.float64), duration_h, self.max_discharge_kW * 1000)
+
+    def _step(self, power_W, duration_h, max_power_W):
+        soc = self.soc
+        discharging = power_W >= 0
+
+        # Battery.discharge: the requested power limited by the inverter and by the energy above min_soc
+        energy_available_Wh = soc - self.min_soc
+        actual_power_W = np.minimum(power_W / self.discharge_efficiency, max_power_W)
+        energy_drawn_Wh = actual_power_W * duration_h
+        over = energy_drawn_Wh > energy_available_Wh
+        energy_drawn_Wh = np.where(over, energy_available_Wh, energy_drawn_Wh)
+        actual_power_W = np.where(over, energy_available_Wh / duration_h, actual_power_W)
+        drawn = discharging & (energy_available_Wh > 0)
+        energy_drawn_Wh = np.where(drawn, energy_drawn_Wh, 0.0)
+        supplied_W = np.where(drawn, actual_power_W, 0.0) * self.discharge_efficiency
+
+        # Battery.charge: the accepted energy limited by the room left in the battery
+        charging = ~discharging
+        power_available_W = -power_W
+        energy_added_Wh = power_available_W * self.charge_efficiency * duration_h
+        energy_needed_Wh = self.capacity_Wh_actual - soc
+        full = energy_added_Wh > energy_needed_Wh
+        energy_added_Wh = np.where(charging, np.where(full, energy_needed_Wh, energy_added_Wh), 0.0)
+        used_W = np.where(full, energy_needed_Wh / duration_h / self.charge_efficiency, power_available_W)
+
+        self.soc = soc - energy_drawn_Wh + energy_added_Wh
+
+        # update_cycle_count runs for every charge and for discharges that drew energy; only those refresh the health
+        self.cycle_count = self.cycle_count + np.abs(energy_drawn_Wh + energy_added_Wh) / self.capacity_Wh_actual / 2
+        state_of_health = np.maximum(0.8, 1.0 - 0.2 * (self.cycle_count ** 0.5) / 100)
+        self.state_of_health = np.where(charging | drawn, state_of_health, self.state_of_health)
+        self.capacity_Wh_actual = self.capacity_Wh_nominal * self.state_of_health
+
+        return np.where(charging, -used_W, supplied_W)
+
+    def run(self, power_W, duration_h, record=False):
+        """
+        Step the fleet over a power matrix, one row of per battery power (the sign convention of step) per time
+        step of duration_h hours. power_W can also be any iterable of rows, e.g. chunks read from disk, so a year
+        of minute data never has to be in memory at once.
+
+        Returns:
+        - dict: per battery delivered, unserved and charged energy in Wh, the lowest SoC in percent and, with
+          record, the power and SoC percent of every step.
+        """
+        self.adjust_efficiencies_for_temperature()
+        max_power_W = self.max_discharge_kW * 1000
+        size = len(self)
+        # summed in W and scaled to Wh at the end
+        delivered_W = np.zeros(size)
+        unserved_W = np.zeros(size)
+        charged_W = np.zeros(size)
+        min_soc_percent = self.get_soc_percent()
+        power_trace = []
+        soc_trace = []
+        steps = 0
+        for row in power_W:
+            row = np.asarray(row, dtype=np.float64)
+            power = self._step(row, duration_h, max_power_W)
+            supplied = np.maximum(power, 0.0)
+            delivered_W += supplied
+            unserved_W += np.maximum(row - supplied, 0.0)
+            charged_W -= np.minimum(power, 0.0)
+            soc_percent = self.get_soc_percent()
+            np.minimum(min_soc_percent, soc_percent, out=min_soc_percent)
+            if record:
+                power_trace.append(power)
+                soc_trace.append(soc_percent)
+            steps += 1
+        results = {'steps': steps,
+                   'delivered_Wh': delivered_W * duration_h,
+                   'unserved_Wh': unserved_W * duration_h,
+                   'charged_Wh': charged_W * duration_h,
+                   'min_soc_percent': min_soc_percent,
+                   'soc_percent': self.get_soc_percent(),
+                   'state_of_health': self.state_of_health.copy(),
+                   'cycle_count': self.cycle_count.copy()}
+        if record:
+            results['power_W'] = np.array(power_trace).reshape(steps, size)
+            results['soc_percent_trace'] = np.array(soc_trace).reshape(steps, size)
+        return results
+
@@ -0,0 +1,176 @@
+import numpy as np
+from operator import attrgetter
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceStateTable:
+    """_summary_
+    Struct-of-arrays copy of the state of every IoT device. Each device owns one dense slot; the device
+    attributes stay the source of truth and a device change only marks its slot dirty (IoTDevice does it
+    when it notifies its groups). A vectorized pass (shedding selection, snapshot encoding) calls flush
+    with the columns it needs, which copies those columns of the dirty slots in one batch, then works on
+    whole columns with numpy masks and reductions instead of walking device objects.
+    """
+    _COLUMNS={
+        'power': np.float64,
+        'status': np.int64,
+        'priority': np.float64,
+        'max_rating': np.float64,
+        'current': np.float64,
+        'voltage': np.float64,
+        'frequency': np.float64,
+        'energy': np.float64,
+        'temperature': np.float64,
+        'power_multiply_factor': np.float64,
+        'can_control_power': np.bool_,
+    }
+    # device attribute each column is loaded from; the fields the control strategies write directly
+    # (last command, flags, attempts) are not mirrored, read them from the devices
+    _ATTRIBUTES={
+        'power': '_power_consumption',
+        'status': '_status',
+        'priority': '_priority',
+        'max_rating': '_max_power_rating',
+        'current': '_current',
+        'voltage': '_voltage',
+        'frequency': '_frequency',
+        'energy': '_energy_consumption',
+        'temperature': '_temperature',
+        'power_multiply_factor': '_power_multiply_factor',
+        'can_control_power': '_can_control_power',
+    }
+    # value loaded for a missing field, e.g. a GLEAMM frame without a status; 11 is not communicating
+    _MISSING={'status': 11}
+    _default_table=None
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """_summary_
+
+        Args:
+            capacity (int): number of slots allocated up front, the table doubles when it runs out
+        """
+        self._capacity=max(1,capacity)
+        self._columns={name: self._new_Column(dtype,self._capacity) for name,dtype in self._COLUMNS.items()}
+        self._in_use=np.zeros(self._capacity,dtype=np.bool_)
+        self._owners=[None]*self._capacity # weak references to the devices, by slot
+        self._dirty=set() # slots of the devices changed since the last flush
+        self._stale={name: set() for name in self._COLUMNS} # slots to copy on the next flush of each column
+        self._free_slots=[]
+        self._next_slot=0
+
+    @classmethod
+    def get_Default(cls) -> "DeviceStateTable":
+        """_summary_
+        table shared by every device that is not given one explicitly
+        """
+        if cls._default_table is None:
+            cls._default_table=cls()
+        return cls._default_table
+
+    @staticmethod
+    def _new_Column(dtype, size: int) -> np.ndarray:
+        if dtype is object:
+            column=np.empty(size,dtype=object)
+            column[:]=0
+            return column
+        return np.zeros(size,dtype=dtype)
+
+    def _grow(self) -> None:
+        new_capacity=self._capacity*2
+        for name,dtype in self._COLUMNS.items():
+            column=self._new_Column(dtype,new_capacity)
+            column[:self._capacity]=self._columns[name]
+            self._columns[name]=column
+        in_use=np.zeros(new_capacity,dtype=np.bool_)
+        in_use[:self._capacity]=self._in_use
+        self._in_use=in_use
+        self._owners.extend([None]*(new_capacity-self._capacity))
+        self._capacity=new_capacity
+        logger.debug(f"device state table grown to {new_capacity} slots")
+
+    def allocate_Slot(self, device=None) -> int:
+        """_summary_
+
+        Args:
+            device (IoTDevice): device owning the slot, flush loads its attributes into the slot
+        Returns:
+            int: the slot
+        """
+        if self._free_slots:
+            slot=self._free_slots.pop()
+        else:
+            if self._next_slot == self._capacity:
+                self._grow()
+            slot=self._next_slot
+            self._next_slot+=1
+        self._in_use[slot]=True
+        if device is not None:
+            self._owners[slot]=weakref.ref(device)
+            self._dirty.add(slot)
+        return slot
+
+    def release_Slot(self, slot: int) -> None:
+        if not self._in_use[slot]:
+            return
+        for name,dtype in self._COLUMNS.items():
+            self._columns[name][slot]=0
+            self._stale[name].discard(slot)
+        self._dirty.discard(slot)
+        self._owners[slot]=None
+        self._in_use[slot]=False
+        self._free_slots.append(slot)
+
+    def get_Column(self, name: str) -> np.ndarray:
+        """_summary_
+        the raw column; indexes are device slots, unused slots hold zeros. flush the column first
+        """
+        return self._columns[name]
+
+    def mark_Dirty(self, slot: int) -> None:
+        self._dirty.add(slot)
+
+    def flush(self, names) -> None:
+        """_summary_
+        copy the attributes changed since the last flush into the named columns, one batch per column
+        Args:
+            names (iterable): columns to bring up to date
+        """
+        if self._dirty:
+            for stale in self._stale.values():
+                stale|=self._dirty
+            self._dirty=set()
+        for name in names:
+            dirty=self._stale[name]
+            if not dirty:
+                continue
+            self._stale[name]=set()
+            slots=[]
+            devices=[]
+            for slot in dirty:
+                owner=self._owners[slot]
+                device=owner() if owner is not None else None
+                if device is not None:
+                    slots.append(slot)
+                    devices.append(device)
+            if devices:
+                values=list(map(attrgetter(self._ATTRIBUTES[name]),devices))
+                self._columns[name][np.array(slots,dtype=np.int64)]=self._to_Column(name,values)
+
+    def _to_Column(self, name: str, values: list):
+        dtype=self._COLUMNS[name]
+        if dtype is np.bool_:
+            return np.array([bool(value) for value in values],dtype=np.bool_)
+        column=np.array(values,dtype=np.float64) # None loads as nan
+        missing=np.isnan(column)
+        if missing.any():
+            logger.warning(f"{int(missing.sum())} devices without a {name}, loaded as {self._MISSING.get(name,0)}")
+            column[missing]=self._MISSING.get(name,0)
+        if dtype is np.int64:
+            rounded=np.rint(column)
+            if (rounded != column).any():
+                logger.warning(f"non integer {name} values {column[rounded != column][:5].tolist()} rounded")
+            return rounded.astype(np.int64)
+        return column
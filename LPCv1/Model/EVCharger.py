@@ -4,10 +4,14 @@ from Model.Observer import Observer
 from Model.IoTDevice import IoTDevice
 from Model.IoTMessage import IoTMessage
 from View.Send import Send
+from Model.DeviceStateTable import DeviceStateTable
 from datetime import datetime
+import weakref
 import logging
+from Model.EventTrace import EventTrace, EVENT_DEVICE_UPDATE
 
 logger = logging.getLogger(__name__)
+trace = EventTrace.get_Default()
 
 
 class EVCharger(IoTDevice,Observer):
@@ -18,14 +22,18 @@ class EVCharger(IoTDevice,Observer):
         Observer (_type_): _description_
     """
     
-    def __init__(self, id:str, vip) -> None:
+    def __init__(self, id:str, vip, table: DeviceStateTable=None) -> None:
         super().__init__()
         """_summary_
 
         Args:
             id (int): device Id
             vip (obj): volttron vip connection for communication in the volttron message bus
+            table (DeviceStateTable): state table holding the device fields, the shared default table if None
         """  
+        self._table=table if table is not None else DeviceStateTable.get_Default()
+        self._slot=self._table.allocate_Slot(self)
+        weakref.finalize(self,self._table.release_Slot,self._slot)
         self._id=id
         self._status=0
         self._power_consumption=0
@@ -52,33 +60,43 @@ class EVCharger(IoTDevice,Observer):
         self._power_consumption_before_last_command=0
         
     def turn_On(self) -> None:
-        self._message.message_type='command'
-        self._message.payload={'cmd':40}
-        self._message.priority=self._priority
-        self.publish()
-        self._last_command=self._message
-        self._status=1
-        logger.info(">>>>>>>>>>>>>>>>>>>>>> Turning on EV charger")
+        with self._state_lock:
+            self._message.message_type='command'
+            self._message.payload={'cmd':40}
+            self._message.priority=self._priority
+            self.publish()
+            self._last_command=self._message
+            old_state=self._index_State()
+            self._status=1
+            self._notify_Groups(old_state)
+            logger.info(">>>>>>>>>>>>>>>>>>>>>> Turning on EV charger")
     
     def turn_Off(self) -> None:
-        self._message.message_type='command'
-        self._message.payload={'cmd':0}
-        self._message.priority=self._priority
-        self.publish()
-        self._last_command=self._message
-        self._status=0
-        logger.info(">>>>>>>>>>>>>>>>>>>>>> Turning of EV charger")
+        with self._state_lock:
+            self._message.message_type='command'
+            self._message.payload={'cmd':0}
+            self._message.priority=self._priority
+            self.publish()
+            self._last_command=self._message
+            old_state=self._index_State()
+            self._status=0
+            self._notify_Groups(old_state)
+            logger.info(">>>>>>>>>>>>>>>>>>>>>> Turning of EV charger")
     
     def set_parameters(self,para: int) -> None:
-        self._message.message_type='command'
-        self._message.payload={'cmd':para}
-        self._message.priority=self._priority
-        self.publish()
-        self._last_command=self._message
-        logger.info(">>>>>>>>>>>>>>>>>>>>>> Changing Power of the EV")
+        with self._state_lock:
+            self._message.message_type='command'
+            self._message.payload={'cmd':para}
+            self._message.priority=self._priority
+            self.publish()
+            self._last_command=self._message
+            logger.info(">>>>>>>>>>>>>>>>>>>>>> Changing Power of the EV")
     
     def set_Power_Consumption(self, power: int) -> None:
-        self._power_consumption = power
+        with self._state_lock:
+            old_state=self._index_State()
+            self._power_consumption = power
+            self._notify_Groups(old_state)
     
     def get_Power_Consumption(self) -> int:
         return super().get_Power_Consumption()
@@ -87,31 +105,36 @@ class EVCharger(IoTDevice,Observer):
         return super().get_Device_Id()
     
     def set_Priority(self, priority: int) -> None:
-        return super().set_Priority(priority)
+        with self._state_lock:
+            old_state=self._index_State()
+            self._priority=priority
+            self._notify_Groups(old_state)
     
     def get_Priority(self) -> int:
         return super().get_Priority()
     
     def update(self, current: int, frequency: int, priority: int, voltage: float, powercommand :int, energyconsumption: int, temperature: int, status: int) -> None:
 
-        self.set_Power_Consumption(voltage*current/100)
-        self._current=current
-        self._voltage=voltage
-        self._frequency=frequency
-        self._currentcommand=powercommand
-        self._priority=priority
-        self._energy_consumption=energyconsumption
-        self._status= status
-        self._temperature=temperature
-        if  self._power_consumption > self._max_power_rating:
-            self._max_power_rating= self._power_consumption
-        logger.info(f"updating the EV charger{ self._id}: power {self._power_consumption} : priority { self._priority} : status {self._status}: powr_multiply_factor {self._power_multiply_factor}")
+        with self._state_lock:
+            old_state=self._index_State()
+            self._power_consumption=voltage*current/100
+            self._current=current
+            self._voltage=voltage
+            self._frequency=frequency
+            self._currentcommand=powercommand
+            self._priority=priority
+            self._energy_consumption=energyconsumption
+            self._status= status
+            self._temperature=temperature
+            if  self._power_consumption > self._max_power_rating:
+                self._max_power_rating= self._power_consumption
+            self._notify_Groups(old_state)
+            trace.record(logging.INFO,EVENT_DEVICE_UPDATE,self._id,self._power_consumption,priority,status)
 
     def publish(self) -> bool:
         """_summary_
         this method publish the message to the volttron message bus
         Returns:
-            bool: state of sending data
+            the RPC results, or a greenlet resolving to them when the commands go through a CommandDispatcher
         """        
-        self._send.publish(self._message,self._deviceType)
-        return bool
\ No newline at end of file
+        return self._send.publish(self._message,self._deviceType)
\ No newline at end of file
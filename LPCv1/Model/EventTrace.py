@@ -0,0 +1,82 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# event kinds
+EVENT_DEVICE_UPDATE='device_update'
+EVENT_DECISION='decision'
+EVENT_SHED='shed'
+EVENT_SETPOINT='setpoint'
+EVENT_RESTORE='restore'
+EVENT_CONSIDER='consider'
+
+
+class EventTrace:
+    """_summary_
+    Structured replacement for the f-string logger.info calls on the telemetry and control hot paths.
+    Events are (time, level, kind, device id, values) tuples written into a preallocated ring buffer, so
+    recording one costs a level check and a slot assignment; nothing is formatted until the buffer is dumped.
+    Events below the level are dropped, and sample_every > 1 keeps only every n-th event of each kind.
+    """
+    _default_trace=None
+
+    def __init__(self, capacity: int = 65536, level: int = logging.INFO, sample_every: int = 1) -> None:
+        self._capacity=capacity
+        self._buffer=[None]*capacity
+        self._index=0
+        self._level=level
+        self._sample_every=sample_every
+        self._sample_counts={}
+
+    @classmethod
+    def get_Default(cls) -> "EventTrace":
+        if cls._default_trace is None:
+            cls._default_trace=cls()
+        return cls._default_trace
+
+    def set_Level(self, level: int) -> None:
+        self._level=level
+
+    def set_Sampling(self, sample_every: int) -> None:
+        self._sample_every=max(1,sample_every)
+        self._sample_counts={}
+
+    def is_Enabled(self, level: int) -> bool:
+        return level >= self._level
+
+    def record(self, level: int, kind: str, device_id, *values) -> None:
+        if level < self._level:
+            return
+        if self._sample_every > 1:
+            count=self._sample_counts.get(kind,0)
+            self._sample_counts[kind]=count+1
+            if count % self._sample_every:
+                return
+        self._buffer[self._index % self._capacity]=(time.time(),level,kind,device_id,values)
+        self._index+=1
+
+    def dump(self, last: int = None) -> list:
+        """_summary_
+        Args:
+            last (int): number of most recent events to return, everything still in the buffer if None
+        Returns:
+            list: events as dicts, oldest first
+        """
+        available=min(self._index,self._capacity)
+        count=available if last is None else min(last,available)
+        events=[]
+        for position in range(self._index-count,self._index):
+            timestamp,level,kind,device_id,values=self._buffer[position % self._capacity]
+            events.append({'time':timestamp,'level':logging.getLevelName(level),'kind':kind,'device':device_id,'values':values})
+        return events
+
+    def dump_To_Logger(self, target: logging.Logger = None, last: int = None) -> None:
+        target=logger if target is None else target
+        for event in self.dump(last):
+            target.info(f"{event['time']:.3f} {event['level']} {event['kind']} {event['device']} {event['values']}")
+
+    def clear(self) -> None:
+        self._buffer=[None]*self._capacity
+        self._index=0
+        self._sample_counts={}
@@ -3,16 +3,31 @@ sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 
 from Model.IoTDeviceGroup import IoTDeviceGroup
 from Model.FacadeRepository import FacadeRepository
+import dataclasses
+import base64
 import logging
 
 logger = logging.getLogger(__name__)
 
 class GroupRepository(FacadeRepository):
     
-    def __init__(self, vip,agentid) -> None:
+    def __init__(self, vip,agentid,delta=False,keyframe_interval=60) -> None:
+        """_summary_
+
+        Args:
+            vip (obj): volttron vip connection for communication in the volttron message bus
+            agentid (str): agent id used in the record topic
+            delta (bool): publish only what changed since the previous snapshot instead of the full snapshot
+            keyframe_interval (int): in delta mode, publish a full keyframe every keyframe_interval snapshots
+        """        
         super().__init__()
         self._vip=vip
         self._agentid=agentid
+        self._delta=delta
+        self._keyframe_interval=keyframe_interval
+        self._sequence=0
+        self._last_snapshot=None
+        self._keyframe_requested=True
         
     def add_Facade(self, facade: IoTDeviceGroup) -> None:
         return super().add_Facade(facade)
@@ -21,7 +36,62 @@ class GroupRepository(FacadeRepository):
         return super().remove_facade(facade)
     
     def update_Facade(self, message) -> None:
+        if self._delta:
+            message=self._encode_Delta(message)
         result = self._vip.pubsub.publish(peer='pubsub',topic= 'record/'+str(self._agentid)+'/NIREEMS/data', message=message) 
     
+    def update_Facade_Binary(self, payload: bytes) -> None:
+        """_summary_
+        publish a SnapshotCodec payload next to the JSON record, base64 encoded for the message bus
+        """        
+        result = self._vip.pubsub.publish(peer='pubsub',topic= 'record/'+str(self._agentid)+'/NIREEMS/data_bin', message=base64.b64encode(payload).decode('ascii'))
+    
     def get_Facade(self, facade: IoTDeviceGroup) -> None:
-        return super().get_Facade(facade)
\ No newline at end of file
+        return super().get_Facade(facade)
+    
+    def request_Keyframe(self) -> None:
+        """_summary_
+        make the next delta mode publish a full keyframe, e.g. when a consumer lost track of the sequence
+        """        
+        self._keyframe_requested=True
+    
+    def _encode_Delta(self, snapshot: dict) -> dict:
+        """_summary_
+        wrap the snapshot for delta mode. A keyframe carries the whole snapshot; a delta carries only the
+        devices and fields that changed plus the key paths that disappeared since the previous snapshot.
+        Consumers apply deltas in sequence order and resync on the next keyframe when they see a gap.
+        """        
+        self._sequence+=1
+        keyframe=self._keyframe_requested or self._last_snapshot is None or self._sequence % self._keyframe_interval == 0
+        if keyframe:
+            payload={'seq':self._sequence,'keyframe':True,'data':snapshot,'removed':[]}
+        else:
+            removed=[]
+            payload={'seq':self._sequence,'keyframe':False,'data':self._diff(snapshot,self._last_snapshot,[],removed),'removed':removed}
+        self._keyframe_requested=False
+        self._last_snapshot=self._freeze(snapshot)
+        return payload
+    
+    @classmethod
+    def _freeze(cls, value):
+        # copy kept to compare the next snapshot against; the command field holds the IoTMessage that the device keeps mutating
+        if isinstance(value,dict):
+            return {key: cls._freeze(item) for key,item in value.items()}
+        if dataclasses.is_dataclass(value) and not isinstance(value,type):
+            return (type(value),dataclasses.astuple(value))
+        return value
+    
+    @classmethod
+    def _diff(cls, new: dict, old: dict, path: list, removed: list) -> dict:
+        changes={}
+        for key,value in new.items():
+            if isinstance(value,dict) and isinstance(old.get(key),dict):
+                nested=cls._diff(value,old[key],path+[key],removed)
+                if nested:
+                    changes[key]=nested
+            elif key not in old or cls._freeze(value) != old[key]:
+                changes[key]=value
+        for key in old:
+            if key not in new:
+                removed.append(path+[key])
+        return changes
@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
+from gevent.lock import RLock
+import weakref
 
 class IoTDevice(ABC):
     
     def __init__(self) -> None:
         super().__init__()
+        self._groups=weakref.WeakSet() # groups holding this device, kept informed of aggregate changes
+        # held around every read, change and group notification of the device state (telemetry updates and
+        # commands), so a device in several groups is never changed from two control paths at once
+        self._state_lock=RLock()
     
     @abstractmethod
     def turn_On(self)->None:
@@ -35,4 +41,31 @@ class IoTDevice(ABC):
     
     @abstractmethod
     def set_parameters(self, para: int)->None:
-        pass
\ No newline at end of file
+        pass
+    
+    def _index_State(self) -> tuple:
+        """_summary_
+        the part of the device state that the group aggregate indexes are built on
+        Returns:
+            tuple: (priority, power consumption, max power rating, status)
+        """        
+        return (self._priority, self._power_consumption, self._max_power_rating, self._status)
+    
+    def _attach_Group(self, group) -> None:
+        self._groups.add(group)
+    
+    def _detach_Group(self, group) -> None:
+        self._groups.discard(group)
+    
+    def _notify_Groups(self, old_state: tuple) -> None:
+        """_summary_
+        push the change of the indexed state to every group holding this device and mark the device
+        for the next flush of its state table
+        Args:
+            old_state (tuple): value of _index_State() before the change
+        """        
+        self._table.mark_Dirty(self._slot)
+        new_state=self._index_State()
+        if new_state != old_state:
+            for group in self._groups:
+                group._update_Index(old_state,new_state,self)
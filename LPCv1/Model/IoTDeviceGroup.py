@@ -4,8 +4,9 @@ sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from Model.IoTFacade import IoTFacade
 from Model.IoTDevice import IoTDevice
 from Model.SmartPlug import SmartPlug
+from Model.DeviceStateTable import DeviceStateTable
+import numpy as np
 import logging
-from itertools import groupby
 logger = logging.getLogger(__name__)
 
 
@@ -15,9 +16,23 @@ class IoTDeviceGroup(IoTFacade):
     Args:
         IoTFacade (_type_): _description_
     """    
+    REBUILD_INTERVAL=100000 # device updates between two recomputations of the running totals
+    
     def __init__(self) -> None:
         super().__init__()
         self._devices={}
+        # running per-priority totals, kept up to date by the devices through _update_Index
+        self._device_count_by_priority={}
+        self._consumption_by_priority={}
+        self._max_rating_by_priority={}
+        self._on_loads_max_rating=0
+        self._total_max_rating=0
+        self._updates_since_rebuild=0 # the running totals are recomputed once this passes max(REBUILD_INTERVAL, number of devices)
+        self._state_view=None # (table, devices, slots) for vectorized passes, dropped on membership change
+        self._version=0 # bumped on every membership or device priority change
+        self._partition=None # (version, ascending, descending) priority partition of the devices
+        self._listeners=[] # told about membership changes through _on_Device_Added/_on_Device_Removed, e.g. the merged view of IoTDeviceGroupManager
+        self._state_listeners=[] # told about every indexed state change of a member through _on_Device_Changed, e.g. StackPriorityStrategy
         
     def turn_On(self, device_id: int) -> None:
         if bool(self._devices):
@@ -49,12 +64,28 @@ class IoTDeviceGroup(IoTFacade):
         return self._devices[device_id].set_Priority()
     
     def add_Device(self, device: IoTDevice) -> None:
+        replaced=self._devices.get(device._id)
+        if replaced is not None:
+            self._detach_Device(replaced)
         self._devices[device._id]=device
+        self._add_To_Index(device._index_State())
+        device._attach_Group(self)
+        self._state_view=None
+        self._version+=1
+        for listener in self._listeners:
+            if replaced is not None:
+                listener._on_Device_Removed(self,replaced)
+            listener._on_Device_Added(self,device)
     
     def remove_Device(self, device: IoTDevice) -> None:
         try:
             if self._devices:
-                del self._devices[device._id]
+                removed=self._devices.pop(device._id)
+                self._detach_Device(removed)
+                self._state_view=None
+                self._version+=1
+                for listener in self._listeners:
+                    listener._on_Device_Removed(self,removed)
             else:
                 try:
                     raise ValueError("Facade is Empty")
@@ -66,6 +97,43 @@ class IoTDeviceGroup(IoTFacade):
     def get_Devices(self) -> dict:
         return self._devices
     
+    def get_Version(self) -> int:
+        return self._version
+    
+    def get_Priority_Partition(self, descending: bool = False) -> dict:
+        """_summary_
+        devices grouped by priority, in insertion order within a priority as a stable sort would give.
+        The partition is cached for the group version, so it is only rebuilt after a membership or priority
+        change, and both orderings share the same device lists; they must not be modified by the caller.
+        Args:
+            descending (bool): highest priority first if True
+        Returns:
+            dict: priority -> list of devices
+        """        
+        if self._partition is None or self._partition[0] != self._version:
+            buckets={}
+            for device in self._devices.values():
+                buckets.setdefault(device._priority,[]).append(device)
+            ascending={priority: buckets[priority] for priority in sorted(buckets)}
+            self._partition=(self._version,ascending,{priority: ascending[priority] for priority in reversed(ascending)})
+        return self._partition[2] if descending else self._partition[1]
+    
+    def add_Listener(self, listener) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+    
+    def remove_Listener(self, listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def add_State_Listener(self, listener) -> None:
+        if listener not in self._state_listeners:
+            self._state_listeners.append(listener)
+    
+    def remove_State_Listener(self, listener) -> None:
+        if listener in self._state_listeners:
+            self._state_listeners.remove(listener)
+    
     def all_On(self) -> None:
         for device in self._devices:
             self.turn_On(device._id)
@@ -75,24 +143,92 @@ class IoTDeviceGroup(IoTFacade):
             self.turn_On(device._id)
             
     def get_Facade_Consumption(self)->dict:
-        sorted_smart_plugs = sorted(self._devices.values(),key=lambda plug: plug._priority)
-        power_consumption_by_priority = {}
-        for key, group in groupby(sorted_smart_plugs, key=lambda plug: plug._priority):
-            power_consumption_by_priority[key] = sum(plug._power_consumption for plug in group)
-        return power_consumption_by_priority
+        return {priority: self._consumption_by_priority[priority] for priority in sorted(self._device_count_by_priority)}
     
     def get_Facade_Max_rating(self)->dict:
-        sorted_smart_plugs = sorted(self._devices.values(),key=lambda plug: plug._priority)
-        max_power_rating_by_priority = {}
-        for key, group in groupby(sorted_smart_plugs, key=lambda plug: plug._priority):
-            max_power_rating_by_priority[key] = sum(plug._max_power_rating for plug in group)
-        return max_power_rating_by_priority
+        return {priority: self._max_rating_by_priority[priority] for priority in sorted(self._device_count_by_priority)}
     
     def get_Facade_Max_rating_for_on_loads(self)->dict:
-        sorted_smart_plugs = sorted(self._devices.values(),key=lambda plug: plug._status)
-        turned_on_loads=sum([0 if device._status == 0 else device._max_power_rating for device in self._devices.values()])
-        tuned_off_loads=turned_on_loads-sum([ device._max_power_rating for device in self._devices.values()])
+        turned_on_loads=self._on_loads_max_rating
+        tuned_off_loads=turned_on_loads-self._total_max_rating
         return turned_on_loads, abs(tuned_off_loads)
+    
+    def get_State_View(self) -> tuple:
+        """_summary_
+        columnar view of the group for vectorized aggregates and control passes
+        Returns:
+            tuple: (DeviceStateTable, list of devices, np.ndarray of their slots in the same order)
+        """        
+        if self._state_view is None:
+            devices=list(self._devices.values())
+            table=devices[0]._table if devices else DeviceStateTable.get_Default()
+            if any(device._table is not table for device in devices):
+                raise ValueError("the devices of the group live in different state tables")
+            slots=np.fromiter((device._slot for device in devices),dtype=np.int64,count=len(devices))
+            self._state_view=(table,devices,slots)
+        return self._state_view
+    
+    def _detach_Device(self, device: IoTDevice) -> None:
+        device._detach_Group(self)
+        self._remove_From_Index(device._index_State())
+    
+    def _add_To_Index(self, state: tuple) -> None:
+        priority, power, max_rating, status = state
+        self._device_count_by_priority[priority]=self._device_count_by_priority.get(priority,0)+1
+        self._consumption_by_priority[priority]=self._consumption_by_priority.get(priority,0)+power
+        self._max_rating_by_priority[priority]=self._max_rating_by_priority.get(priority,0)+max_rating
+        self._total_max_rating+=max_rating
+        if status != 0:
+            self._on_loads_max_rating+=max_rating
+    
+    def _remove_From_Index(self, state: tuple) -> None:
+        priority, power, max_rating, status = state
+        self._device_count_by_priority[priority]-=1
+        if self._device_count_by_priority[priority] == 0:
+            del self._device_count_by_priority[priority]
+            del self._consumption_by_priority[priority]
+            del self._max_rating_by_priority[priority]
+        else:
+            self._consumption_by_priority[priority]-=power
+            self._max_rating_by_priority[priority]-=max_rating
+        self._total_max_rating-=max_rating
+        if status != 0:
+            self._on_loads_max_rating-=max_rating
+    
+    def _update_Index(self, old_state: tuple, new_state: tuple, device: IoTDevice = None) -> None:
+        """_summary_
+        called by a member device whenever its priority, power, max rating or status changes
+        Args:
+            old_state (tuple): device state before the change
+            new_state (tuple): device state after the change
+            device (IoTDevice): the device that changed, passed on to the state listeners
+        """        
+        # no lock: the index is only changed from greenlets of the agent hub and none of its paths yields
+        self._remove_From_Index(old_state)
+        self._add_To_Index(new_state)
+        if old_state[0] != new_state[0]:
+            self._version+=1
+        # the incremental sums drift by a rounding error per update; a rebuild every interval of at least
+        # the group size keeps the drift bounded at an amortized O(1) per update
+        self._updates_since_rebuild+=1
+        if self._updates_since_rebuild >= max(self.REBUILD_INTERVAL,len(self._devices)):
+            self._rebuild_Index()
+        if device is not None:
+            for listener in self._state_listeners:
+                listener._on_Device_Changed(self,device,old_state,new_state)
+    
+    def _rebuild_Index(self) -> None:
+        """_summary_
+        recompute the running totals from scratch to drop the accumulated floating point drift, run periodically by _update_Index
+        """        
+        self._updates_since_rebuild=0
+        self._device_count_by_priority={}
+        self._consumption_by_priority={}
+        self._max_rating_by_priority={}
+        self._on_loads_max_rating=0
+        self._total_max_rating=0
+        for device in self._devices.values():
+            self._add_To_Index(device._index_State())
         
     def set_parameters(self_id: int)->None: # this is to set the additional parameters of a device
         pass
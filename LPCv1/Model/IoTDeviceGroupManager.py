@@ -1,37 +1,58 @@
 import sys
 sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
-
-from LoadPriorityControl.LPCv1.Model.IoTDeviceGroup import IoTDeviceGroup
 from Model.IoTFacadeManager import IoTFacadeManager
+from Model.LatencyMetrics import LatencyMetrics, STAGE_CONTROL, STAGE_STRATEGY
+import gevent
+from gevent.lock import BoundedSemaphore
 import logging
-from itertools import groupby
-from Controller.DirectControl import DirectControl
-from Controller.SheddingControl import SheddingControl
-from Controller.IncrementalControl import IncrementalControl
-from Controller.LoadPriorityControl import LoadPriorityControl
+import time
 from Model.IoTDeviceGroup import IoTDeviceGroup
-from Controller.LoadPriorityControlEV import LoadPriorityControlEV
+from Controller.StrategyRegistry import StrategyRegistry
 
 logger = logging.getLogger(__name__)
+metrics = LatencyMetrics.get_Default()
 
 
 class IoTDeviceGroupManager(IoTFacadeManager):
     
-    def __init__(self) -> None:
+    def __init__(self, registry: StrategyRegistry = None, max_workers: int = 8, group_timeout: float = 30) -> None:
+        """_summary_
+
+        Args:
+            registry (StrategyRegistry): control type -> strategy lookup, the default registry if None
+            max_workers (int): group strategies execute_Strategy runs at the same time
+            group_timeout (float): seconds execute_Strategy waits for the group strategies, counted from their submission
+        """        
         super().__init__()
-        self._groups=[]
+        self._registry=registry if registry is not None else StrategyRegistry.get_Default()
+        self._max_workers=max_workers
+        self._group_timeout=group_timeout
+        self._slots=BoundedSemaphore(max_workers)
+        self._running={} # group -> greenlet of its strategy that has not returned yet
+        self._groups={} # member groups in insertion order, the values are unused
         self._group_control_stratagey={}
         self._sorted_groups={}
+        self._sorted_groups_version=None # merged view version _sorted_groups was built for
+        # live union of the member groups, kept up to date through the group listeners
         self._merged_groups= IoTDeviceGroup()
+        self._merged_counts={} # device id -> number of member groups holding it
         self._cmd_all_groups=None
         
-    def group_By_Priority(self) -> IoTDeviceGroup:
-        for group in self._groups:
-            sorted_smart_plugs = sorted(group._devices.values(),key=lambda plug: plug._priority)
-            for key, group in groupby(sorted_smart_plugs, key=lambda plug: plug._priority):
+    def group_By_Priority(self) -> dict:
+        """_summary_
+        one IoTDeviceGroup per priority over the devices of all member groups, rebuilt only when the
+        version of the merged view moved (membership or priority change)
+        Returns:
+            dict: priority -> IoTDeviceGroup, in ascending priority
+        """        
+        version=self._merged_groups.get_Version()
+        if self._sorted_groups_version != version:
+            self._sorted_groups={}
+            for key,devices in self._merged_groups.get_Priority_Partition().items():
                 temp= IoTDeviceGroup()
-                for device in group:temp.add_Device(device)
+                for device in devices:temp.add_Device(device)
                 self._sorted_groups[key] = temp
+            self._sorted_groups_version=version
         return self._sorted_groups
         
     def clear_Groups_Stratgies(self) -> None:
@@ -43,63 +64,178 @@ class IoTDeviceGroupManager(IoTFacadeManager):
             
             #raise KeyError('The Item is already in the list')
         else:
-            self._groups.append(group)
-            self._merge_Groups()
+            self._groups[group]=None
+            group.add_Listener(self)
+            for device in group._devices.values():
+                self._on_Device_Added(group,device)
     
     def remove_Group(self, group: IoTDeviceGroup) -> None:
         if not self._groups:
             logger.error(f"The list is empty")
             #raise KeyError("The list is empty")
         else:
-                print(self._groups,"MENNNNNNNNNNNNNNNNNNNNNNNNNNNNAAAAAAAAAAAAAAAAA")
                 try:
-                    self._groups.remove(group)
-                    self._merge_Groups()
-                    print(self._groups,"MENNNNNNNNNNNNNNNNNNNNNNNNNNNNAAAAAAAAAAAAAAAAA")
-                except:
+                    del self._groups[group]
+                    group.remove_Listener(self)
+                    self._group_control_stratagey.pop(group,None)
+                    self._running.pop(group,None)
+                    self._registry.release_Group(group)
+                    for device in group._devices.values():
+                        self._on_Device_Removed(group,device)
+                except KeyError:
                     logger.error(f"No item in the list")
         
-    def execute_Strategy(self)->None:
-        
+    def execute_Strategy(self)->dict:
+        """_summary_
+        run the strategy of every group concurrently on greenlets of the agent's hub, at most max_workers at a time.
+        Every group gets the same deadline, group_timeout after submission: a strategy still waiting for a slot then
+        is cancelled, one still running is reported as timed out and left to finish. A group whose strategy from an
+        earlier call is still running is reported as busy and skipped, so a strategy instance never runs twice at
+        once. A group that raises does not hold up or abort the others. Strategies share the hub, so a deadline can
+        only be kept while the running strategies yield (RPC waits, pacing sleeps).
+        Returns:
+            dict: {'seconds', 'ok', 'failed', 'timed_out', 'busy', 'groups': [{'group', 'strategy', 'status', 'seconds', 'error'}]}
+        """        
         if not self._group_control_stratagey:
             logger.warning(f"The group stratagies are empty")
             raise Warning("The group stratagies are empty")
         else:
-            for group in self._group_control_stratagey.keys(): self._group_control_stratagey[group][0].execute(group,self._group_control_stratagey[group][1])
+            start=time.perf_counter()
+            reports=[]
+            submitted=[]
+            for group,(controller,cmd) in list(self._group_control_stratagey.items()):
+                report={'group':group,'strategy':type(controller).__name__,'status':'queued','seconds':None,'error':None}
+                reports.append(report)
+                previous=self._running.get(group)
+                if previous is not None and not previous.ready():
+                    report['status']='busy'
+                    logger.warning(f"{report['strategy']} is still running from an earlier control tick, the group is skipped")
+                    continue
+                greenlet=gevent.spawn(self._execute_Group,controller,group,cmd,report)
+                self._running[group]=greenlet
+                submitted.append((group,greenlet,report))
+            gevent.joinall([greenlet for group,greenlet,report in submitted],timeout=self._group_timeout)
+            now=time.perf_counter()
+            for group,greenlet,report in submitted:
+                if greenlet.ready():
+                    pass
+                elif report['status'] == 'queued':
+                    # never got a slot, dropped before it touches the group
+                    greenlet.kill()
+                    report['status']='timeout'
+                    logger.error(f"{report['strategy']} did not start within {self._group_timeout} s and was cancelled")
+                else:
+                    report['status']='timeout'
+                    report['seconds']=now-report['started']
+                    logger.error(f"{report['strategy']} did not finish within {self._group_timeout} s")
+                if greenlet.ready() and self._running.get(group) is greenlet:
+                    del self._running[group]
+            for report in reports:
+                report.pop('started',None)
+            result={'seconds':time.perf_counter()-start,
+                    'ok':sum(report['status'] == 'ok' for report in reports),
+                    'failed':sum(report['status'] == 'error' for report in reports),
+                    'timed_out':sum(report['status'] == 'timeout' for report in reports),
+                    'busy':sum(report['status'] == 'busy' for report in reports),
+                    'groups':reports}
+            metrics.observe(STAGE_CONTROL,result['seconds'],'groups')
+            return result
+
+    def _execute_Group(self,controller,group,cmd,report) -> None:
+        with self._slots:
+            report['started']=time.perf_counter()
+            report['status']='running'
+            try:
+                self._execute_Timed(controller,group,cmd)
+                status,error='ok',None
+            except Exception as e:
+                logger.error(f"{type(controller).__name__} failed on a group: {e}")
+                status,error='error',repr(e)
+            if report['status'] == 'running':
+                report['status']=status
+                report['error']=error
+                report['seconds']=time.perf_counter()-report['started']
+
+    def shutdown(self, wait_pending: bool = True) -> None:
+        running=list(self._running.values())
+        self._running={}
+        if wait_pending:
+            gevent.joinall(running)
+        else:
+            gevent.killall(running)
+
+    @staticmethod
+    def _execute_Timed(controller,group,cmd) -> None:
+        start=time.perf_counter()
+        try:
+            controller.execute(group,cmd)
+        finally:
+            metrics.observe(STAGE_STRATEGY,time.perf_counter()-start,type(controller).__name__)
  
     
+    @staticmethod
+    def _cancel_Superseded(controller,group) -> None:
+        # the paced actions of the previous command still queued for the group would undo the new one
+        dropped=controller.cancel_Pending(group)
+        if dropped:
+            logger.info(f"dropped {dropped} paced actions superseded by a new command")
+
     def set_Group_Stratagy(self,group,cmd) -> None:
-        if cmd[0]=='direct':
-            self._group_control_stratagey[group]=(DirectControl(),cmd)
-        elif cmd[0]=='increment':
-            self._group_control_stratagey[group]=(IncrementalControl(),cmd)
-        elif cmd[0]=='shed':
-            self._group_control_stratagey[group]=(SheddingControl(),cmd)
-        elif cmd[0]=='lpc':
-            self._group_control_stratagey[group]=(LoadPriorityControlEV(),cmd)
+        controller=self._registry.get_Strategy(cmd[0],group)
+        if controller is None:
+            logger.error(f"unknown control type {cmd[0]}")
+            return
+        if self._group_control_stratagey.get(group) != (controller,cmd):
+            self._cancel_Superseded(controller,group)
+        self._group_control_stratagey[group]=(controller,cmd)
         logger.info(f"Here is the group controllers >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>{self._group_control_stratagey}and the control input {cmd}")
         
+    def _on_Device_Added(self, group: IoTDeviceGroup, device) -> None:
+        # a device held by several member groups is merged once and leaves with the last of them
+        self._merged_counts[device._id]=self._merged_counts.get(device._id,0)+1
+        if self._merged_groups._devices.get(device._id) is not device:
+            self._merged_groups.add_Device(device)
+    
+    def _on_Device_Removed(self, group: IoTDeviceGroup, device) -> None:
+        count=self._merged_counts.get(device._id,0)-1
+        if count > 0:
+            self._merged_counts[device._id]=count
+        else:
+            self._merged_counts.pop(device._id,None)
+            if device._id in self._merged_groups._devices:
+                self._merged_groups.remove_Device(device)
+    
+    def get_Merged_Group(self) -> IoTDeviceGroup:
+        return self._merged_groups
+    
+    def get_Merged_Version(self) -> int:
+        return self._merged_groups.get_Version()
+    
     def _merge_Groups(self):
-        self._merged_groups= IoTDeviceGroup()
+        """_summary_
+        rebuild the merged view from the member groups, only needed to recover from an inconsistent state
+        """        
+        for device in list(self._merged_groups._devices.values()):
+            self._merged_groups.remove_Device(device)
+        self._merged_counts={}
         for group in self._groups:
-            self._merged_groups._devices.update(group._devices)
-        print('***************************************************^^^^^^^^^^^^^^^^^^^^^^^^^^^^^this is merged group',self._merged_groups._devices)
+            for device in group._devices.values():
+                self._on_Device_Added(group,device)
         
     def control_All_Groups(self):
-        print(self._merged_groups.get_Facade_Consumption())
-        if self._cmd_all_groups[0]=='direct':
-            controller=DirectControl()
-            controller.execute(self._merged_groups,self._cmd_all_groups)
-        elif self._cmd_all_groups[0]=='increment':
-           controller=IncrementalControl()
-           controller.execute(self._merged_groups,self._cmd_all_groups)
-        elif self._cmd_all_groups[0]=='shed':
-            controller=SheddingControl()
-            controller.execute(self._merged_groups,self._cmd_all_groups)
-        elif self._cmd_all_groups[0]=='lpc':
-            controller=LoadPriorityControlEV()
-            controller.execute(self._merged_groups,self._cmd_all_groups)
+        start=time.perf_counter()
+        logger.debug(f"merged group consumption {self._merged_groups.get_Facade_Consumption()}")
+        controller=self._registry.get_Strategy(self._cmd_all_groups[0],self._merged_groups)
+        if controller is None:
+            logger.error(f"unknown control type {self._cmd_all_groups[0]}")
+        else:
+            self._execute_Timed(controller,self._merged_groups,self._cmd_all_groups)
+        metrics.observe(STAGE_CONTROL,time.perf_counter()-start,'all_groups')
     def control_All_Groups_set_cmd(self,cmd):
+        if cmd != self._cmd_all_groups:
+            controller=self._registry.get_Strategy(cmd[0],self._merged_groups)
+            if controller is not None:
+                self._cancel_Superseded(controller,self._merged_groups)
         self._cmd_all_groups = cmd  
         
     def get_groups_consumption(self):
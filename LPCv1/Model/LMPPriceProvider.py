@@ -0,0 +1,132 @@
+import threading
+import time
+import gevent
+import logging
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class LMPPriceProvider:
+    """_summary_
+    Serves the locational marginal price from the LMP endpoint through a TTL cache. get_LMP never waits on the
+    endpoint: a missing or stale price starts one refresh on a background thread (at most one runs at a time) and
+    the last known price, None before the first successful fetch, is returned at once. A failed fetch is retried
+    after retry seconds, doubling up to the TTL while the endpoint stays down, and the last known price is kept.
+    Requests go through one pooled requests.Session so the connection is reused.
+    """
+    def __init__(self, url: str = "http://127.0.0.1:8880/api/lmpdata/", ttl: float = 300, timeout: float = 2,
+                 session: requests.Session = None, retry: float = 5, clock=time.monotonic) -> None:
+        """_summary_
+
+        Args:
+            url (str): LMP endpoint returning {'LMP': ...}
+            ttl (float): seconds a fetched price stays fresh
+            timeout (float): seconds to wait for the endpoint
+            session (requests.Session): session to use, a new pooled one if None
+            retry (float): seconds before the first retry of a failed fetch
+            clock (callable): monotonic time source
+        """
+        self._url=url
+        self._ttl=ttl
+        self._timeout=timeout
+        self._session=session if session is not None else requests.Session()
+        self._retry=retry
+        self._clock=clock
+        self._value=None
+        self._fetched_at=None
+        self._refresh_at=0 # clock time from which the next get_LMP refreshes
+        self._failures=0
+        self._refreshing=False
+        self._lock=threading.Lock()
+
+    def get_LMP(self):
+        """_summary_
+        Returns:
+            the cached price, None if it could not be fetched yet
+        """
+        with self._lock:
+            value=self._value
+            start=not self._refreshing and self._clock() >= self._refresh_at
+            if start:
+                self._refreshing=True
+        if start:
+            threading.Thread(target=self._refresh,name="lmp-refresh",daemon=True).start()
+        return value
+
+    def is_Fresh(self) -> bool:
+        with self._lock:
+            return self._fetched_at is not None and self._clock()-self._fetched_at < self._ttl
+
+    def wait_Refresh(self, timeout: float = None) -> bool:
+        """_summary_
+        wait for the refresh in progress, e.g. for the first price at startup
+        Returns:
+            bool: False if it was still running after timeout seconds
+        """
+        deadline=None if timeout is None else time.monotonic()+timeout
+        while True:
+            with self._lock:
+                if not self._refreshing:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            # the fetch runs on its own thread, the agent's greenlets keep running while we wait
+            gevent.sleep(0.01)
+
+    def prefetch(self, timeout: float = 2) -> bool:
+        """_summary_
+        start the first fetch and wait for it at most timeout seconds, so the first snapshots published after startup
+        already carry a price
+        Returns:
+            bool: whether a price is known
+        """
+        self.get_LMP()
+        self.wait_Refresh(timeout)
+        with self._lock:
+            return self._value is not None
+
+    def _refresh(self) -> None:
+        try:
+            response=self._session.get(self._url,timeout=self._timeout)
+            response.raise_for_status()
+            value=response.json()['LMP']
+        except Exception as e:
+            with self._lock:
+                self._failures+=1
+                delay=min(self._ttl,self._retry*2**(self._failures-1))
+                self._refresh_at=self._clock()+delay
+                self._refreshing=False
+                value=self._value
+            logger.error(f"LMP refresh failed, keeping the last known price {value} and retrying in {delay:.0f} s: {e}")
+            return
+        with self._lock:
+            self._value=value
+            self._fetched_at=self._clock()
+            self._refresh_at=self._fetched_at+self._ttl
+            self._failures=0
+            self._refreshing=False
+
+    def close(self) -> None:
+        self._session.close()
+
+
+if __name__ == "__main__":
+    # exercise the provider against the local stub of the LMP endpoint
+    import sys
+    sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+    from Benchmark.StubLMPServer import StubLMPServer
+
+    stub=StubLMPServer(price=20.0).start()
+    provider=LMPPriceProvider(url=stub.url,ttl=0.2)
+    print("first read", provider.get_LMP())
+    provider.wait_Refresh(2)
+    print("first fetch", provider.get_LMP())
+    stub.price=25.0
+    stub.delay=1.0
+    time.sleep(0.3)
+    start=time.perf_counter()
+    print("stale read", provider.get_LMP(), f"in {1000*(time.perf_counter()-start):.2f} ms")
+    provider.wait_Refresh(2)
+    print("refreshed", provider.get_LMP())
+    stub.stop()
@@ -0,0 +1,179 @@
+from bisect import bisect_left
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# pipeline stages
+STAGE_INGEST='ingest'             # monitor process_Message, topic routing and observer updates of one frame
+STAGE_OBSERVER_UPDATE='observer_update'
+STAGE_CONTROL='control'           # EMSControl.execute_Strategy and the IoTDeviceGroupManager group controls
+STAGE_STRATEGY='strategy'         # ControlStrategy.execute
+STAGE_PACING='pacing'             # stagger sleeps taken inline by a strategy that has no ActuationPacer
+STAGE_PUBLISH='publish'           # Send.publish, the RPCs when synchronous, the hand over when dispatched
+STAGE_RPC='rpc'                   # one set_point chain on a CommandDispatcher greenlet
+
+# event counters
+COUNTER_ACTUATIONS='actuations'                       # device commands a strategy sent, labelled by the branch
+COUNTER_SUPPRESSED='suppressed_actuations'            # device commands held back, labelled by the reason (redundant, dwell, budget)
+COUNTER_DEADBAND_TICKS='deadband_ticks'               # control ticks left alone because the consumption was in the deadband
+COUNTER_COMMAND_FAILURES='command_failures'           # set_point chains of a CommandDispatcher that failed, labelled by the device type
+
+# upper bounds in seconds, 50 us to 60 s in roughly x2 steps; slower observations go to the +Inf bucket
+DEFAULT_BUCKETS=(0.00005,0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60)
+
+
+class LatencyHistogram:
+    """_summary_
+    Fixed-bucket latency histogram. Recording is a bisect and two increments; the percentiles are
+    interpolated linearly inside the bucket they fall in, so they are as precise as the bucket layout.
+    """
+    __slots__=('bounds','counts','count','total','maximum')
+
+    def __init__(self, bounds: tuple = DEFAULT_BUCKETS) -> None:
+        self.bounds=bounds
+        self.counts=[0]*(len(bounds)+1)
+        self.count=0
+        self.total=0.0
+        self.maximum=0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds,seconds)]+=1
+        self.count+=1
+        self.total+=seconds
+        if seconds > self.maximum:
+            self.maximum=seconds
+
+    def percentile(self, q: float) -> float:
+        """_summary_
+        Args:
+            q (float): quantile in [0, 1]
+        Returns:
+            float: estimated latency in seconds, 0 when nothing was observed
+        """
+        if self.count == 0:
+            return 0.0
+        rank=q*self.count
+        seen=0
+        for index,bucket_count in enumerate(self.counts):
+            if bucket_count and seen+bucket_count >= rank:
+                lower=self.bounds[index-1] if index > 0 else 0.0
+                upper=self.bounds[index] if index < len(self.bounds) else self.maximum
+                return min(lower+(upper-lower)*(rank-seen)/bucket_count,self.maximum)
+            seen+=bucket_count
+        return self.maximum
+
+
+class LatencyMetrics:
+    """_summary_
+    Latency histograms of the ingest -> decide -> actuate pipeline, one per (stage, label).
+    The label is the strategy class for the control stages and the device type for the ingest and actuation
+    stages, so the observation count of a histogram doubles as the per strategy / per device type counter.
+    Events that have no latency, such as suppressed actuations, are counted per (counter, label) with increment.
+    export_Prometheus renders the text exposition format (write_Prometheus for the node exporter textfile
+    collector) and get_Summary returns the percentiles as a plain dict for an RPC export of the agent.
+    """
+    _default_metrics=None
+
+    def __init__(self, bounds: tuple = DEFAULT_BUCKETS, enabled: bool = True) -> None:
+        self._bounds=bounds
+        self._enabled=enabled
+        self._histograms={}
+        self._counters={}
+        self._lock=threading.Lock()
+
+    @classmethod
+    def get_Default(cls) -> "LatencyMetrics":
+        if cls._default_metrics is None:
+            cls._default_metrics=cls()
+        return cls._default_metrics
+
+    def set_Enabled(self, enabled: bool) -> None:
+        self._enabled=enabled
+
+    def observe(self, stage: str, seconds: float, label: str = '') -> None:
+        if not self._enabled:
+            return
+        # observations arrive from the dispatcher and pacer greenlets as well as the agent greenlet
+        with self._lock:
+            histogram=self._histograms.get((stage,label))
+            if histogram is None:
+                histogram=self._histograms[(stage,label)]=LatencyHistogram(self._bounds)
+            histogram.observe(seconds)
+
+    def increment(self, counter: str, label: str = '', amount: int = 1) -> None:
+        if not self._enabled:
+            return
+        with self._lock:
+            self._counters[(counter,label)]=self._counters.get((counter,label),0)+amount
+
+    def get_Counter(self, counter: str, label: str = '') -> int:
+        return self._counters.get((counter,label),0)
+
+    def get_Counters(self) -> dict:
+        """_summary_
+        Returns:
+            dict: {counter: {label: count}}
+        """
+        counters={}
+        with self._lock:
+            for (counter,label),count in sorted(self._counters.items()):
+                counters.setdefault(counter,{})[label]=count
+        return counters
+
+    def get_Histogram(self, stage: str, label: str = '') -> LatencyHistogram:
+        return self._histograms.get((stage,label))
+
+    def get_Summary(self, quantiles: tuple = (0.5,0.95,0.99)) -> dict:
+        """_summary_
+        Returns:
+            dict: {stage: {label: {'count', 'sum', 'max', 'p50', 'p95', 'p99'}}} with the latencies in seconds
+        """
+        summary={}
+        with self._lock:
+            for (stage,label),histogram in sorted(self._histograms.items()):
+                entry={'count':histogram.count,'sum':histogram.total,'max':histogram.maximum}
+                for q in quantiles:
+                    entry[f"p{q*100:g}"]=histogram.percentile(q)
+                summary.setdefault(stage,{})[label]=entry
+        return summary
+
+    def export_Prometheus(self, prefix: str = 'lpc') -> str:
+        name=f"{prefix}_stage_latency_seconds"
+        lines=[f"# HELP {name} Latency of the load priority control pipeline stages.",f"# TYPE {name} histogram"]
+        quantile_lines=[f"# HELP {name}_quantile Estimated latency quantiles of the pipeline stages.",f"# TYPE {name}_quantile gauge"]
+        with self._lock:
+            for (stage,label),histogram in sorted(self._histograms.items()):
+                labels=f'stage="{stage}",label="{label}"'
+                cumulative=0
+                for bound,bucket_count in zip(self._bounds,histogram.counts):
+                    cumulative+=bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram.total:.9g}')
+                lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+                for q in (0.5,0.95,0.99):
+                    quantile_lines.append(f'{name}_quantile{{{labels},quantile="{q:g}"}} {histogram.percentile(q):.9g}')
+            counter_lines=[]
+            for (counter,label),count in sorted(self._counters.items()):
+                counter_name=f"{prefix}_{counter}_total"
+                if not counter_lines or not counter_lines[-1].startswith(counter_name+'{'):
+                    counter_lines.append(f"# TYPE {counter_name} counter")
+                counter_lines.append(f'{counter_name}{{label="{label}"}} {count}')
+        return '\n'.join(lines+quantile_lines+counter_lines)+'\n'
+
+    def write_Prometheus(self, path: str, prefix: str = 'lpc') -> None:
+        # written next to the target and renamed so the textfile collector never reads a partial file
+        temp=path+'.tmp'
+        try:
+            with open(temp,'w') as f:
+                f.write(self.export_Prometheus(prefix))
+            os.replace(temp,path)
+        except OSError as e:
+            logger.error(f"could not write the latency metrics to {path}: {e}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms={}
+            self._counters={}
@@ -4,10 +4,14 @@ from Model.Observer import Observer
 from Model.IoTDevice import IoTDevice
 from Model.IoTMessage import IoTMessage
 from View.Send import Send
+from Model.DeviceStateTable import DeviceStateTable
 from datetime import datetime
+import weakref
 import logging
+from Model.EventTrace import EventTrace, EVENT_DEVICE_UPDATE
 
 logger = logging.getLogger(__name__)
+trace = EventTrace.get_Default()
 
 
 class SmartPlug(Observer,IoTDevice):
@@ -17,14 +21,19 @@ class SmartPlug(Observer,IoTDevice):
         Observer ( Interface): observer for updating IoTdevice statusS
         IoTDevice ( Interface): Interface to use to derive the SmartPlug class
     """    
-    def __init__(self,id :str,vip) -> None:
+    
+    def __init__(self,id :str,vip,table: DeviceStateTable=None) -> None:
         """_summary_
 
         Args:
             id (int): device Id
             vip (obj): volttron vip connection for communication in the volttron message bus
+            table (DeviceStateTable): state table holding the device fields, the shared default table if None
         """        
         super().__init__()
+        self._table=table if table is not None else DeviceStateTable.get_Default()
+        self._slot=self._table.allocate_Slot(self)
+        weakref.finalize(self,self._table.release_Slot,self._slot)
         self._id=id
         self._status=0
         self._power_consumption=0
@@ -49,30 +58,38 @@ class SmartPlug(Observer,IoTDevice):
         self._temperature=0
         
     def turn_On(self) -> None:
-        self._message.message_type='command'
-        self._message.payload={'cmd':1}
-        self._message.priority=self._priority
-        self.publish()
-        self._last_command=self._message
+        with self._state_lock:
+            self._message.message_type='command'
+            self._message.payload={'cmd':1}
+            self._message.priority=self._priority
+            self.publish()
+            self._last_command=self._message
         
     def turn_Off(self) -> None:
-        self._message.message_type='command'
-        self._message.payload={'cmd':0}
-        self._message.priority=self._priority
-        self.publish()
-        self._last_command=self._message
+        with self._state_lock:
+            self._message.message_type='command'
+            self._message.payload={'cmd':0}
+            self._message.priority=self._priority
+            self.publish()
+            self._last_command=self._message
     
     def get_Power_Consumption(self) -> int:
         return self._power_consumption
     
     def set_Power_Consumption(self, power: int) -> None:
-        self._power_consumption = power*self._power_multiply_factor
+        with self._state_lock:
+            old_state=self._index_State()
+            self._power_consumption = power*self._power_multiply_factor
+            self._notify_Groups(old_state)
     
     def get_Device_Id(self) -> int:
         return self._id
     
     def set_Priority(self, priority: int) -> None:
-        self._priority=priority
+        with self._state_lock:
+            old_state=self._index_State()
+            self._priority=priority
+            self._notify_Groups(old_state)
     
     def get_Priority(self) -> int:
         return self._priority
@@ -83,12 +100,15 @@ class SmartPlug(Observer,IoTDevice):
         Args:
             power_consumption (int): instatntanious power consumption of the smart plug
         """        
-        self.set_Power_Consumption(power_consumption)
-        self._priority=priority
-        self._status=status
-        if  self._power_consumption > self._max_power_rating:
-            self._max_power_rating= self._power_consumption
-        logger.info(f"updating the smart plug{ self._id}: power {power_consumption} : priority { self._priority} : status {self._status}: powr_multiply_factor {self._power_multiply_factor}: max_power {self._max_power_rating}")
+        with self._state_lock:
+            old_state=self._index_State()
+            self._power_consumption=power_consumption*self._power_multiply_factor
+            self._priority=priority
+            self._status=status
+            if  self._power_consumption > self._max_power_rating:
+                self._max_power_rating= self._power_consumption
+            self._notify_Groups(old_state)
+            trace.record(logging.INFO,EVENT_DEVICE_UPDATE,self._id,power_consumption,priority,status)
         
     def _check_Health(self)-> None:
         pass
@@ -100,10 +120,9 @@ class SmartPlug(Observer,IoTDevice):
         """_summary_
         this method publish the message to the volttron message bus
         Returns:
-            bool: state of sending data
+            the RPC results, or a greenlet resolving to them when the commands go through a CommandDispatcher
         """        
-        self._send.publish(self._message,self._deviceType)
-        return bool
+        return self._send.publish(self._message,self._deviceType)
     
     def set_parameters(self, para : int)->None:
         pass
@@ -2,14 +2,26 @@ import sys
 sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from Model.GroupRepository import GroupRepository
 from Model.IoTDeviceGroup import IoTDeviceGroup
+from Model.LMPPriceProvider import LMPPriceProvider
+from Model.SnapshotCodec import SnapshotCodec
 import logging
-import requests
 logger = logging.getLogger(__name__)
 
 class SmartPlugDataService:
-    def __init__(self, repository:GroupRepository ) -> None:
+    def __init__(self, repository:GroupRepository, price_provider: LMPPriceProvider=None, lmp_timeout: float = 2 ) -> None:
+        """_summary_
+
+        Args:
+            repository (GroupRepository): where the snapshots are published
+            price_provider (LMPPriceProvider): source of the LMP of the snapshots, the default endpoint if None
+            lmp_timeout (float): seconds to wait for the first price at startup, so the first snapshots do not go out
+                with LMP None; the service starts without it if the endpoint is slower or down
+        """
         self._repository=repository
         self._control_commands={}
+        self._price_provider=price_provider if price_provider is not None else LMPPriceProvider()
+        if lmp_timeout and not self._price_provider.prefetch(lmp_timeout):
+            logger.warning(f"no LMP after {lmp_timeout} s, the first snapshots go out without a price")
     
     def create_and_store_smart_plug_json(self, group: IoTDeviceGroup )->None:
         smart_plug_data = {}
@@ -32,13 +44,20 @@ class SmartPlugDataService:
                  'energy': device._energy_consumption,
                 'temperature':device._temperature,
             }
+        if group._devices:
             smart_plug_data['Control']=self._control_commands
-            url = "http://127.0.0.1:8880/api/lmpdata/"
-            smart_plug_data['LMP']= requests.get(url).json()['LMP']
+            smart_plug_data['LMP']= self._price_provider.get_LMP()
             
         logger.info(f"Loger Data >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>> {smart_plug_data}")
         self._repository.update_Facade(smart_plug_data)
         
+    def create_and_store_smart_plug_binary(self, group: IoTDeviceGroup )->None:
+        """_summary_
+        publish the same snapshot in the compact SnapshotCodec form
+        """        
+        lmp=self._price_provider.get_LMP() if group._devices else None
+        self._repository.update_Facade_Binary(SnapshotCodec.encode(group,self._control_commands,lmp))
+        
     def store_Control_Commands(self,command,agent)->None:
         self._control_commands[str(agent)]={'cmd':command}
         
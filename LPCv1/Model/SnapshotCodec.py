@@ -0,0 +1,153 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Model.IoTDeviceGroup import IoTDeviceGroup
+from Model.IoTMessage import IoTMessage
+import numpy as np
+import struct
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC=b'LPCS'
+SNAPSHOT_VERSION=2
+_PREAMBLE=struct.Struct('<4sBI') # magic, version, header length
+_ID_ENTRY=struct.Struct('<HH') # bytes shared with the previous id, length of the rest
+
+# kind of the command field, the type the JSON form holds in 'command'
+COMMAND_VALUE=0 # a plain value set by a strategy
+COMMAND_MESSAGE=1 # the IoTMessage the device sent
+COMMAND_UNKNOWN=2
+
+# (field in the JSON form, packed type, state table column, None if read from the devices)
+_ROW_FIELDS=[
+    ('power','<f8','power'),
+    ('status','<i2','status'),
+    ('priority','<f8','priority'),
+    ('command','<i4',None),
+    ('command_kind','<u1',None),
+    ('maxpower','<f8','max_rating'),
+    ('current','<f8','current'),
+    ('voltage','<f8','voltage'),
+    ('frequency','<f8','frequency'),
+    ('energy','<f8','energy'),
+    ('temperature','<f8','temperature'),
+]
+
+
+class SnapshotCodec:
+    """_summary_
+    Compact, versioned binary form of the Monitor/Control snapshot built by SmartPlugDataService.
+    Layout: preamble (magic, version, header length), a JSON header holding the row schema, the device count
+    and the small Control/LMP parts, the device id table, then one fixed-width packed row per device in id
+    table order. The id table front codes the UTF-8 ids: each entry is the number of bytes shared with the
+    previous id and the length of the rest, followed by the rest, so the campus/building prefix of the
+    devices of a building is sent once. The decoder reads the schema from the header, so rows written with
+    more fields still decode, and it still reads version 1 payloads (ids in the JSON header).
+    Float columns are packed as float64, so a decoded snapshot holds the same values as the JSON form.
+    The command field carries the last command value (the 'cmd' of the IoTMessage) and its kind; the decoder
+    rebuilds the IoTMessage (without its timestamp, the priority of the row) or the plain value the JSON form holds.
+    """
+
+    @staticmethod
+    def _command_Value(command) -> tuple:
+        kind=COMMAND_VALUE
+        if isinstance(command,IoTMessage):
+            kind=COMMAND_MESSAGE
+            command=command.payload.get('cmd') if isinstance(command.payload,dict) else None
+        try:
+            return int(command),kind
+        except (TypeError,ValueError):
+            return -1,COMMAND_UNKNOWN
+
+    @staticmethod
+    def _encode_Ids(ids: list) -> bytes:
+        parts=[]
+        previous=b''
+        for device_id in ids:
+            encoded=device_id.encode()
+            shared=0
+            limit=min(len(previous),len(encoded),0xFFFF)
+            while shared < limit and previous[shared] == encoded[shared]:
+                shared+=1
+            parts.append(_ID_ENTRY.pack(shared,len(encoded)-shared))
+            parts.append(encoded[shared:])
+            previous=encoded
+        return b''.join(parts)
+
+    @staticmethod
+    def _decode_Ids(payload: bytes, offset: int, count: int) -> tuple:
+        ids=[]
+        previous=b''
+        for _ in range(count):
+            shared,rest=_ID_ENTRY.unpack_from(payload,offset)
+            offset+=_ID_ENTRY.size
+            encoded=previous[:shared]+payload[offset:offset+rest]
+            offset+=rest
+            ids.append(encoded.decode())
+            previous=encoded
+        return ids,offset
+
+    @classmethod
+    def encode(cls, group: IoTDeviceGroup, control: dict = None, lmp=None) -> bytes:
+        table,devices,slots=group.get_State_View()
+        dtype=np.dtype([(name,code) for name,code,column in _ROW_FIELDS])
+        rows=np.empty(len(slots),dtype=dtype)
+        table.flush([column for name,code,column in _ROW_FIELDS if column is not None])
+        commands=[cls._command_Value(device._last_command) for device in devices]
+        rows['command']=[value for value,kind in commands]
+        rows['command_kind']=[kind for value,kind in commands]
+        for name,code,column in _ROW_FIELDS:
+            if column is not None:
+                rows[name]=table.get_Column(column)[slots]
+        header=json.dumps({
+            'fields':[[name,code] for name,code,column in _ROW_FIELDS],
+            'count':len(devices),
+            'Control':control,
+            'LMP':lmp,
+        },separators=(',',':')).encode()
+        return b''.join((_PREAMBLE.pack(SNAPSHOT_MAGIC,SNAPSHOT_VERSION,len(header)),header,
+                         cls._encode_Ids([device._id for device in devices]),rows.tobytes()))
+
+    @classmethod
+    def decode(cls, payload: bytes) -> dict:
+        """_summary_
+        Returns:
+            dict: the snapshot in the nested JSON form published by SmartPlugDataService
+        """
+        magic,version,header_length=_PREAMBLE.unpack_from(payload,0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("not a snapshot payload")
+        if version > SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot version {version} is newer than the supported version {SNAPSHOT_VERSION}")
+        offset=_PREAMBLE.size
+        header=json.loads(payload[offset:offset+header_length])
+        offset+=header_length
+        if version == 1:
+            ids=header['ids']
+        else:
+            ids,offset=cls._decode_Ids(payload,offset,header['count'])
+        dtype=np.dtype([(name,code) for name,code in header['fields']])
+        rows=np.frombuffer(payload,dtype=dtype,count=len(ids),offset=offset)
+        columns={name: rows[name].tolist() for name in dtype.names if name != 'command_kind'}
+        if 'priority' in columns:
+            columns['priority']=[int(priority) if float(priority).is_integer() else priority for priority in columns['priority']]
+        if 'command_kind' in dtype.names:
+            columns['command']=[cls._command_Object(device_id,value,kind,priority) for device_id,value,kind,priority
+                                in zip(ids,columns['command'],rows['command_kind'].tolist(),columns.get('priority',[0]*len(ids)))]
+        snapshot={}
+        for index,device_id in enumerate(ids):
+            parts=device_id.split('/')
+            snapshot.setdefault('Monitor',{}).setdefault(parts[0],{}).setdefault(parts[1],{})[device_id]={name: values[index] for name,values in columns.items()}
+        if ids:
+            snapshot['Control']=header['Control']
+            snapshot['LMP']=header['LMP']
+        return snapshot
+
+    @staticmethod
+    def _command_Object(device_id: str, value: int, kind: int, priority):
+        if kind == COMMAND_MESSAGE:
+            return IoTMessage(device_id=device_id,message_type='command',payload={'cmd':value},timestamp=None,priority=priority)
+        if kind == COMMAND_UNKNOWN:
+            return None
+        return value
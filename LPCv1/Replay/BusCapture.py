@@ -0,0 +1,94 @@
+import gzip
+import struct
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MAGIC=b'LPCR'
+CAPTURE_VERSION=1
+_PREAMBLE=struct.Struct('<4sB')
+_TOPIC=struct.Struct('<BIH')      # record tag, topic id, topic length
+_FRAME=struct.Struct('<BdII')     # record tag, seconds since the capture start, topic id, payload length
+_TAG_TOPIC=1
+_TAG_FRAME=2
+
+
+class BusCapture:
+    """_summary_
+    Records the devices/... and control/... frames of the message bus to a compact file for the ReplayEngine.
+    The file is a gzip stream of binary records: a topic is written once and referenced by a numeric id
+    afterwards, and every frame carries its offset from the capture start and its message as compact JSON.
+    on_Message has the signature of a vip.pubsub.subscribe callback, so the agent can subscribe it directly.
+    """
+    def __init__(self, path: str, compresslevel: int = 6, clock=time.time) -> None:
+        """_summary_
+
+        Args:
+            path (str): capture file to create
+            compresslevel (int): gzip level, lower is cheaper for the agent
+            clock (callable): wall clock the frame times are taken from
+        """
+        self._file=gzip.open(path,'wb',compresslevel=compresslevel)
+        self._file.write(_PREAMBLE.pack(CAPTURE_MAGIC,CAPTURE_VERSION))
+        self._clock=clock
+        self._start=None
+        self._topics={}
+        self.frames=0
+
+    def record(self, topic: str, message, timestamp: float = None) -> None:
+        timestamp=self._clock() if timestamp is None else timestamp
+        if self._start is None:
+            self._start=timestamp
+            self._file.write(struct.pack('<d',timestamp))
+        topic_id=self._topics.get(topic)
+        if topic_id is None:
+            topic_id=self._topics[topic]=len(self._topics)
+            encoded=topic.encode()
+            self._file.write(_TOPIC.pack(_TAG_TOPIC,topic_id,len(encoded))+encoded)
+        payload=json.dumps(message,separators=(',',':')).encode()
+        self._file.write(_FRAME.pack(_TAG_FRAME,timestamp-self._start,topic_id,len(payload))+payload)
+        self.frames+=1
+
+    def on_Message(self, peer, sender, bus, topic, headers, message) -> None:
+        self.record(topic,message)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "BusCapture":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_Capture(path: str):
+    """_summary_
+    Args:
+        path (str): capture file written by BusCapture
+    Yields:
+        tuple: (seconds since the capture start, topic, message) in recording order
+    """
+    with gzip.open(path,'rb') as f:
+        magic,version=_PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a bus capture")
+        if version > CAPTURE_VERSION:
+            raise ValueError(f"capture version {version} is newer than the supported version {CAPTURE_VERSION}")
+        if len(f.read(8)) < 8:
+            return
+        topics={}
+        while True:
+            tag=f.read(1)
+            if not tag:
+                return
+            if tag[0] == _TAG_TOPIC:
+                topic_id,length=struct.unpack('<IH',f.read(_TOPIC.size-1))
+                topics[topic_id]=f.read(length).decode()
+            elif tag[0] == _TAG_FRAME:
+                offset,topic_id,length=struct.unpack('<dII',f.read(_FRAME.size-1))
+                yield offset,topics[topic_id],json.loads(f.read(length))
+            else:
+                raise ValueError(f"corrupt capture {path}, unknown record tag {tag[0]}")
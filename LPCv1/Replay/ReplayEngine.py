@@ -0,0 +1,241 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Replay.BusCapture import BusCapture, read_Capture
+from Replay.VirtualTime import VirtualClock, VirtualPacer
+from Benchmark.FakeVIP import FakeAsyncResult, FakePubSub
+from Model.SmartPlug import SmartPlug
+from Model.EVCharger import EVCharger
+from Model.IoTDeviceGroup import IoTDeviceGroup
+from Model.IoTDeviceGroupManager import IoTDeviceGroupManager
+from Model.LatencyMetrics import LatencyHistogram
+from Controller.ControlStrategy import ControlStrategy
+from Controller.StrategyRegistry import StrategyRegistry
+from Controller.DeviceMonitor import DeviceMonitor
+from Controller.EvMonitor import EvMonitor
+from Controller.GLEAMMMonitor import GLEAMMMonitor
+from View.Send import Send
+from contextlib import redirect_stdout
+import argparse
+import json
+import time
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+_GLEAMM_LOAD=re.compile(r'^P[PCI]T\d+$')
+
+
+class _RecordingRPC:
+    # collects the RPCs the devices send, stamped with the virtual time of the replay
+    def __init__(self, clock: VirtualClock) -> None:
+        self._clock=clock
+        self.commands=[]
+
+    def call(self, peer: str, method: str, *args, **kwargs) -> FakeAsyncResult:
+        if method == 'set_point' and len(args) >= 3:
+            self.commands.append({'time':self._clock(),'device':args[0],'point':args[1],'value':args[2]})
+        else:
+            self.commands.append({'time':self._clock(),'method':method,'args':list(args)})
+        return FakeAsyncResult(True,0)
+
+
+class _RecordingVIP:
+    def __init__(self, clock: VirtualClock) -> None:
+        self.rpc=_RecordingRPC(clock)
+        self.pubsub=FakePubSub()
+
+
+class ReplayEngine:
+    """_summary_
+    Replays a BusCapture through the monitors, an IoTDeviceGroupManager and the control strategies without a
+    VOLTTRON platform. The fleet is provisioned from the capture (one group per building, the device kind taken
+    from the frames), the strategies pace their actions on a VirtualPacer and the devices send their commands
+    to a recording vip, so the result is the command stream with the virtual time of every command.
+    speed N replays at N times real time, None replays as fast as possible.
+    """
+    def __init__(self, speed: float = None, stagger: float = None) -> None:
+        """_summary_
+
+        Args:
+            speed (float): replay speed as a multiple of real time, as fast as possible if None
+            stagger (float): default pacing gap of the virtual pacer, 0.25 s (the EV strategy stagger) if None
+        """
+        self._speed=speed
+        self._clock=VirtualClock()
+        self._pacer=VirtualPacer(self._clock,.25 if stagger is None else stagger)
+        self._vip=_RecordingVIP(self._clock)
+        self._manager=IoTDeviceGroupManager(self._create_Registry())
+        self._plug_monitor=DeviceMonitor()
+        self._ev_monitor=EvMonitor()
+        self._gleamm_monitor=GLEAMMMonitor()
+        self._plug_monitor.set_EMS_Controller(self)
+        self._groups={}
+        self._devices={}
+        self._kinds={}
+        self._histograms={}
+
+    def _create_Registry(self) -> StrategyRegistry:
+        # the built-in strategies keep their dwell times and deadlines on the virtual clock; plugin control types of
+        # the default registry are replayed as registered
+        registry=StrategyRegistry.create_Builtin(self._clock)
+        default=StrategyRegistry.get_Default()
+        for control_type in default.get_Control_Types():
+            if control_type not in registry.get_Control_Types():
+                registry.register(control_type,default.get_Factory(control_type))
+        return registry
+
+    def _classify(self, topic: str, message) -> str:
+        kind=self._kinds.get(topic)
+        if kind is None:
+            if topic.startswith('control'):
+                kind='control'
+            elif 'GLEAMM' in topic:
+                kind='gleamm'
+            else:
+                frame=message[0] if isinstance(message,list) and message else {}
+                kind='ev' if 'current' in frame else 'plug'
+            self._kinds[topic]=kind
+        return kind
+
+    def _add_Device(self, device, building: str, monitor) -> None:
+        self._devices[device._id]=device
+        monitor.register_Observer(device)
+        self._groups.setdefault(building,IoTDeviceGroup()).add_Device(device)
+
+    def provision(self, path: str) -> int:
+        """_summary_
+        create a device for every device and GLEAMM load point seen in the capture
+        Returns:
+            int: number of devices
+        """
+        for offset,topic,message in read_Capture(path):
+            kind=self._classify(topic,message)
+            if kind == 'control':
+                continue
+            parts=topic.split('/')
+            if kind == 'gleamm':
+                head='/'.join(parts[-4:-1])
+                for key in message[0]:
+                    if _GLEAMM_LOAD.match(key) and head+'/'+key not in self._devices:
+                        load=SmartPlug(head+'/'+key,self._vip)
+                        load._deviceType='gleammrload'
+                        self._add_Device(load,head,self._gleamm_monitor)
+            else:
+                device_id='/'.join(parts[-4:-1])
+                if device_id not in self._devices:
+                    device=EVCharger(device_id,self._vip) if kind == 'ev' else SmartPlug(device_id,self._vip)
+                    self._add_Device(device,parts[-3],self._ev_monitor if kind == 'ev' else self._plug_monitor)
+        with open(os.devnull,'w') as devnull, redirect_stdout(devnull):
+            for group in self._groups.values():
+                self._manager.add_Group(group)
+        return len(self._devices)
+
+    def execute_Strategy(self, command: dict) -> None:
+        # EMS controller of the plug monitor, control frames run the strategy on the merged groups
+        self._manager.control_All_Groups_set_cmd(command['cmd'])
+        self._manager.control_All_Groups()
+
+    def run(self, path: str) -> dict:
+        """_summary_
+        Args:
+            path (str): capture file written by BusCapture
+        Returns:
+            dict: frame counts, virtual and wall time, the number of commands and per frame kind latencies
+        """
+        if not self._devices:
+            self.provision(path)
+        monitors={'plug':self._plug_monitor,'control':self._plug_monitor,'ev':self._ev_monitor,'gleamm':self._gleamm_monitor}
+        previous_pacer=ControlStrategy._default_pacer
+        previous_dispatcher=Send._default_dispatcher
+        ControlStrategy.set_Default_Pacer(self._pacer)
+        Send.set_Default_Dispatcher(None)
+        frames=0
+        offset=0.0
+        wall_start=time.perf_counter()
+        try:
+            # Send prints every command, the command stream is kept by the recording vip instead
+            with open(os.devnull,'w') as devnull, redirect_stdout(devnull):
+                for offset,topic,message in read_Capture(path):
+                    if self._speed:
+                        delay=wall_start+offset/self._speed-time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    self._pacer.run_Until(offset)
+                    kind=self._classify(topic,message)
+                    start=time.perf_counter()
+                    monitors[kind].process_Message({'topic':topic,'message':message})
+                    self._histograms.setdefault(kind,LatencyHistogram()).observe(time.perf_counter()-start)
+                    frames+=1
+                self._pacer.run_Until(None)
+        finally:
+            ControlStrategy.set_Default_Pacer(previous_pacer)
+            Send.set_Default_Dispatcher(previous_dispatcher)
+        wall_seconds=time.perf_counter()-wall_start
+        virtual_seconds=max(offset,self._clock())
+        return {'frames':frames,
+                'devices':len(self._devices),
+                'commands':len(self._vip.rpc.commands),
+                'virtual_seconds':virtual_seconds,
+                'wall_seconds':wall_seconds,
+                'speedup':virtual_seconds/wall_seconds if wall_seconds > 0 else 0.0,
+                'latency_ms':{kind:{'count':histogram.count,
+                                    'p50':histogram.percentile(0.5)*1000,
+                                    'p95':histogram.percentile(0.95)*1000,
+                                    'p99':histogram.percentile(0.99)*1000} for kind,histogram in self._histograms.items()}}
+
+    def get_Commands(self) -> list:
+        return self._vip.rpc.commands
+
+    def write_Commands(self, path: str) -> None:
+        # one JSON object per line, in the order the commands were sent
+        with open(path,'w') as f:
+            for command in self._vip.rpc.commands:
+                f.write(json.dumps(command,separators=(',',':'))+'\n')
+
+
+def synthesize_Capture(path: str, devices: int = 1000, hours: float = 1, period: float = 60, seed: int = 1) -> int:
+    """_summary_
+    write a capture of a synthetic building (Benchmark.SyntheticFleet) reporting every period seconds,
+    with an lpc control frame every ten reporting rounds, to try the replay without a recorded stream
+    Returns:
+        int: number of frames written
+    """
+    from Benchmark.FakeVIP import FakeVIP
+    from Benchmark.SyntheticFleet import SyntheticFleet
+    evs=devices//10
+    fleet=SyntheticFleet(FakeVIP(),max(0,devices-evs-60),evs,60,seed)
+    with BusCapture(path) as capture:
+        rounds=int(hours*3600/period)
+        for index in range(rounds):
+            now=index*period
+            frames=fleet.plug_Frames()+fleet.ev_Frames()+fleet.gleamm_Frames()
+            for position,frame in enumerate(frames):
+                capture.record(frame['topic'],frame['message'],now+position*period/len(frames))
+            if index % 10 == 9:
+                capture.record('control/building540/lpc',['lpc',devices*120*(0.5+(index//10) % 2)],now+period*0.99)
+        return capture.frames
+
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description="replay a captured bus stream through the load priority control")
+    parser.add_argument('capture',help="capture file written by BusCapture")
+    parser.add_argument('--speed',type=float,default=None,help="multiple of real time, as fast as possible if omitted")
+    parser.add_argument('--commands',default=None,help="write the command stream here as JSON lines")
+    parser.add_argument('--report',default=None,help="write the timing report here as JSON")
+    parser.add_argument('--synthesize',type=int,default=None,metavar='DEVICES',help="first write a synthetic capture of this many devices")
+    parser.add_argument('--hours',type=float,default=1)
+    args=parser.parse_args()
+
+    if args.synthesize:
+        print(f"synthesized {synthesize_Capture(args.capture,args.synthesize,args.hours)} frames")
+    engine=ReplayEngine(args.speed)
+    print(f"provisioned {engine.provision(args.capture)} devices")
+    report=engine.run(args.capture)
+    print(json.dumps(report,indent=1))
+    if args.commands:
+        engine.write_Commands(args.commands)
+    if args.report:
+        with open(args.report,'w') as f:
+            json.dump(report,f,indent=1)
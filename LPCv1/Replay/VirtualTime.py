@@ -0,0 +1,59 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Controller.ActuationPacer import PacingQueue
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualClock:
+    """_summary_
+    Clock of a replay. Time only moves when the replay advances it, so waits cost nothing.
+    """
+    def __init__(self, start: float = 0.0) -> None:
+        self._now=start
+
+    def __call__(self) -> float:
+        return self._now
+
+    def now(self) -> float:
+        return self._now
+
+    def set(self, now: float) -> None:
+        if now > self._now:
+            self._now=now
+
+
+class VirtualPacer(PacingQueue):
+    """_summary_
+    ActuationPacer for virtual time. Actions are queued with the same spacing rules as the ActuationPacer,
+    but run by run_Until when the replay moves the clock past their due time, on the replay thread and
+    with the clock set to the due time, so the commands they send carry the time they would have been sent at.
+    """
+    def __init__(self, clock: VirtualClock, stagger: float = 0.25) -> None:
+        super().__init__(stagger,clock)
+
+    def run_Until(self, until: float = None) -> int:
+        """_summary_
+        run the actions due up to until, all of them if None
+        Returns:
+            int: number of actions run
+        """
+        ran=0
+        while True:
+            due=self._next_Due()
+            if due is None or (until is not None and due > until):
+                break
+            due,action=self._pop()
+            self._clock.set(due)
+            self._run_Action(action)
+            ran+=1
+        if until is not None:
+            self._clock.set(until)
+        return ran
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
@@ -0,0 +1,306 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Controller.ResiliencyControllerv1 import BatteryOptimizer
+from Model.BatterySim import Battery
+from Resiliency.SimulatedStorage import SimulatedStorageVIP
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import redirect_stdout
+import argparse
+import random
+import math
+import json
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+TIERS=('critical','medium','low')
+
+DEFAULT_SCENARIO_CONFIG={
+    'battery':{'capacity_kWh':100,
+               'max_discharge_kW':20,
+               'voltage_nominal':48,
+               'peukert_exponent':1.1,
+               'charge_efficiency':0.95,
+               'discharge_efficiency':0.95,
+               'temperature_C':25,
+               'min_soc_percent':20},
+    'weights':{'critical':100,'medium':10,'low':1},
+    'horizon_hours':1,              # n_hours of the BatteryOptimizer, one hour runs on its analytic fast path
+    'outage_median_hours':12,       # outage durations are lognormal around this median
+    'outage_sigma':0.9,
+    'outage_max_hours':96,
+    'initial_soc':(0.5,1.0),        # range of the SOC fraction the outage starts at
+    'nominal_loads_kW':{'critical':2.5,'medium':2,'low':3},
+    'load_spread':0.3,              # +- fraction the level of a group is drawn from per scenario
+    'load_daily_amplitude':0.3,     # amplitude of the daily load shape, peaking in the late afternoon
+    'load_noise':0.1,               # hourly multiplicative noise of the loads
+    'shed_tolerance':0.01,          # a group is shed in an hour when it gets less than this fraction short of its demand
+}
+
+
+def sample_Scenario(config: dict, seed: int, index: int) -> dict:
+    """_summary_
+    draw one outage; the scenario only depends on (seed, index), so a run is reproducible whichever worker runs it
+    Returns:
+        dict: outage duration and start hour, initial SOC fraction and the hourly demand in kW of every group
+    """
+    rng=random.Random(seed*1000003+index)
+    hours=int(min(config['outage_max_hours'],max(1,math.ceil(rng.lognormvariate(math.log(config['outage_median_hours']),config['outage_sigma'])))))
+    start=rng.randrange(24)
+    initial_soc=rng.uniform(*config['initial_soc'])
+    amplitude=config['load_daily_amplitude']
+    loads={}
+    for tier in TIERS:
+        level=config['nominal_loads_kW'][tier]*rng.uniform(1-config['load_spread'],1+config['load_spread'])
+        loads[tier]=[max(0.0,level*(1+amplitude*math.sin(2*math.pi*(start+hour-11)/24))*rng.gauss(1,config['load_noise'])) for hour in range(hours)]
+    return {'index':index,'outage_hours':hours,'start_hour':start,'initial_soc':initial_soc,'loads':loads}
+
+
+def run_Scenario(config: dict, scenario: dict) -> dict:
+    """_summary_
+    Runs the BatteryOptimizer closed loop against a BatterySim.Battery for the length of the outage. On the one hour
+    fast path the optimizer gets the demand of the groups as max_loads every hour; a longer horizon plans against the
+    peak demand of every group over the outage instead, so its MILP is built once per scenario and only re-solved
+    from the SOC. Every hour the battery discharges what the optimizer allocates, capped at the demand of each group,
+    and when it cannot deliver all of it the lowest groups go without first. An infeasible hour (critical demand
+    above the discharge limit) tries to carry the critical group alone.
+    Returns:
+        dict: unserved energy and shed hours of every group, infeasible hours, final SOC, solver time and model builds
+    """
+    parameters=config['battery']
+    battery=Battery(parameters['capacity_kWh'],parameters['max_discharge_kW'],parameters['voltage_nominal'],
+                    parameters['peukert_exponent'],parameters['charge_efficiency'],parameters['discharge_efficiency'],
+                    initial_soc=scenario['initial_soc'],temperature_C=parameters['temperature_C'],
+                    min_soc_percent=parameters['min_soc_percent'])
+    loads=scenario['loads']
+    # max_loads is part of the MILP's model key, changing it every hour would rebuild the model every hour
+    hourly_loads=config['horizon_hours'] == 1
+    max_loads={tier:loads[tier][0] if hourly_loads else max(loads[tier]) for tier in TIERS}
+    optimizer=BatteryOptimizer(config['horizon_hours'],parameters['capacity_kWh'],battery.soc/1000,
+                               max_loads,config['weights'],SimulatedStorageVIP(battery))
+    unserved={tier:0.0 for tier in TIERS}
+    shed_hours={tier:0 for tier in TIERS}
+    infeasible_hours=0
+    solve_seconds=0.0
+    model_builds=0
+    for hour in range(scenario['outage_hours']):
+        demand={tier:loads[tier][hour] for tier in TIERS}
+        if hourly_loads:
+            optimizer.max_loads=demand
+        optimizer.current_soc=battery.soc/1000
+        decision=optimizer.optimize()
+        solve_seconds+=decision['Solve_Time']
+        model_builds+=decision['Model_Rebuilt']
+        if decision['Optimization_Status'] == 'Optimal':
+            allocation={tier:min(decision[f'P_{tier}_Optimized'],demand[tier]) for tier in TIERS}
+        else:
+            infeasible_hours+=1
+            allocation={'critical':demand['critical'],'medium':0.0,'low':0.0}
+        supplied=battery.discharge(sum(allocation.values())*1000,1.0)/1000
+        for tier in TIERS:
+            served=min(allocation[tier],supplied)
+            supplied-=served
+            unserved[tier]+=max(0.0,demand[tier]-served)
+            if served < demand[tier]*(1-config['shed_tolerance']):
+                shed_hours[tier]+=1
+    return {'index':scenario['index'],
+            'outage_hours':scenario['outage_hours'],
+            'initial_soc':scenario['initial_soc'],
+            'final_soc':battery.soc/battery.capacity_Wh_actual,
+            'unserved_kWh':unserved,
+            'shed_hours':shed_hours,
+            'infeasible_hours':infeasible_hours,
+            'solve_seconds':solve_seconds,
+            'model_builds':model_builds}
+
+
+def _run_Chunk(config: dict, seed: int, indices: list) -> list:
+    # worker entry point; the optimizer prints the SOC around every solve
+    with open(os.devnull,'w') as devnull, redirect_stdout(devnull):
+        return [run_Scenario(config,sample_Scenario(config,seed,index)) for index in indices]
+
+
+class RunningStatistic:
+    """_summary_
+    Streaming mean, standard deviation (Welford), extremes and percentiles of one metric. The percentiles
+    come from a fixed size reservoir sample, so the memory stays bounded however many scenarios are run.
+    """
+    __slots__=('count','mean','_m2','minimum','maximum','_reservoir','_size','_random')
+
+    def __init__(self, reservoir_size: int = 10000, seed: int = 0) -> None:
+        self.count=0
+        self.mean=0.0
+        self._m2=0.0
+        self.minimum=math.inf
+        self.maximum=-math.inf
+        self._reservoir=[]
+        self._size=reservoir_size
+        self._random=random.Random(seed)
+
+    def add(self, value: float) -> None:
+        self.count+=1
+        delta=value-self.mean
+        self.mean+=delta/self.count
+        self._m2+=delta*(value-self.mean)
+        self.minimum=min(self.minimum,value)
+        self.maximum=max(self.maximum,value)
+        if len(self._reservoir) < self._size:
+            self._reservoir.append(value)
+        else:
+            slot=self._random.randrange(self.count)
+            if slot < self._size:
+                self._reservoir[slot]=value
+
+    def percentile(self, q: float) -> float:
+        if not self._reservoir:
+            return 0.0
+        ordered=sorted(self._reservoir)
+        return ordered[min(len(ordered)-1,int(q*len(ordered)))]
+
+    def get_Summary(self) -> dict:
+        return {'count':self.count,
+                'mean':self.mean,
+                'std':math.sqrt(self._m2/(self.count-1)) if self.count > 1 else 0.0,
+                'min':self.minimum if self.count else 0.0,
+                'max':self.maximum if self.count else 0.0,
+                'p50':self.percentile(0.5),
+                'p95':self.percentile(0.95),
+                'p99':self.percentile(0.99)}
+
+
+class ScenarioSummary:
+    """_summary_
+    Summary statistics of the scenario results, updated as every result arrives
+    """
+    def __init__(self, reservoir_size: int = 10000) -> None:
+        names=['outage_hours','final_soc','infeasible_hours','solve_seconds']
+        names+=[f'unserved_{tier}_kWh' for tier in TIERS]+[f'shed_hours_{tier}' for tier in TIERS]
+        self._statistics={name:RunningStatistic(reservoir_size,position) for position,name in enumerate(names)}
+        self._critical_losses=0
+        self.scenarios=0
+
+    def add(self, result: dict) -> None:
+        self.scenarios+=1
+        statistics=self._statistics
+        for name in ('outage_hours','final_soc','infeasible_hours','solve_seconds'):
+            statistics[name].add(result[name])
+        for tier in TIERS:
+            statistics[f'unserved_{tier}_kWh'].add(result['unserved_kWh'][tier])
+            statistics[f'shed_hours_{tier}'].add(result['shed_hours'][tier])
+        if result['shed_hours']['critical']:
+            self._critical_losses+=1
+
+    def get_Summary(self) -> dict:
+        return {'scenarios':self.scenarios,
+                'critical_loss_probability':self._critical_losses/self.scenarios if self.scenarios else 0.0,
+                'metrics':{name:statistic.get_Summary() for name,statistic in self._statistics.items()}}
+
+
+class ScenarioEngine:
+    """_summary_
+    Monte Carlo resiliency planning: samples outages (duration, per group load profiles, initial SOC), runs every
+    one closed loop through BatteryOptimizer and BatterySim.Battery on a process pool and streams the results into
+    a ScenarioSummary in scenario order. The storage agent RPCs of the optimizer are answered by
+    SimulatedStorageVIP, so no platform is needed.
+    """
+    def __init__(self, config: dict = None, workers: int = None, seed: int = 1, chunk_size: int = 16) -> None:
+        """_summary_
+
+        Args:
+            config (dict): overrides of DEFAULT_SCENARIO_CONFIG, top level keys replace the default entries
+            workers (int): worker processes, os.cpu_count() if None, 1 runs in this process
+            seed (int): seed of the scenario sampling
+            chunk_size (int): scenarios sent to a worker at a time
+        """
+        self._config={**DEFAULT_SCENARIO_CONFIG,**(config or {})}
+        self._workers=workers or os.cpu_count() or 1
+        self._seed=seed
+        self._chunk_size=max(1,chunk_size)
+
+    def run(self, scenarios: int, on_Result=None, summary: ScenarioSummary = None) -> dict:
+        """_summary_
+
+        Args:
+            scenarios (int): number of scenarios to run
+            on_Result (callable): called with every scenario result as it arrives, e.g. to write it out
+            summary (ScenarioSummary): summary to add to, a new one if None
+        Returns:
+            dict: the summary statistics, with the wall time and the scenario throughput
+        """
+        summary=summary or ScenarioSummary()
+        chunks=(list(range(start,min(start+self._chunk_size,scenarios))) for start in range(0,scenarios,self._chunk_size))
+        start=time.perf_counter()
+
+        def collect(results):
+            for result in results:
+                summary.add(result)
+                if on_Result is not None:
+                    on_Result(result)
+
+        if self._workers == 1:
+            for indices in chunks:
+                collect(_run_Chunk(self._config,self._seed,indices))
+        else:
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                # chunks are collected in index order whatever order they complete in, so the summary (floating
+                # point sums and reservoir alike) is the same as a single worker run. Finished chunks wait in
+                # ready for the ones before them and count towards the bounded number in flight, which keeps
+                # the memory flat for large runs
+                pending={}
+                ready={}
+                next_chunk=0
+
+                def collect_Ready():
+                    nonlocal next_chunk
+                    while next_chunk in ready:
+                        collect(ready.pop(next_chunk))
+                        next_chunk+=1
+
+                def wait_Any():
+                    done,_=wait(pending,return_when=FIRST_COMPLETED)
+                    for future in done:
+                        ready[pending.pop(future)]=future.result()
+                    collect_Ready()
+
+                for position,indices in enumerate(chunks):
+                    pending[executor.submit(_run_Chunk,self._config,self._seed,indices)]=position
+                    while len(pending)+len(ready) >= self._workers*4:
+                        wait_Any()
+                while pending:
+                    wait_Any()
+        seconds=time.perf_counter()-start
+        report=summary.get_Summary()
+        report['seconds']=seconds
+        report['scenarios_per_s']=summary.scenarios/seconds if seconds > 0 else 0.0
+        report['workers']=self._workers
+        report['seed']=self._seed
+        return report
+
+
+if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description="Monte Carlo outage scenarios of the battery optimizer")
+    parser.add_argument('--scenarios',type=int,default=1000)
+    parser.add_argument('--workers',type=int,default=None)
+    parser.add_argument('--seed',type=int,default=1)
+    parser.add_argument('--chunk-size',type=int,default=16)
+    parser.add_argument('--config',default=None,help="JSON file of DEFAULT_SCENARIO_CONFIG overrides")
+    parser.add_argument('--results',default=None,help="write every scenario result here as JSON lines")
+    parser.add_argument('--output',default=None,help="write the summary here as JSON")
+    args=parser.parse_args()
+
+    config=None
+    if args.config:
+        with open(args.config) as f:
+            config=json.load(f)
+    engine=ScenarioEngine(config,args.workers,args.seed,args.chunk_size)
+    if args.results:
+        with open(args.results,'w') as out:
+            report=engine.run(args.scenarios,lambda result: out.write(json.dumps(result,separators=(',',':'))+'\n'))
+    else:
+        report=engine.run(args.scenarios)
+    print(json.dumps(report,indent=1))
+    if args.output:
+        with open(args.output,'w') as f:
+            json.dump(report,f,indent=1)
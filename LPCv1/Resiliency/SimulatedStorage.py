@@ -0,0 +1,39 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Benchmark.FakeVIP import FakeAsyncResult, FakePubSub
+from Model.BatterySim import Battery
+import logging
+
+logger = logging.getLogger(__name__)
+
+STORAGE_AGENT='storageAgentagent-0.1_1'
+
+
+class SimulatedStorageRPC:
+    """_summary_
+    Answers the storage agent RPCs of BatteryOptimizer from a BatterySim.Battery instead of the live
+    storageAgent, so the optimizer can run closed loop against the simulated battery without a platform.
+    get_batter1_SOC returns the state of charge in kWh, the unit of the optimizer's battery_capacity.
+    """
+    def __init__(self, battery: Battery) -> None:
+        self._battery=battery
+        self.config=None
+        self.calls=0
+
+    def call(self, peer: str, method: str, *args, **kwargs) -> FakeAsyncResult:
+        self.calls+=1
+        if peer != STORAGE_AGENT:
+            raise ValueError(f"the simulated storage only answers {STORAGE_AGENT}, not {peer}")
+        if method == 'config_battery1':
+            # the optimizer configures the agent's battery, the simulated battery is configured by its owner
+            self.config=args
+            return FakeAsyncResult(True,0)
+        if method == 'get_batter1_SOC':
+            return FakeAsyncResult(self._battery.soc/1000,0)
+        raise ValueError(f"the simulated storage agent has no method {method}")
+
+
+class SimulatedStorageVIP:
+    def __init__(self, battery: Battery) -> None:
+        self.rpc=SimulatedStorageRPC(battery)
+        self.pubsub=FakePubSub()
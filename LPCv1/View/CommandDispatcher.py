@@ -0,0 +1,133 @@
+import sys
+sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
+from Model.LatencyMetrics import LatencyMetrics, STAGE_RPC, COUNTER_COMMAND_FAILURES
+from collections import deque
+import gevent
+from gevent.pool import Pool, Group
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+metrics = LatencyMetrics.get_Default()
+
+
+class CommandDispatcher:
+    """_summary_
+    Sends set_point RPC chains to the platform drivers concurrently on gevent greenlets, the concurrency
+    model of the volttron agent, so the vip calls are made on the agent's hub like every other RPC and
+    never from a worker thread. Every driver gets its own gevent Pool, so one slow driver cannot hold
+    up the others and no driver sees more than max_concurrency chains in flight; submit never waits
+    for a free slot, chains beyond the limit wait their turn in the pool. The calls of one chain (e.g.
+    the GLEAMM control point followed by its breaker point) run in order, each one waiting for the
+    previous RPC to complete instead of sleeping for a fixed time. Chains submitted with the same key (the
+    device id) run one after the other in submit order, so an off command sent after an on command to the
+    same device is never overtaken by it. A chain that fails is logged, counted and kept in get_Failures, so
+    a caller that drops the greenlet still does not lose it.
+    """
+    def __init__(self, vip, max_concurrency: int = 8, timeout: float = 10, max_failures: int = 100) -> None:
+        """_summary_
+
+        Args:
+            vip (obj): volttron vip connection for communication in the volttron message bus
+            max_concurrency (int): maximum number of chains in flight per driver
+            timeout (float): seconds to wait for each RPC result
+            max_failures (int): number of the most recent failed chains kept for get_Failures
+        """
+        self._vip=vip
+        self._max_concurrency=max_concurrency
+        self._timeout=timeout
+        self._pools={}
+        self._waiting=Group() # greenlets waiting for the previous chain of their device, then for a pool slot
+        self._tails={} # device id -> its last submitted chain
+        self._failures=deque(maxlen=max_failures)
+
+    def _get_Pool(self, driver: str) -> Pool:
+        pool=self._pools.get(driver)
+        if pool is None:
+            pool=self._pools[driver]=Pool(self._max_concurrency)
+        return pool
+
+    def _run_Chain(self, calls: list, label: str = '') -> list:
+        start=time.perf_counter()
+        results=[]
+        try:
+            for args,kwargs in calls:
+                result=self._vip.rpc.call(*args,**kwargs).get(timeout=self._timeout)
+                results.append(result)
+        finally:
+            metrics.observe(STAGE_RPC,time.perf_counter()-start,label)
+        return results
+
+    def _on_Failure(self, chain: gevent.Greenlet, calls: list, label: str) -> None:
+        logger.error(f"command chain {calls[0][0][2:] if calls else ''} failed {chain.exception!r}")
+        metrics.increment(COUNTER_COMMAND_FAILURES,label)
+        self._failures.append((label,calls,chain.exception))
+
+    def submit(self, calls: list, driver: str = 'platform.driver', label: str = '', key: str = None) -> gevent.Greenlet:
+        """_summary_
+        queue a chain of RPC calls for one device
+        Args:
+            calls (list): ordered (args, kwargs) pairs for vip.rpc.call
+            driver (str): key of the driver the calls go to, used to bound the concurrency
+            label (str): device type the RPC latency and the failures are recorded under
+            key (str): device id; the chain starts once the previous chain of the same key is done, unordered if None
+        Returns:
+            gevent.Greenlet: resolves to the list of RPC results of the chain
+        """
+        chain=gevent.Greenlet(self._run_Chain,calls,label)
+        chain.link_exception(lambda chain: self._on_Failure(chain,calls,label))
+        previous=None
+        if key is not None:
+            previous=self._tails.get(key)
+            self._tails[key]=chain
+            chain.link(lambda chain: self._release_Tail(key,chain))
+        self._waiting.spawn(self._start,self._get_Pool(driver),chain,previous)
+        return chain
+
+    @staticmethod
+    def _start(pool: Pool, chain: gevent.Greenlet, previous: gevent.Greenlet) -> None:
+        # wait for the previous chain of the device before taking a pool slot, so a waiting chain holds no slot
+        if previous is not None:
+            previous.join()
+        pool.start(chain)
+
+    def _release_Tail(self, key: str, chain: gevent.Greenlet) -> None:
+        if self._tails.get(key) is chain:
+            del self._tails[key]
+
+    def get_Failures(self) -> list:
+        """_summary_
+        Returns:
+            list: (label, calls, exception) of the most recent chains that failed, oldest first
+        """
+        return list(self._failures)
+
+    def wait_All(self, chains: list, timeout: float = None) -> list:
+        """_summary_
+        wait until the given chains are done
+        Returns:
+            list: the chain results, or the raised exception for the chains that failed
+        """
+        gevent.joinall(chains,timeout=timeout)
+        results=[]
+        for chain in chains:
+            if not chain.ready():
+                results.append(TimeoutError("command chain still in flight"))
+            elif not chain.successful():
+                results.append(chain.exception)
+            else:
+                results.append(chain.value)
+        return results
+
+    def shutdown(self, wait_pending: bool = True) -> None:
+        pools=list(self._pools.values())
+        self._pools={}
+        self._tails={}
+        if wait_pending:
+            self._waiting.join()
+            for pool in pools:
+                pool.join()
+        else:
+            self._waiting.kill()
+            for pool in pools:
+                pool.kill()
@@ -1,36 +1,79 @@
-
 import sys
-import time
 sys.path.append("/home/sanka/NIRE_EMS/volttron/LoadPriorityControl/LPCv1/")
 from View.Publish import Publish
+from View.CommandDispatcher import CommandDispatcher
 from Model.IoTMessage import IoTMessage
+from Model.LatencyMetrics import LatencyMetrics, STAGE_PUBLISH
+import time
+
+metrics = LatencyMetrics.get_Default()
+
 class Send(Publish):
-    def __init__(self,vip) -> None:
+    _default_dispatcher=None # shared CommandDispatcher used by every Send created without one
+
+    def __init__(self,vip,dispatcher: CommandDispatcher=None,timeout: float=10) -> None:
         super().__init__()
         self._vip=vip
-        
-    def publish(self, message: IoTMessage, deviceType:str) -> bool:
-        print("Sending",message)
+        self._dispatcher=dispatcher
+        self._timeout=timeout
+
+    @classmethod
+    def set_Default_Dispatcher(cls,dispatcher: CommandDispatcher) -> None:
+        cls._default_dispatcher=dispatcher
+
+    def _set_Point_Calls(self, message: IoTMessage, deviceType:str) -> tuple:
+        """_summary_
+        resolve the message into the ordered set_point calls it needs; the payload is read here so
+        later changes of the (reused) message object do not leak into commands still in flight
+        Returns:
+            tuple: (driver key, list of (args, kwargs) for vip.rpc.call)
+        """
         if deviceType=='plug':
-           result=self._vip.rpc.call('platform.driver','set_point',message.device_id,'status',message.payload['cmd'],external_platform=message.device_id.split('/')[-2])
+           platform=message.device_id.split('/')[-2]
+           return 'platform.driver/'+platform, [(('platform.driver','set_point',message.device_id,'status',message.payload['cmd']),{'external_platform':platform})]
         elif deviceType == 'EV':
-           result=self._vip.rpc.call('platform.driver','set_point',message.device_id,'cmd1',message.payload['cmd'])
+           return 'platform.driver', [(('platform.driver','set_point',message.device_id,'cmd1',message.payload['cmd']),{})]
         elif deviceType == 'gleammrload':
             temp=message.device_id.split('/')
             if 'PPT' in message.device_id:
                 topic= 'Microgrid/GLEAMM/BuildingP'
                 control= 'CMDPT'+temp[-1][-2]+temp[-1][-1]if temp[-1][-1]=='0' else 'CMDPT'+temp[-1][-1]
                 breaker = 'CMDPBRK'
-                
+
             elif  'PCT' in message.device_id:
                 topic= 'Microgrid/GLEAMM/BuildingC'
                 control= 'CMDCT'+temp[-1][-2]+temp[-1][-1]if temp[-1][-1]=='0' else 'CMDCT'+temp[-1][-1]
                 breaker = 'CMDCBRK'
             elif 'PIT' in message.device_id:
                 topic= 'Microgrid/GLEAMM/BuildingI'
-                control= 'CMDIT'+temp[-1][-2]+temp[-1][-1]if temp[-1][-1]=='0' else 'CMDIT'+temp[-1][-1]  
-                breaker = 'CMDIBRK'     
-            print("_________________^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^",topic,control)         
-            result=self._vip.rpc.call('platform.driver','set_point',topic,control,message.payload['cmd'])
-            time.sleep(.5)
-            result=self._vip.rpc.call('platform.driver','set_point',topic,breaker,1)
\ No newline at end of file
+                control= 'CMDIT'+temp[-1][-2]+temp[-1][-1]if temp[-1][-1]=='0' else 'CMDIT'+temp[-1][-1]
+                breaker = 'CMDIBRK'
+            print("_________________^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^",topic,control)
+            # the breaker point may only be written once the control point has been applied
+            return 'platform.driver/'+topic, [(('platform.driver','set_point',topic,control,message.payload['cmd']),{}),
+                                             (('platform.driver','set_point',topic,breaker,1),{})]
+        return None, []
+
+    def publish(self, message: IoTMessage, deviceType:str):
+        """_summary_
+        send the command; with a dispatcher the call returns at once with a greenlet resolving to the RPC results,
+        without one the RPCs are made in order by the caller
+        """
+        print("Sending",message)
+        start=time.perf_counter()
+        driver,calls=self._set_Point_Calls(message,deviceType)
+        if not calls:
+            return []
+        dispatcher=self._dispatcher if self._dispatcher is not None else self._default_dispatcher
+        if dispatcher is not None:
+            future=dispatcher.submit(calls,driver,deviceType,message.device_id)
+            metrics.observe(STAGE_PUBLISH,time.perf_counter()-start,deviceType)
+            return future
+        results=[]
+        for index,(args,kwargs) in enumerate(calls):
+            result=self._vip.rpc.call(*args,**kwargs)
+            if index < len(calls)-1:
+                result=result.get(timeout=self._timeout)
+            results.append(result)
+        metrics.observe(STAGE_PUBLISH,time.perf_counter()-start,deviceType)
+        return results
@@ -10,8 +10,14 @@ from Controller.SheddingControl import SheddingControl
 from Controller.IncrementalControl import IncrementalControl
 from Controller.EMSControl import EMSControl
 from Model.IoTDeviceGroupManager import IoTDeviceGroupManager
+from View.Send import Send
+from View.CommandDispatcher import CommandDispatcher
+from Controller.ControlStrategy import ControlStrategy
+from Controller.ActuationPacer import ActuationPacer
 import sqlite3
-conn = sqlite3.connect('/home/sanka/NIRE_EMS/volttron/FacadeAgent/Device_configure_database.sqlite')
+import os
+# device configuration database, LPC_DEVICE_DB overrides the path of the lab deployment
+DEVICE_DB=os.environ.get('LPC_DEVICE_DB','/home/sanka/NIRE_EMS/volttron/FacadeAgent/Device_configure_database.sqlite')
 
 def Message(topic,power,status,priority) -> dict:
     message={}
@@ -27,7 +33,22 @@ def Command(topic,cmd) -> dict:
     
     return message
 
-def main():
+def setup_Actuation(vip, stagger: float = 0.25) -> tuple:
+    """_summary_
+    install the shared command path of the agent, to be called once the vip connection is up: device commands
+    go through a CommandDispatcher and the strategies queue their switch actions on an ActuationPacer, both on
+    the agent's gevent hub, so neither publishing a command nor the stagger between two commands holds up telemetry
+    Returns:
+        tuple: the installed (CommandDispatcher, ActuationPacer); get_Failures of the dispatcher lists the commands that failed
+    """
+    dispatcher=CommandDispatcher(vip)
+    Send.set_Default_Dispatcher(dispatcher)
+    pacer=ActuationPacer(stagger)
+    pacer.start()
+    ControlStrategy.set_Default_Pacer(pacer)
+    return dispatcher,pacer
+
+def main(vip=None):
     
         """
         This is method is called once the Agent has successfully connected to the platform.
@@ -37,6 +58,9 @@ def main():
 
         Usually not needed if using the configuration store.
         """
+        dispatcher, pacer = setup_Actuation(vip)
+
+        conn = sqlite3.connect(DEVICE_DB)
         # Step 2: Create a cursor object
         cursor = conn.cursor()
 
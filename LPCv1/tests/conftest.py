@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules import each other from the LPCv1 directory, e.g. from Model.SmartPlug import SmartPlug
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
@@ -0,0 +1,66 @@
+import gevent
+from Controller.ActuationPacer import ActuationPacer
+from Replay.VirtualTime import VirtualClock, VirtualPacer
+
+
+class Device:
+    def __init__(self, id) -> None:
+        self._id=id
+
+
+def make_Pacer():
+    clock=VirtualClock()
+    pacer=VirtualPacer(clock,stagger=1)
+    ran=[]
+    def action(name):
+        return lambda: ran.append((name,clock()))
+    return clock,pacer,ran,action
+
+
+def test_lanes_are_paced_side_by_side():
+    clock,pacer,ran,action=make_Pacer()
+    for i in range(3):
+        pacer.schedule(action(f'a{i}'),device=Device(f'a{i}'),lane='group a')
+        pacer.schedule(action(f'b{i}'),device=Device(f'b{i}'),lane='group b')
+    pacer.run_Until()
+    assert ran == [('a0',0),('b0',0),('a1',1),('b1',1),('a2',2),('b2',2)]
+
+
+def test_new_action_replaces_the_pending_one_of_the_device():
+    clock,pacer,ran,action=make_Pacer()
+    devices=[Device(f'p{i}') for i in range(3)]
+    for device in devices:
+        pacer.schedule(action(f'off {device._id}'),device=device,lane='group')
+    # the next tick plans the same devices again
+    for device in devices:
+        assert pacer.schedule(action(f'off again {device._id}'),device=device,lane='group') == int(device._id[1])
+    assert pacer.pending() == 3
+    pacer.run_Until()
+    assert ran == [('off again p0',0),('off again p1',1),('off again p2',2)]
+
+
+def test_chained_action_follows_the_device():
+    clock,pacer,ran,action=make_Pacer()
+    device=Device('ev0')
+    pacer.schedule(action('setpoint'),stagger=0,device=device,lane='group')
+    pacer.schedule(action('on'),device=device,lane='group',replace=False)
+    assert pacer.cancel_Pending([Device('other')]) == 0
+    pacer.run_Until()
+    assert ran == [('setpoint',0),('on',0)]
+    pacer.schedule(action('off'),device=device,lane='group')
+    assert pacer.cancel_Pending([device]) == 1
+    assert pacer.run_Until() == 0
+
+
+def test_actuation_pacer_runs_on_the_hub():
+    pacer=ActuationPacer(stagger=0.01)
+    ran=[]
+    try:
+        for i in range(3):
+            pacer.schedule(lambda i=i: ran.append(i),device=Device(f'p{i}'),lane='group')
+        pacer.schedule(lambda: ran.append('other group'),device=Device('q0'),lane='other')
+        gevent.sleep(0.1)
+    finally:
+        pacer.stop()
+    assert ran == [0,'other group',1,2]
+    assert pacer.pending() == 0
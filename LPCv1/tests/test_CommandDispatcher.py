@@ -0,0 +1,60 @@
+import gevent
+from View.CommandDispatcher import CommandDispatcher
+
+
+class Result:
+    def __init__(self, rpc, device, value) -> None:
+        self._rpc=rpc
+        self._device=device
+        self._value=value
+
+    def get(self, timeout=None):
+        # an on command takes longer than an off command
+        gevent.sleep(0.05 if self._value == 1 else 0)
+        self._rpc.completed.append((self._device,self._value))
+        return True
+
+
+class RPC:
+    def __init__(self) -> None:
+        self.completed=[]
+
+    def call(self, peer, method, device, point, value, **kwargs) -> Result:
+        return Result(self,device,value)
+
+
+class VIP:
+    def __init__(self) -> None:
+        self.rpc=RPC()
+
+
+def set_Point(device, value) -> list:
+    return [(('platform.driver','set_point',device,'cmd1',value),{})]
+
+
+def test_chains_of_one_device_keep_their_order():
+    vip=VIP()
+    dispatcher=CommandDispatcher(vip)
+    chains=[
+        dispatcher.submit(set_Point('b1/p0',1),key='b1/p0'),
+        dispatcher.submit(set_Point('b1/p0',0),key='b1/p0'),
+        dispatcher.submit(set_Point('b1/p1',1),key='b1/p1'),
+        dispatcher.submit(set_Point('b1/p2',0),key='b1/p2'),
+    ]
+    assert dispatcher.wait_All(chains,timeout=5) == [[True]]*4
+    completed=vip.rpc.completed
+    assert completed.index(('b1/p0',1)) < completed.index(('b1/p0',0))
+    # other devices are not held up
+    assert completed.index(('b1/p2',0)) < completed.index(('b1/p1',1))
+    gevent.sleep(0)
+    assert dispatcher._tails == {}
+    dispatcher.shutdown()
+
+
+def test_unkeyed_chains_are_not_ordered():
+    vip=VIP()
+    dispatcher=CommandDispatcher(vip)
+    chains=[dispatcher.submit(set_Point('b1/p0',1)),dispatcher.submit(set_Point('b1/p0',0))]
+    dispatcher.wait_All(chains,timeout=5)
+    assert vip.rpc.completed == [('b1/p0',0),('b1/p0',1)]
+    dispatcher.shutdown()
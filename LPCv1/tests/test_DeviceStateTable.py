@@ -0,0 +1,53 @@
+import gc
+from Model.SmartPlug import SmartPlug
+from Model.EVCharger import EVCharger
+from Model.IoTDeviceGroup import IoTDeviceGroup
+from Model.DeviceStateTable import DeviceStateTable
+
+
+def make_Group(table):
+    group=IoTDeviceGroup()
+    plug=SmartPlug('campus/b1/p0',None,table)
+    charger=EVCharger('campus/b1/ev0',None,table)
+    group.add_Device(plug)
+    group.add_Device(charger)
+    return group,plug,charger
+
+
+def test_flush_copies_changed_devices():
+    table=DeviceStateTable(capacity=1)
+    group,plug,charger=make_Group(table)
+    plug.update(120,1,2)
+    charger.update(10,60,3,240,0,0,0,1)
+    table.flush(('power','status','priority','voltage'))
+    table,devices,slots=group.get_State_View()
+    assert table.get_Column('power')[slots].tolist() == [120,24]
+    assert table.get_Column('voltage')[slots].tolist() == [0,240]
+
+    plug.update(80,0,2)
+    assert table.get_Column('power')[plug._slot] == 120 # not flushed yet
+    table.flush(('power',))
+    assert table.get_Column('power')[plug._slot] == 80
+    table.flush(('status',))
+    assert table.get_Column('status')[plug._slot] == 0
+
+
+def test_flush_casts_at_the_column_boundary():
+    table=DeviceStateTable()
+    group,plug,charger=make_Group(table)
+    plug.update(50,None,2.5)
+    table.flush(('status','priority'))
+    assert table.get_Column('status')[plug._slot] == 11
+    assert table.get_Column('priority')[plug._slot] == 2.5
+
+
+def test_released_slot_is_not_flushed():
+    table=DeviceStateTable()
+    plug=SmartPlug('campus/b1/p0',None,table)
+    plug.update(50,1,1)
+    slot=plug._slot
+    del plug
+    gc.collect()
+    table.flush(('power',))
+    assert table.get_Column('power')[slot] == 0
+    assert SmartPlug('campus/b1/p1',None,table)._slot == slot
@@ -0,0 +1,154 @@
+import threading
+import time
+import pytest
+from Benchmark.StubLMPServer import StubLMPServer
+from Model.LMPPriceProvider import LMPPriceProvider
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now=0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def stub():
+    stub=StubLMPServer(price=20.0).start()
+    yield stub
+    stub.stop()
+
+
+def make_Provider(stub, clock, **kwargs) -> LMPPriceProvider:
+    kwargs.setdefault('ttl',300)
+    kwargs.setdefault('retry',5)
+    return LMPPriceProvider(url=stub.url,timeout=1,clock=clock,**kwargs)
+
+
+def test_first_fetch_runs_in_the_background(stub):
+    stub.delay=0.5
+    provider=make_Provider(stub,Clock())
+    start=time.perf_counter()
+    assert provider.get_LMP() is None
+    assert time.perf_counter()-start < 0.2
+    assert provider.wait_Refresh(2)
+    assert provider.get_LMP() == 20.0
+    assert provider.is_Fresh()
+    provider.close()
+
+
+def test_concurrent_first_reads_fetch_once(stub):
+    stub.delay=0.2
+    provider=make_Provider(stub,Clock())
+    threads=[threading.Thread(target=provider.get_LMP) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert provider.wait_Refresh(2)
+    assert stub.requests == 1
+    provider.close()
+
+
+def test_fresh_price_is_served_from_the_cache(stub):
+    clock=Clock()
+    provider=make_Provider(stub,clock)
+    provider.get_LMP()
+    provider.wait_Refresh(2)
+    stub.price=30.0
+    clock.now=299
+    assert provider.get_LMP() == 20.0
+    assert stub.requests == 1
+    provider.close()
+
+
+def test_stale_price_is_served_while_a_slow_refresh_runs(stub):
+    clock=Clock()
+    provider=make_Provider(stub,clock)
+    provider.get_LMP()
+    provider.wait_Refresh(2)
+    stub.price=25.0
+    stub.delay=0.5
+    clock.now=300
+    assert not provider.is_Fresh()
+    start=time.perf_counter()
+    assert provider.get_LMP() == 20.0
+    assert provider.get_LMP() == 20.0
+    assert time.perf_counter()-start < 0.2
+    assert provider.wait_Refresh(2)
+    assert provider.get_LMP() == 25.0
+    assert stub.requests == 2
+    provider.close()
+
+
+def test_failing_endpoint_keeps_the_price_and_backs_off(stub):
+    clock=Clock()
+    provider=make_Provider(stub,clock,retry=5)
+    provider.get_LMP()
+    provider.wait_Refresh(2)
+    stub.status=500
+    clock.now=300
+    provider.get_LMP()
+    provider.wait_Refresh(2)
+    assert provider.get_LMP() == 20.0
+    assert stub.requests == 2
+    # retried after 5 s, then after 10 s, not after a whole TTL
+    clock.now=304
+    provider.get_LMP()
+    assert stub.requests == 2
+    clock.now=305
+    provider.get_LMP()
+    provider.wait_Refresh(2)
+    assert stub.requests == 3
+    clock.now=314
+    provider.get_LMP()
+    assert stub.requests == 3
+    stub.status=200
+    stub.price=22.0
+    clock.now=315
+    provider.get_LMP()
+    provider.wait_Refresh(2)
+    assert provider.get_LMP() == 22.0
+    assert stub.requests == 4
+    provider.close()
+
+
+def test_failed_first_fetch_is_retried_before_the_ttl(stub):
+    clock=Clock()
+    stub.status=503
+    provider=make_Provider(stub,clock,retry=5)
+    provider.get_LMP()
+    provider.wait_Refresh(2)
+    assert provider.get_LMP() is None
+    stub.status=200
+    clock.now=5
+    provider.get_LMP()
+    provider.wait_Refresh(2)
+    assert provider.get_LMP() == 20.0
+    provider.close()
+
+
+def test_unreachable_endpoint(stub):
+    clock=Clock()
+    url=stub.url
+    stub.stop()
+    provider=LMPPriceProvider(url=url,timeout=0.5,clock=clock)
+    assert provider.get_LMP() is None
+    assert provider.wait_Refresh(2)
+    assert provider.get_LMP() is None
+    provider.close()
+
+
+def test_prefetch_waits_for_the_first_price_within_the_timeout(stub):
+    provider=make_Provider(stub,Clock())
+    assert provider.prefetch(2)
+    assert provider.get_LMP() == 20.0
+    provider.close()
+    stub.delay=1.0
+    provider=make_Provider(stub,Clock())
+    start=time.perf_counter()
+    assert not provider.prefetch(0.2)
+    assert time.perf_counter()-start < 0.5
+    assert provider.get_LMP() is None
+    provider.close()
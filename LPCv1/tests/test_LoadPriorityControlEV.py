@@ -0,0 +1,167 @@
+import pytest
+from Benchmark.FakeVIP import FakeVIP
+from Model.SmartPlug import SmartPlug
+from Model.IoTDeviceGroup import IoTDeviceGroup
+from Model.DeviceStateTable import DeviceStateTable
+from Model.LatencyMetrics import LatencyMetrics, COUNTER_ACTUATIONS, COUNTER_SUPPRESSED, COUNTER_DEADBAND_TICKS
+from Controller.LoadPriorityControlEV import LoadPriorityControlEV
+from Controller.StrategyRegistry import StrategyRegistry
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now=0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def metrics():
+    metrics=LatencyMetrics.get_Default()
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def make_Group(count=4, power=100.0):
+    # plain plugs of priority 1..count, all running; shedding starts from priority 1
+    vip=FakeVIP()
+    table=DeviceStateTable()
+    group=IoTDeviceGroup()
+    plugs=[]
+    for i in range(count):
+        plug=SmartPlug(f'campus/b1/p{i}',vip,table)
+        plug._max_power_rating=power
+        plug.update(power,1,i+1)
+        plug._last_command=1
+        group.add_Device(plug)
+        plugs.append(plug)
+    return group,plugs,vip
+
+
+def report(plugs, power=100.0):
+    # every plug reports the state its last command asked for
+    for plug in plugs:
+        if plug._last_command == 0:
+            plug.update(0,0,plug._priority)
+        else:
+            plug.update(power,1,plug._priority)
+
+
+def switched_Off(plugs) -> list:
+    return [plug._id for plug in plugs if plug._last_command == 0]
+
+
+def make_Strategy(clock, **kwargs) -> LoadPriorityControlEV:
+    strategy=LoadPriorityControlEV(clock=clock,**kwargs)
+    strategy._stagger=0
+    return strategy
+
+
+def test_defaults_shed_every_tick(metrics):
+    group,plugs,vip=make_Group()
+    strategy=make_Strategy(Clock())
+    strategy.execute(group,['lpc',250])
+    assert switched_Off(plugs) == ['campus/b1/p0','campus/b1/p1']
+    report(plugs)
+    # still above the command: the loads already off are sent the command again, the next one is shed
+    strategy.execute(group,['lpc',150])
+    assert switched_Off(plugs) == ['campus/b1/p0','campus/b1/p1','campus/b1/p2']
+    stats=strategy.get_Suppression_Stats()
+    assert stats['redundant'] == 0
+    assert stats['actuations'] == 5
+    assert metrics.get_Counter(COUNTER_ACTUATIONS,'shed') == 5
+
+
+def test_deadband_leaves_the_consumption_alone(metrics):
+    group,plugs,vip=make_Group()
+    strategy=make_Strategy(Clock(),shed_deadband=0.1,restore_deadband=0.1)
+    strategy.execute(group,['lpc',380]) # 400 is within 10 % above
+    strategy.execute(group,['lpc',420]) # and within 10 % below
+    assert switched_Off(plugs) == []
+    assert vip.rpc.calls == 0
+    assert strategy.get_Suppression_Stats()['deadband_ticks'] == 2
+    assert metrics.get_Counter(COUNTER_DEADBAND_TICKS,'shed') == 1
+    assert metrics.get_Counter(COUNTER_DEADBAND_TICKS,'restore') == 1
+    strategy.execute(group,['lpc',300])
+    assert switched_Off(plugs) == ['campus/b1/p0']
+
+
+def test_min_on_time_sheds_the_next_candidate(metrics):
+    group,plugs,vip=make_Group()
+    clock=Clock()
+    strategy=make_Strategy(clock,min_on_time=600)
+    plugs[0]._last_command=0
+    report(plugs)
+    strategy.execute(group,['lpc',1000]) # the strategy switches p0 back on
+    assert switched_Off(plugs) == []
+    report(plugs)
+    clock.now=60
+    strategy.execute(group,['lpc',300])
+    # p0 is in its min on time, p1 is shed in its place and the group gets under the command in one tick
+    assert switched_Off(plugs) == ['campus/b1/p1']
+    assert strategy.get_Suppression_Stats()['dwell'] == 1
+    assert metrics.get_Counter(COUNTER_SUPPRESSED,'dwell') == 1
+    report(plugs)
+    clock.now=700
+    strategy.execute(group,['lpc',200])
+    assert switched_Off(plugs) == ['campus/b1/p0','campus/b1/p1']
+    assert strategy.get_Suppression_Stats()['dwell'] == 1
+
+
+def test_min_off_time_holds_a_restore(metrics):
+    group,plugs,vip=make_Group()
+    clock=Clock()
+    strategy=make_Strategy(clock,min_off_time=600)
+    strategy.execute(group,['lpc',300])
+    assert switched_Off(plugs) == ['campus/b1/p0']
+    report(plugs)
+    clock.now=60
+    strategy.execute(group,['lpc',1000])
+    assert switched_Off(plugs) == ['campus/b1/p0']
+    assert strategy.get_Suppression_Stats()['dwell'] == 1
+    clock.now=700
+    strategy.execute(group,['lpc',1000])
+    assert switched_Off(plugs) == []
+
+
+def test_actuation_budget(metrics):
+    group,plugs,vip=make_Group()
+    strategy=make_Strategy(Clock(),max_actuations=1)
+    strategy.execute(group,['lpc',150])
+    assert switched_Off(plugs) == ['campus/b1/p0']
+    stats=strategy.get_Suppression_Stats()
+    assert stats['actuations'] == 1
+    assert stats['budget'] == 2
+    assert metrics.get_Counter(COUNTER_SUPPRESSED,'budget') == 2
+    report(plugs)
+    # without skip_redundant the off command to p0 is sent again, but it does not take the budget of the tick
+    strategy.execute(group,['lpc',150])
+    assert switched_Off(plugs) == ['campus/b1/p0','campus/b1/p1']
+    stats=strategy.get_Suppression_Stats()
+    assert stats['budget'] == 3
+    assert stats['actuations'] == 3
+
+
+def test_skip_redundant(metrics):
+    group,plugs,vip=make_Group()
+    strategy=make_Strategy(Clock(),skip_redundant=True)
+    strategy.execute(group,['lpc',250])
+    report(plugs)
+    calls=vip.rpc.calls
+    strategy.execute(group,['lpc',150])
+    assert switched_Off(plugs) == ['campus/b1/p0','campus/b1/p1','campus/b1/p2']
+    stats=strategy.get_Suppression_Stats()
+    assert stats['redundant'] == 2
+    assert stats['actuations'] == 3
+    assert metrics.get_Counter(COUNTER_SUPPRESSED,'redundant') == 2
+    assert vip.rpc.calls > calls
+
+
+def test_registry_hands_the_clock_to_the_strategy():
+    group,plugs,vip=make_Group()
+    clock=Clock()
+    strategy=StrategyRegistry.create_Builtin(clock).get_Strategy('lpc',group)
+    assert strategy._clock is clock
+    assert StrategyRegistry.get_Default().get_Strategy('lpc',group)._clock is not clock
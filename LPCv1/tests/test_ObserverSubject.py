@@ -0,0 +1,63 @@
+import pytest
+from Model.SmartPlug import SmartPlug
+from Model.LatencyMetrics import LatencyMetrics, STAGE_INGEST
+from Controller.DeviceMonitor import DeviceMonitor
+from Controller.GLEAMMMonitor import GLEAMMMonitor
+
+
+@pytest.fixture
+def metrics():
+    metrics=LatencyMetrics.get_Default()
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def plug_Frame(plug, power, time=None) -> dict:
+    frame={'topic':'devices/'+plug._id+'/all','message':[{'power':power,'status':1,'priority':1}]}
+    if time is not None:
+        frame['time']=time
+    return frame
+
+
+def make_Monitor():
+    monitor=DeviceMonitor()
+    plugs=[SmartPlug(f'campus/b1/p{i}',None) for i in range(2)]
+    for plug in plugs:
+        monitor.register_Observer(plug)
+    return monitor,plugs
+
+
+def test_frames_within_the_window_are_coalesced(metrics):
+    monitor,plugs=make_Monitor()
+    frames=[plug_Frame(plugs[0],10,0.0),plug_Frame(plugs[1],20,0.1),plug_Frame(plugs[0],30,0.5),
+            {'topic':'unknown/topic','message':[{}]}]
+    report=monitor.process_Messages(frames,window=1.0)
+    assert (report['frames'],report['applied'],report['coalesced'],report['unrouted']) == (4,2,1,1)
+    assert plugs[0]._power_consumption == 30
+    assert metrics.get_Histogram(STAGE_INGEST,'plug').count == 2
+
+
+def test_a_frame_past_the_window_applies_the_held_frame():
+    monitor,plugs=make_Monitor()
+    frames=[plug_Frame(plugs[0],10,0.0),plug_Frame(plugs[0],20,0.5),plug_Frame(plugs[0],30,2.0)]
+    report=monitor.process_Messages(frames,window=1.0)
+    assert (report['applied'],report['coalesced']) == (2,1)
+    assert plugs[0]._max_power_rating == 30
+    report=monitor.process_Messages(frames,window=None)
+    assert (report['applied'],report['coalesced']) == (1,2)
+
+
+def test_gleamm_frames_are_merged_per_point():
+    monitor=GLEAMMMonitor()
+    loads=[SmartPlug(f'Microgrid/GLEAMM/IT/PIT{i}',None) for i in (1,2)]
+    for load in loads:
+        monitor.register_Observer(load)
+    topic='devices/Microgrid/GLEAMM/IT/all'
+    frames=[{'topic':topic,'message':[{'PIT1':5,'SIT1':1,'PIT2':7,'SIT2':1},{}]},
+            {'topic':topic,'message':[{'PIT2':9,'SIT2':0},{}]}]
+    report=monitor.process_Messages(frames)
+    assert (report['applied'],report['coalesced']) == (1,1)
+    assert (loads[0]._power_consumption,loads[0]._status) == (5,1)
+    assert (loads[1]._power_consumption,loads[1]._status) == (9,0)
+    assert frames[0]['message'][0]['PIT2'] == 7
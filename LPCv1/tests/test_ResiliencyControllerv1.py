@@ -0,0 +1,35 @@
+import random
+import pytest
+pytest.importorskip('pulp')
+from Benchmark.FakeVIP import FakeVIP
+from Controller.ResiliencyControllerv1 import BatteryOptimizer
+
+
+def random_Configuration(seed: int) -> tuple:
+    rng=random.Random(seed)
+    capacity=rng.uniform(10,500)
+    loads={'critical': rng.uniform(0,0.25)*capacity,
+           'medium': rng.uniform(0,0.15)*capacity,
+           'low': rng.uniform(0,0.15)*capacity}
+    medium_weight=rng.uniform(0.1,20)
+    weights={'critical': 100, 'medium': medium_weight, 'low': rng.uniform(0.01,1.5)*medium_weight}
+    socs=[capacity*k/20 for k in range(21)]+[rng.uniform(0,capacity) for _ in range(10)]
+    return capacity,loads,weights,socs
+
+
+@pytest.mark.parametrize('seed',range(40))
+def test_single_step_fast_path_matches_the_milp(seed):
+    # over random configurations and the whole SOC range both solvers agree on the status, the objective and the allocation
+    capacity,loads,weights,socs=random_Configuration(seed)
+    optimizer=BatteryOptimizer(1,capacity,capacity,loads,weights,FakeVIP())
+    tolerance=1e-5*capacity
+    objective=lambda decision: weights['medium']*decision['P_medium']+weights['low']*decision['P_low']
+    for soc in socs:
+        fast=optimizer._solve_Single_Step(soc)
+        milp=optimizer._solve_Model(soc)
+        assert fast['status'] == milp['status'], (soc,fast,milp)
+        if fast['status'] != 'Optimal':
+            continue
+        assert abs(objective(fast)-objective(milp)) <= tolerance*(weights['medium']+weights['low']), (soc,fast,milp)
+        for name in ('P_critical','P_medium','P_low'):
+            assert abs(fast[name]-milp[name]) <= tolerance, (soc,name,fast,milp)
@@ -0,0 +1,55 @@
+import json
+from Benchmark.FakeVIP import FakeVIP
+from Model.SmartPlug import SmartPlug
+from Model.EVCharger import EVCharger
+from Model.IoTMessage import IoTMessage
+from Model.IoTDeviceGroup import IoTDeviceGroup
+from Model.DeviceStateTable import DeviceStateTable
+from Model.SnapshotCodec import SnapshotCodec
+
+
+def make_Group():
+    vip=FakeVIP()
+    table=DeviceStateTable()
+    group=IoTDeviceGroup()
+    for i in range(20):
+        plug=SmartPlug(f'campus/b{i%2}/plug{i}',vip,table)
+        plug.update(10*i,1,i%5+1)
+        group.add_Device(plug)
+    charger=EVCharger('campus/b0/ev0',vip,table)
+    charger.update(16,60,2,240,0,5,25,1)
+    group.add_Device(charger)
+    return group
+
+
+def test_roundtrip_matches_the_json_form():
+    group=make_Group()
+    devices=group.get_Devices()
+    devices['campus/b0/plug0'].turn_Off()
+    devices['campus/b1/plug1'].turn_On()
+    devices['campus/b0/plug2']._last_command=1
+    snapshot=SnapshotCodec.decode(SnapshotCodec.encode(group,{'lpc':{'cmd':300}},21.5))
+    assert snapshot['Control'] == {'lpc':{'cmd':300}}
+    assert snapshot['LMP'] == 21.5
+    for device_id,device in devices.items():
+        campus,building=device_id.split('/')[:2]
+        record=snapshot['Monitor'][campus][building][device_id]
+        assert record['power'] == device._power_consumption
+        assert record['status'] == device._status
+        assert record['priority'] == device._priority and type(record['priority']) is type(device._priority)
+        assert record['maxpower'] == device._max_power_rating
+        assert record['voltage'] == device._voltage
+        command=device._last_command
+        if isinstance(command,IoTMessage):
+            assert isinstance(record['command'],IoTMessage)
+            assert (record['command'].device_id,record['command'].payload) == (command.device_id,command.payload)
+        else:
+            assert record['command'] == command and type(record['command']) is int
+
+
+def test_ids_are_front_coded():
+    ids=[f'campus/building540/NIRE_WeMo_cc_1/w{i}' for i in range(100)]+['campus/b2/x','other']
+    table=SnapshotCodec._encode_Ids(ids)
+    assert SnapshotCodec._decode_Ids(table,0,len(ids))[0] == ids
+    # the shared campus/building prefix is sent once
+    assert len(table) < len(json.dumps(ids).encode())/4